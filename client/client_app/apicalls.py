@@ -1,4 +1,5 @@
 import httpx
+import json
 from pathlib import Path
 import ssl
 import os
@@ -497,21 +498,44 @@ async def api_join_matchmaking(deck_slot: int, CURRENT_USER_STATE):
             return {"success": False, "detail": str(e)}
         
 
-async def api_get_match_status(CURRENT_USER_STATE: UserState):
-    """Controlla lo stato attuale del matchmaking."""
+async def api_get_match_status(CURRENT_USER_STATE: UserState, wait: int = 0):
+    """
+    Controlla lo stato attuale del matchmaking.
+    Con wait > 0 il server tiene aperta la richiesta (long-poll) finché
+    non trova un avversario o scadono i secondi indicati.
+    """
     url = f"{API_GATEWAY_URL}/game/match/status" # Adatta l'endpoint
     token = CURRENT_USER_STATE.token
 
     headers = {"Authorization": f"Bearer {token}"}
+    params = {"wait": wait} if wait else None
 
-    async with httpx.AsyncClient(verify=SSL_CONTEXT) as client:
+    # Il timeout del client deve superare l'attesa lato server
+    async with httpx.AsyncClient(verify=SSL_CONTEXT, timeout=wait + 15) as client:
         try:
-            response = await client.get(url, headers=headers)
+            response = await client.get(url, headers=headers, params=params)
             if response.status_code == 200:
                 return response.json() # Ci aspettiamo { "status": "searching"|"started", "game_id": ... }
             return None
         except:
             return None
+
+
+async def api_leave_matchmaking(CURRENT_USER_STATE: UserState):
+    """Esce dalla coda di matchmaking."""
+    url = f"{API_GATEWAY_URL}/game/match/leave"
+    token = CURRENT_USER_STATE.token
+
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async with httpx.AsyncClient(verify=SSL_CONTEXT) as client:
+        try:
+            response = await client.post(url, headers=headers)
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except:
+            return None
         
 async def api_get_hand(game_id: str, CURRENT_USER_STATE: UserState):
     """Recupera le carte in mano al giocatore."""
@@ -537,11 +561,49 @@ async def api_get_hand(game_id: str, CURRENT_USER_STATE: UserState):
             print(f"Errore get hand: {e}")
             return [] # Ritorna lista vuota in caso di eccezione per evitare TypeError
 
+# Ultimo stato ricevuto per ogni partita (game_id -> stato completo)
+_GAME_STATES = {}
+
+
 async def api_get_game_state(game_id: str, CURRENT_USER_STATE: UserState):
-    """Recupera lo stato completo della partita."""
+    """
+    Recupera lo stato completo della partita. Dopo la prima richiesta chiede
+    solo le novità: ?since=<versione> (solo i turni nuovi) e If-None-Match
+    (304 se la partita non è cambiata), aggiornando lo stato già ricevuto.
+    """
     url = f"{API_GATEWAY_URL}/game/state/{game_id}"
     token = CURRENT_USER_STATE.token
     headers = {"Authorization": f"Bearer {token}"}
+    params = {}
+    cached = _GAME_STATES.get(game_id)
+    if cached is not None:
+        params["since"] = cached["version"]
+        headers["If-None-Match"] = f'"{cached["version"]}"'
+
+    async with httpx.AsyncClient(verify=SSL_CONTEXT) as client:
+        try:
+            response = await client.get(url, headers=headers, params=params)
+            if response.status_code == 304 and cached is not None:
+                return cached
+            if response.status_code == 200:
+                state = response.json()
+                if "since" in state and cached is not None:
+                    state["turn_history"] = cached["turn_history"] + state["turn_history"]
+                    del state["since"]
+                _GAME_STATES[game_id] = state
+                return state
+            return None
+        except Exception:
+            return None
+
+async def api_get_game_view(game_id: str, CURRENT_USER_STATE: UserState):
+    """
+    Recupera in una sola richiesta la mano del giocatore e lo stato della
+    partita (turno, punteggi, vincitore, avversario). None in caso di errore.
+    """
+    url = f"{API_GATEWAY_URL}/game/view/{game_id}"
+    token = CURRENT_USER_STATE.token
+    headers = {"Authorization": f"Bearer {token}"}
 
     async with httpx.AsyncClient(verify=SSL_CONTEXT) as client:
         try:
@@ -569,4 +631,46 @@ async def api_play_card(game_id: str, card_payload: dict, CURRENT_USER_STATE: Us
             else:
                 return {"status": "error", "message": response.text}
         except Exception as e:
-            return {"status": "error", "message": str(e)}
\ No newline at end of file
+            return {"status": "error", "message": str(e)}
+
+
+async def api_wait_game_update(game_id: str, current_turn: int, CURRENT_USER_STATE: UserState):
+    """
+    Resta in ascolto sullo stream Server-Sent Events della partita finché il
+    turno non avanza o la partita finisce. Ritorna un dizionario con
+    turn_number, scores e winner, oppure None se lo stream non è disponibile.
+    """
+    url = f"{API_GATEWAY_URL}/game/events/{game_id}"
+    token = CURRENT_USER_STATE.token
+    headers = {"Authorization": f"Bearer {token}", "Accept": "text/event-stream"}
+
+    # Nessun timeout di lettura: gli eventi arrivano quando gioca l'avversario
+    timeout = httpx.Timeout(10.0, read=None)
+
+    async with httpx.AsyncClient(verify=SSL_CONTEXT, timeout=timeout) as client:
+        try:
+            async with client.stream("GET", url, headers=headers) as response:
+                if response.status_code != 200:
+                    return None
+
+                event, data_lines = None, []
+                async for line in response.aiter_lines():
+                    if line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                    elif line.startswith("data:"):
+                        data_lines.append(line[len("data:"):].strip())
+                    elif line == "" and event:
+                        data = json.loads("\n".join(data_lines)) if data_lines else {}
+                        event, name, data_lines = None, event, []
+
+                        # Lo snapshot iniziale copre il caso in cui l'avversario abbia già giocato
+                        if name == "snapshot" and (data.get("turn_number", 0) > current_turn or data.get("winner")):
+                            return data
+                        if name == "round_resolved":
+                            return {"turn_number": data.get("turn_number"), "scores": data.get("scores", {}), "winner": None}
+                        if name == "game_finished":
+                            return {"turn_number": data.get("turn_number"), "scores": data.get("scores", {}), "winner": data.get("match_winner")}
+            return None
+        except Exception as e:
+            print(f"Errore stream eventi: {e}")
+            return None
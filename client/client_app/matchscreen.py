@@ -2,11 +2,13 @@ import asyncio
 import time
 from rich.console import Console
 import questionary
-from client_app.apicalls import api_get_deck_collection, api_join_matchmaking, api_get_match_status, api_get_hand, api_play_card, api_get_game_state
+from client_app.apicalls import api_get_deck_collection, api_join_matchmaking, api_get_match_status, api_leave_matchmaking, api_play_card, api_get_game_view, api_wait_game_update
 from rich.panel import Panel
 from rich.align import Align
 from rich.columns import Columns
 
+MATCH_STATUS_WAIT = 30 # secondi di attesa lato server per ogni richiesta di stato
+
 class UserState:
     """Contiene lo stato globale dell'utente loggato."""
     def __init__(self):
@@ -85,8 +87,8 @@ def gamescreen(console: Console, game_id: str, CURRENT_USER_STATE: UserState):
         console.clear()
         
         # --- 1. RECUPERO DATI INIZIO TURNO ---
-        # Scarichiamo lo stato per avere punteggi aggiornati e turno corrente
-        game_state = asyncio.run(api_get_game_state(game_id, CURRENT_USER_STATE))
+        # Una sola richiesta: punteggi, turno corrente, avversario e mano
+        game_state = asyncio.run(api_get_game_view(game_id, CURRENT_USER_STATE))
         
         if not game_state:
             console.print("[bold red]Errore critico: Impossibile recuperare lo stato della partita.[/]")
@@ -106,12 +108,9 @@ def gamescreen(console: Console, game_id: str, CURRENT_USER_STATE: UserState):
         current_turn = game_state.get("turn_number", 0)
         scores = game_state.get("scores", {})
         
-        # Identificazione Avversario (Logica per trovarlo nella lista players)
-        players = game_state.get("players", [])
-        for p in players:
-            if p['name'] != my_username:
-                opponent_name = p['name']
-                break
+        # Identificazione Avversario
+        opponent = game_state.get("opponent", {})
+        opponent_name = opponent.get("name", opponent_name)
         
         # --- 2. HEADER VISIVO (Top Left / Top Right) ---
         # Creiamo due pannelli o stringhe formattate
@@ -119,7 +118,8 @@ def gamescreen(console: Console, game_id: str, CURRENT_USER_STATE: UserState):
         opp_score = scores.get(opponent_name, 0)
         
         left_text = f"[bold cyan]Turno: {current_turn}[/]\n[bold green]{my_username}: {my_score}[/]"
-        right_text = f"[bold red]VS[/]\n[bold yellow]{opponent_name}: {opp_score}[/]"
+        opp_status = " (ha giocato)" if opponent.get("played") else ""
+        right_text = f"[bold red]VS[/]\n[bold yellow]{opponent_name}: {opp_score}{opp_status}[/]"
         
         # Usa Columns per distanziare sx e dx
         console.print(Columns([Align.left(left_text), Align.right(right_text)], expand=True))
@@ -127,7 +127,7 @@ def gamescreen(console: Console, game_id: str, CURRENT_USER_STATE: UserState):
 
         # --- 3. RECUPERO MANO ---
         console.print("Tua mano:")
-        hand_cards = asyncio.run( api_get_hand(game_id, CURRENT_USER_STATE))
+        hand_cards = game_state.get("hand", [])
         if not hand_cards:
             console.print("[italic]Mano vuota... partita in chiusura?[/]")
         
@@ -194,12 +194,14 @@ def gamescreen(console: Console, game_id: str, CURRENT_USER_STATE: UserState):
             console.print(f"\n[bold yellow]In attesa della mossa dell'avversario...[/]")
             
             with console.status("L'avversario sta pensando...", spinner="dots"):
-                # LOOP DI POLLING
                 while True:
-                    time.sleep(2) # Aspetta 2 secondi
-                    
-                    # Chiamo game/state per vedere se è cambiato qualcosa
-                    check_state = asyncio.run(api_get_game_state(game_id, CURRENT_USER_STATE))
+                    # Restiamo in ascolto sullo stream eventi (una sola connessione)
+                    check_state = asyncio.run(api_wait_game_update(game_id, current_turn, CURRENT_USER_STATE))
+
+                    if not check_state:
+                        # Stream non disponibile: ripieghiamo sul polling di game/view
+                        time.sleep(2)
+                        check_state = asyncio.run(api_get_game_view(game_id, CURRENT_USER_STATE))
                     
                     if not check_state: continue
                     
@@ -321,9 +323,8 @@ def schermata_partita(console: Console, CURRENT_USER_STATE: UserState):
             with console.status("[bold yellow]Ricerca avversario in corso...[/]", spinner="dots") as status:
                 
                 while True:
-                    # 1. Chiamata API Status
-                    match_status = asyncio.run(api_get_match_status(CURRENT_USER_STATE))
-                    print(match_status)
+                    # 1. Chiamata API Status (long-poll: il server risponde appena c'è un match)
+                    match_status = asyncio.run(api_get_match_status(CURRENT_USER_STATE, wait=MATCH_STATUS_WAIT))
                     if match_status:
                         state = match_status.get("status")
                         
@@ -338,13 +339,18 @@ def schermata_partita(console: Console, CURRENT_USER_STATE: UserState):
                         else:
                             console.print(f"[red]Stato sconosciuto o errore: {state}[/]")
                             return
-                    
-                    # 2. Attesa
-                    time.sleep(2)
+                    else:
+                        # 2. Errore di rete: piccola pausa prima di riprovare
+                        time.sleep(2)
 
         except KeyboardInterrupt:
-            console.print("\n[bold red]Matchmaking annullato dall'utente.[/]")
-            return
+            # Usciamo subito dalla coda, così il server non ci abbina a nessuno
+            leave_response = asyncio.run(api_leave_matchmaking(CURRENT_USER_STATE))
+            if leave_response and leave_response.get("status") == "matched":
+                game_found_data = leave_response
+            else:
+                console.print("\n[bold red]Matchmaking annullato dall'utente.[/]")
+                return
     
     elif join_response.get('data')["status"] == "matched":
         game_found_data = join_response.get('data')
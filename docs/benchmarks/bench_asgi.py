@@ -0,0 +1,199 @@
+"""
+Confronto di carico tra l'app Flask (flask run, un thread per richiesta) e
+il server ASGI (uvicorn + asgi.py) con gli altri servizi lenti.
+
+Per ogni server: avvia il game engine (store in memoria), genera il carico
+con Locust (locust_game_engine.py: partite complete, giocatori sempre
+nuovi) e misura partite finite, tempo di CPU del processo del game engine
+(da /proc), thread del processo e latenze di /play e /view.
+user-manager, collection e game_history sono simulati da `upstream` (app
+FastAPI in questo file) con una latenza fissa per richiesta
+(--upstream-latency-ms): ogni richiesta al game engine valida il token.
+
+"partite per core" = partite finite / secondi di CPU del game engine, cioè
+le partite al secondo che il servizio regge per ogni core completamente
+occupato.
+
+Richiede locust (pip install locust); solo Linux (/proc).
+Uso:  python docs/benchmarks/bench_asgi.py [--users 200] [--duration 60] [--upstream-latency-ms 50]
+"""
+import argparse
+import asyncio
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "..", "src")
+
+DECK = [
+    {"value": "2", "suit": "hearts"}, {"value": "K", "suit": "hearts"},
+    {"value": "3", "suit": "diamonds"}, {"value": "Q", "suit": "diamonds"},
+    {"value": "4", "suit": "clubs"}, {"value": "J", "suit": "clubs"},
+    {"value": "5", "suit": "spades"}, {"value": "10", "suit": "spades"},
+    {"value": "JOKER", "suit": "none"},
+]
+
+# --- Servizi simulati (avviati con uvicorn in un processo separato) ---
+
+LATENCY = float(os.environ.get("BENCH_UPSTREAM_LATENCY_MS", "50")) / 1000
+upstream = FastAPI()
+
+
+@upstream.get("/users/validate-token")
+async def validate_token(request: Request):
+    await asyncio.sleep(LATENCY)
+    token = request.headers["Authorization"].split()[1]
+    return {"id": token, "username": token}
+
+
+@upstream.get("/collection/user-decks")
+async def user_decks():
+    await asyncio.sleep(LATENCY)
+    return JSONResponse({"success": True, "data": DECK}, headers={"ETag": '"1"'})
+
+
+@upstream.get("/internal/ratings")
+async def ratings(id: str):
+    await asyncio.sleep(LATENCY)
+    return {"ratings": {id: 0}}
+
+
+# --- Misura ---
+
+SERVERS = {
+    "flask": [sys.executable, "-m", "flask", "--app", "game_engine.app", "run", "--with-threads", "--port"],
+    "asgi": [sys.executable, "-m", "uvicorn", "game_engine.asgi:app", "--log-level", "warning", "--port"],
+}
+
+
+def cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def thread_count(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("Threads:"):
+                return int(line.split()[1])
+    return 0
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} non risponde")
+
+
+def read_stats(prefix):
+    with open(f"{prefix}_stats.csv") as f:
+        return {(row["Type"], row["Name"]): row for row in csv.DictReader(f)}
+
+
+def run(server, port, upstream_port, args, workdir):
+    env = {
+        **os.environ,
+        "USER_MANAGER_URL": f"http://127.0.0.1:{upstream_port}",
+        "COLLECTION_URL": f"http://127.0.0.1:{upstream_port}/collection",
+        "GAME_HISTORY_RATINGS_URL": f"http://127.0.0.1:{upstream_port}/internal/ratings",
+        "OUTBOX_PATH": os.path.join(workdir, f"{server}-outbox.db"),
+        "DECK_INDEX_PATH": os.path.join(workdir, "deck_index.npy"),
+        "SNAPSHOT_PATH": os.path.join(workdir, f"{server}-snapshot.bin"),
+        "BOT_FALLBACK_SECONDS": "0",
+        "RABBITMQ_HOST": "127.0.0.1",
+        "PYTHONPATH": SRC,
+    }
+    process = subprocess.Popen(SERVERS[server] + [str(port)], cwd=SRC, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(f"http://127.0.0.1:{port}/internal/metrics")
+        max_threads = [0]
+        done = threading.Event()
+
+        def sample_threads():
+            while not done.wait(0.5):
+                max_threads[0] = max(max_threads[0], thread_count(process.pid))
+        threading.Thread(target=sample_threads, daemon=True).start()
+
+        prefix = os.path.join(workdir, server)
+        cpu_start = cpu_seconds(process.pid)
+        subprocess.run([
+            sys.executable, "-m", "locust", "-f", os.path.join(HERE, "locust_game_engine.py"),
+            "--host", f"http://127.0.0.1:{port}", "--headless", "--only-summary",
+            "-u", str(args.users), "-r", str(args.spawn_rate), "-t", f"{args.duration}s", "--csv", prefix,
+        ], check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        cpu = cpu_seconds(process.pid) - cpu_start
+        done.set()
+    finally:
+        process.terminate()
+        process.wait(10)
+
+    stats = read_stats(prefix)
+    games = stats.get(("GAME", "finished"))
+    finished = int(games["Request Count"]) if games else 0
+    aggregated = stats[("", "Aggregated")]
+    return {
+        "games": finished,
+        "games_per_s": finished / args.duration,
+        "cpu_s": cpu,
+        "games_per_core": finished / cpu if cpu else 0,
+        "threads": max_threads[0],
+        "play": stats.get(("POST", "/play")),
+        "view": stats.get(("GET", "/view")),
+        "failures": int(aggregated["Failure Count"]),
+        "requests": int(aggregated["Request Count"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Game engine Flask contro ASGI sotto carico Locust")
+    parser.add_argument("--users", type=int, default=200, help="giocatori concorrenti (partite = users / 2)")
+    parser.add_argument("--spawn-rate", type=float, default=50)
+    parser.add_argument("--duration", type=int, default=60)
+    parser.add_argument("--upstream-latency-ms", type=float, default=50)
+    parser.add_argument("--servers", default="flask,asgi")
+    parser.add_argument("--port", type=int, default=5600)
+    args = parser.parse_args()
+
+    upstream_port = args.port - 1
+    upstream_process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "bench_asgi:upstream", "--app-dir", HERE,
+         "--log-level", "warning", "--port", str(upstream_port)],
+        env={**os.environ, "BENCH_UPSTREAM_LATENCY_MS": str(args.upstream_latency_ms)},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(f"http://127.0.0.1:{upstream_port}/internal/ratings?id=x")
+        print(f"{args.users} giocatori ({args.users // 2} partite concorrenti), {args.duration}s, "
+              f"servizi esterni {args.upstream_latency_ms:.0f} ms, {os.cpu_count()} core")
+        print(f"{'server':<6} {'partite':>7} {'partite/s':>9} {'CPU s':>6} {'partite/core·s':>14} {'thread':>6} "
+              f"{'/play p50':>9} {'/play p95':>9} {'/view p95':>9} {'errori':>9}")
+        with tempfile.TemporaryDirectory() as workdir:
+            for i, server in enumerate(args.servers.split(",")):
+                r = run(server, args.port + i, upstream_port, args, workdir)
+                play, view = r["play"] or {}, r["view"] or {}
+                print(f"{server:<6} {r['games']:>7} {r['games_per_s']:>9.1f} {r['cpu_s']:>6.1f} "
+                      f"{r['games_per_core']:>14.1f} {r['threads']:>6} "
+                      f"{play.get('50%', '-'):>9} {play.get('95%', '-'):>9} {view.get('95%', '-'):>9} "
+                      f"{r['failures']:>4}/{r['requests']:<4}")
+    finally:
+        upstream_process.terminate()
+        upstream_process.wait(10)
+
+
+if __name__ == "__main__":
+    main()
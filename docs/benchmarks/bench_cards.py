@@ -0,0 +1,88 @@
+"""
+Micro-benchmark della risoluzione dei round e della ricerca in mano.
+
+Confronta il percorso a stringhe (regole valutate a ogni chiamata, carte
+cercate per value/suit) con la codifica intera di cards.py (tabella
+OUTCOME precalcolata, carte cercate per codice).
+
+Uso:  python docs/benchmarks/bench_cards.py [--pairs 100000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+
+from game_engine.cards import OUTCOME, OUTCOME_NAMES, NUM_CARDS, compare_by_rules, parse_card  # noqa: E402
+from game_engine.models import Card  # noqa: E402
+
+
+def string_resolve(pairs):
+    for c1, c2 in pairs:
+        compare_by_rules(c1.value, c1.suit, c2.value, c2.suit)
+
+
+def table_resolve(pairs):
+    for c1, c2 in pairs:
+        OUTCOME[c1.code][c2.code]
+
+
+def string_lookup(hand, plays):
+    # Percorso precedente di submit_card
+    for data in plays:
+        next((c for c in hand if c.value == data["value"] and c.suit == data["suit"]), None)
+
+
+def code_lookup(hand, plays):
+    # Percorso attuale di _apply_card
+    for data in plays:
+        code = parse_card(data)
+        for c in hand:
+            if c.code == code:
+                break
+
+
+def best(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark codifica intera delle carte")
+    parser.add_argument("--pairs", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    deck = [Card.from_code(code) for code in range(NUM_CARDS)]
+    pairs = [(rng.choice(deck), rng.choice(deck)) for _ in range(args.pairs)]
+
+    # La tabella deve dare gli stessi esiti delle regole
+    for c1 in deck:
+        for c2 in deck:
+            assert OUTCOME_NAMES[OUTCOME[c1.code][c2.code]] == compare_by_rules(c1.value, c1.suit, c2.value, c2.suit)
+
+    hand = rng.sample(deck, 3)
+    plays = [rng.choice(hand).to_dict() for _ in range(args.pairs)]
+    compact_plays = [parse_card(p) for p in plays]
+
+    rows = [
+        ("round (stringhe)", best(lambda: string_resolve(pairs), args.repeat)),
+        ("round (OUTCOME)", best(lambda: table_resolve(pairs), args.repeat)),
+        ("mano (value/suit)", best(lambda: string_lookup(hand, plays), args.repeat)),
+        ("mano (dict -> codice)", best(lambda: code_lookup(hand, plays), args.repeat)),
+        ("mano (codice sul filo)", best(lambda: code_lookup(hand, compact_plays), args.repeat)),
+    ]
+
+    print(f"{'operazione':<24} {'ns/op':>8} {'speedup':>8}")
+    baseline = {}
+    for name, seconds in rows:
+        ns = seconds / args.pairs * 1e9
+        group = name.split()[0]
+        baseline.setdefault(group, ns)
+        print(f"{name:<24} {ns:>8.0f} {baseline[group] / ns:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Raffica di /match/join: abbinamento immediato nel join contro matchmaking
+a blocchi (MATCHMAKING_BATCH_MS, vedi run_matchmaking_tick in logic.py).
+
+N giocatori nuovi (deck non in cache) entrano in coda da --threads thread
+di richiesta. Il servizio collection è simulato con una latenza fissa
+(--collection-latency) per ogni deck scaricato. Misure:
+
+  - latenza di una richiesta di join (mediana / p99)
+  - tempo finché tutti i giocatori hanno una partita pendente
+  - tempo di thread di richiesta speso in totale nei join
+
+Il rating non è usato (coda FIFO) per confrontare solo il lavoro di
+abbinamento e di caricamento dei deck.
+
+Uso:  python docs/benchmarks/bench_join_burst.py [--players 2000] [--threads 32] [--batch-ms 50]
+"""
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+
+from game_engine import logic  # noqa: E402
+from game_engine.store import InMemoryGameStore  # noqa: E402
+
+DECK = [
+    {"value": "2", "suit": "hearts"}, {"value": "K", "suit": "hearts"},
+    {"value": "3", "suit": "diamonds"}, {"value": "Q", "suit": "diamonds"},
+    {"value": "4", "suit": "clubs"}, {"value": "J", "suit": "clubs"},
+    {"value": "5", "suit": "spades"}, {"value": "10", "suit": "spades"},
+    {"value": "JOKER", "suit": "none"},
+]
+
+
+def run(players, threads, batch_ms, latency):
+    store = InMemoryGameStore()
+    logic.game_store = store
+    logic.reaper.store = store
+    logic.deck_cache.clear()
+    logic.MATCHMAKING_RATED = False
+    logic.BOT_FALLBACK_SECONDS = 0
+    logic.TURN_TIMEOUT_SECONDS = 0
+    logic.MATCHMAKING_BATCH_MS = batch_ms
+    logic.matchmaking_ticker.interval = batch_ms / 1000
+
+    def fake_fetch(user_uuid, deck_slot, etag=None):
+        time.sleep(latency)
+        return DECK, None
+    logic._fetch_deck = fake_fetch
+
+    users = [f"burst-{batch_ms}-{i}" for i in range(players)]
+    joins = queue.Queue()
+    for u in users:
+        joins.put(u)
+    latencies = []
+    matched_in_join = set()  # abbinati direttamente dalla propria richiesta di join
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                u = joins.get_nowait()
+            except queue.Empty:
+                return
+            start = time.perf_counter()
+            result = logic.process_matchmaking_request(u, u, 1, store)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if result["status"] == "matched":
+                    matched_in_join.add(u)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    joined = time.perf_counter() - start
+    waiting = [u for u in users if u not in matched_in_join]
+    while not all(store.get_pending(u) for u in waiting):
+        time.sleep(0.005)
+    matched = time.perf_counter() - start
+
+    logic.matchmaking_ticker.stop()
+    latencies.sort()
+    return {
+        "median_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "joined_s": joined,
+        "matched_s": matched,
+        "request_thread_s": sum(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Raffica di join: immediato contro a blocchi")
+    parser.add_argument("--players", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--batch-ms", type=float, default=50)
+    parser.add_argument("--collection-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    print(f"{args.players} join da {args.threads} thread, collection {args.collection_latency * 1000:.0f} ms, "
+          f"{logic.MATCHMAKING_BATCH_WORKERS} thread di caricamento nel tick")
+    print(f"{'modalità':<20} {'join p50 ms':>11} {'join p99 ms':>11} {'join finiti s':>13} "
+          f"{'tutti abbinati s':>16} {'thread richiesta s':>18}")
+    for name, batch_ms in (("immediato", 0), (f"blocchi {args.batch_ms:.0f} ms", args.batch_ms)):
+        stats = run(args.players, args.threads, batch_ms, args.collection_latency)
+        print(f"{name:<20} {stats['median_ms']:>11.2f} {stats['p99_ms']:>11.2f} {stats['joined_s']:>13.2f} "
+              f"{stats['matched_s']:>16.2f} {stats['request_thread_s']:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
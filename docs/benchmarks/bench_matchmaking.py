@@ -0,0 +1,112 @@
+"""
+Latenza di un join con la coda di matchmaking piena: ricerca
+dell'avversario più vicino per rating (game_engine/matchmaking.py, bucket
+ordinati) contro una scansione lineare della coda, con 100 / 1.000 /
+10.000 giocatori in attesa.
+
+Ogni operazione è quella di process_matchmaking_request: cancel di
+un'eventuale entry precedente, pop dell'avversario (queue_pop con il
+rating) e, se nessuno è nella finestra, join in coda. Dopo ogni abbinamento
+un nuovo giocatore entra in coda, così la dimensione resta costante.
+
+Rating distribuiti come i punti di una classifica (normale, media 200,
+deviazione 150, minimo 0), attese in coda uniformi fino a 60 secondi.
+
+Uso:  python docs/benchmarks/bench_matchmaking.py [--sizes 100,1000,10000] [--joins 20000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+
+from game_engine.matchmaking import MatchmakingQueue, RatingWindow  # noqa: E402
+from game_engine.store import RATING_WINDOW, InMemoryGameStore  # noqa: E402
+
+
+class LinearScanQueue(MatchmakingQueue):
+    """Riferimento: avversario più vicino cercato su tutta la coda (O(n))."""
+
+    def pop_nearest(self, rating, waited=0, now=None):
+        now = time.time() if now is None else now
+        best = None
+        for entry in self.entries():
+            if self.window.accepts(rating, waited, entry['rating'], now - entry['joined_at']):
+                if best is None or abs(entry['rating'] - rating) < abs(best['rating'] - rating):
+                    best = entry
+        if best is not None:
+            self.cancel(best['uuid'])
+        return best
+
+
+def random_entry(rng, n, now):
+    return {
+        'uuid': f"player-{n}",
+        'name': f"player-{n}",
+        'rating': max(0, round(rng.gauss(200, 150))),
+        'joined_at': now - rng.uniform(0, 60),
+    }
+
+
+def run(store, size, joins, seed=0):
+    rng = random.Random(seed)
+    now = time.time()
+    counter = 0
+    for _ in range(size):
+        store.queue_join(random_entry(rng, counter, now))
+        counter += 1
+
+    latencies = []
+    matched = 0
+    for _ in range(joins):
+        entry = random_entry(rng, counter, time.time())
+        counter += 1
+        start = time.perf_counter()
+        store.queue_cancel(entry['uuid'])
+        opponent = store.queue_pop(entry['rating'])
+        if opponent is None:
+            store.queue_join(entry)
+        latencies.append(time.perf_counter() - start)
+        if opponent is not None:
+            matched += 1
+            # Un nuovo giocatore prende il posto dell'avversario abbinato
+            store.queue_join(random_entry(rng, counter, time.time()))
+            counter += 1
+        elif store.queue_len() > size:
+            store.queue_pop()
+    latencies.sort()
+    return {
+        "median_us": statistics.median(latencies) * 1e6,
+        "p99_us": latencies[int(len(latencies) * 0.99)] * 1e6,
+        "matched": matched / joins,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latenza del join con la coda di matchmaking piena")
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--joins", type=int, default=20000)
+    args = parser.parse_args()
+
+    window = RATING_WINDOW
+    print(f"finestra: {window.base:.0f} punti + {window.growth:.0f}/s di attesa, massimo {window.maximum:.0f}")
+    print(f"{'coda':>7} {'ricerca':<12} {'mediana µs':>11} {'p99 µs':>9} {'abbinati':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        for name, queue in (
+            ("bucket", None),
+            ("lineare", LinearScanQueue(RatingWindow(window.base, window.growth, window.maximum))),
+        ):
+            store = InMemoryGameStore()
+            if queue is not None:
+                store._queue = queue
+            # La scansione lineare è lenta: meno join sulle code grandi
+            joins = args.joins if queue is None else max(200, args.joins * 100 // size)
+            stats = run(store, size, joins)
+            print(f"{size:>7} {name:<12} {stats['median_us']:>11.1f} {stats['p99_us']:>9.1f} {stats['matched']:>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Memoria per partita attiva: modelli originali (dataclass con __dict__,
+mazzi e mani come liste di Card, log dei turni come lista di dict) contro
+i modelli attuali di game_engine/models.py (__slots__, bytearray di codici
+carta, carte condivise, log compatto).
+
+Le partite vengono create a metà gioco (deck assegnati, 3 carte pescate,
+--rounds round giocati) e la memoria è misurata con tracemalloc.
+
+Uso:  python docs/benchmarks/bench_memory.py [--games 20000] [--rounds 3]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+
+from game_engine import models  # noqa: E402
+from game_engine.cards import OUTCOME, compare_by_rules  # noqa: E402
+
+# Deck valido (8 carte + Joker)
+DECK = [
+    {"value": "2", "suit": "hearts"}, {"value": "K", "suit": "hearts"},
+    {"value": "3", "suit": "diamonds"}, {"value": "Q", "suit": "diamonds"},
+    {"value": "4", "suit": "clubs"}, {"value": "J", "suit": "clubs"},
+    {"value": "5", "suit": "spades"}, {"value": "10", "suit": "spades"},
+    {"value": "JOKER", "suit": "none"},
+]
+
+
+# --- Modelli originali (prima di __slots__ e della codifica intera) ---
+
+@dataclass
+class LegacyCard:
+    value: str
+    suit: str
+
+    def __repr__(self):
+        return f"{self.value} of {self.suit}"
+
+
+@dataclass
+class LegacyDeck:
+    cards: List[LegacyCard] = field(default_factory=list)
+
+    def draw(self):
+        return self.cards.pop(0) if self.cards else None
+
+
+@dataclass
+class LegacyPlayer:
+    uuid: str
+    name: str
+    deck: LegacyDeck = field(default_factory=LegacyDeck)
+    hand: List[LegacyCard] = field(default_factory=list)
+    score: int = 0
+
+    def draw_card(self):
+        card = self.deck.draw()
+        if card:
+            self.hand.append(card)
+        return card
+
+
+@dataclass
+class LegacyGame:
+    player1: LegacyPlayer
+    player2: LegacyPlayer
+    game_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    current_round: Dict[str, LegacyCard] = field(default_factory=dict)
+    turn_number: int = 0
+    winner: Optional[str] = None
+    turns: List[Dict] = field(default_factory=list)
+    started_at: datetime = field(default_factory=datetime.now)
+    ended_at: Optional[datetime] = None
+    version: int = 0
+    updated_at: float = field(default_factory=time.time)
+    turn_deadline: Optional[float] = None
+    missed_turns: Dict[str, int] = field(default_factory=dict)
+
+    def resolve_round(self, winner_name):
+        self.turn_number += 1
+        self.turns.append({
+            "turn": self.turn_number,
+            "cards": {p: str(c) for p, c in self.current_round.items()},
+            "winner": winner_name
+        })
+        self.current_round = {}
+
+
+def legacy_game(i, rounds, rng):
+    players = []
+    for n in (1, 2):
+        p = LegacyPlayer(uuid=str(uuid.uuid4()), name=f"player{n}-{i}")
+        p.deck.cards = [LegacyCard(c["value"], c["suit"]) for c in DECK]
+        rng.shuffle(p.deck.cards)
+        players.append(p)
+    game = LegacyGame(*players)
+    for _ in range(3):
+        game.player1.draw_card()
+        game.player2.draw_card()
+    for _ in range(rounds):
+        for p in players:
+            game.current_round[p.uuid] = p.hand.pop(0)
+        c1, c2 = game.current_round[game.player1.uuid], game.current_round[game.player2.uuid]
+        result = compare_by_rules(c1.value, c1.suit, c2.value, c2.suit)
+        game.resolve_round({"player1": game.player1.name, "player2": game.player2.name}.get(result, result))
+        game.player1.draw_card()
+        game.player2.draw_card()
+    return game
+
+
+def current_game(i, rounds, rng):
+    players = []
+    for n in (1, 2):
+        p = models.Player(uuid=str(uuid.uuid4()), name=f"player{n}-{i}")
+        p.deck = models.Deck.from_dict(DECK)
+        rng.shuffle(p.deck.codes)
+        players.append(p)
+    game = models.Game(*players)
+    for _ in range(3):
+        game.player1.draw_card()
+        game.player2.draw_card()
+    for _ in range(rounds):
+        for p in players:
+            game.current_round[p.uuid] = models.Card.from_code(p.hand.codes.pop(0))
+        c1, c2 = game.current_round[game.player1.uuid], game.current_round[game.player2.uuid]
+        game.resolve_round(OUTCOME[c1.code][c2.code])
+        game.player1.draw_card()
+        game.player2.draw_card()
+    return game
+
+
+def measure(factory, num_games, rounds):
+    rng = random.Random(42)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = [factory(i, rounds, rng) for i in range(num_games)]
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del games
+    return used / num_games
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria per partita attiva")
+    parser.add_argument("--games", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    legacy = measure(legacy_game, args.games, args.rounds)
+    current = measure(current_game, args.games, args.rounds)
+
+    print(f"{args.games} partite, {args.rounds} round giocati ciascuna")
+    print(f"{'modelli':<12} {'byte/partita':>13} {'partite per GB':>15}")
+    for name, size in (("originali", legacy), ("attuali", current)):
+        print(f"{name:<12} {size:>13.0f} {2**30 / size:>15.0f}")
+    print(f"riduzione: {legacy / current:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Letture ripetute di /state, /hand e /view sulla stessa versione della
+partita: JSON costruito e codificato a ogni richiesta contro le risposte
+già codificate della cache per versione (game_engine/response_cache.py).
+
+Per ogni endpoint: tempo del lavoro del server per una lettura (stato +
+json.dumps, oppure lookup nella cache) e richieste al secondo dell'app
+Flask (test client, validazione del token sostituita da una funzione
+locale) con e senza cache. La partita è a metà (qualche round giocato),
+così turn_history non è vuota.
+
+Uso:  python docs/benchmarks/bench_response_cache.py [--reads 20000] [--rounds 4]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+
+# Outbox e snapshot in una cartella temporanea, non in data/ della cartella corrente
+DATA_DIR = tempfile.TemporaryDirectory(prefix="game-engine-")
+os.environ.setdefault("OUTBOX_PATH", os.path.join(DATA_DIR.name, "outbox.db"))
+os.environ.setdefault("SNAPSHOT_PATH", os.path.join(DATA_DIR.name, "snapshot.bin"))
+
+from game_engine import logic, routes  # noqa: E402
+from game_engine.app import app  # noqa: E402
+from game_engine.store import InMemoryGameStore  # noqa: E402
+
+DECK = [
+    {"value": "2", "suit": "hearts"}, {"value": "K", "suit": "hearts"},
+    {"value": "3", "suit": "diamonds"}, {"value": "Q", "suit": "diamonds"},
+    {"value": "4", "suit": "clubs"}, {"value": "J", "suit": "clubs"},
+    {"value": "5", "suit": "spades"}, {"value": "10", "suit": "spades"},
+    {"value": "JOKER", "suit": "none"},
+]
+HEADERS = {"Authorization": "Bearer p1"}
+
+
+def new_game(store, rounds):
+    logic.deck_cache.put("p1", 1, DECK, None)
+    logic.deck_cache.put("p2", 1, DECK, None)
+    logic.rating_cache.put("p1", 0)
+    logic.rating_cache.put("p2", 0)
+    logic.process_matchmaking_request("p1", "p1", 1, store)
+    game_id = logic.process_matchmaking_request("p2", "p2", 1, store)["game_id"]
+    for _ in range(rounds):
+        game = store.get(game_id)
+        for player in (game.player1, game.player2):
+            logic.submit_card(game_id, player.uuid, player.hand.codes[0], store)
+    return game_id
+
+
+def timed(func, reads):
+    start = time.perf_counter()
+    for _ in range(reads):
+        func()
+    return (time.perf_counter() - start) / reads
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Letture ripetute con e senza cache delle risposte")
+    parser.add_argument("--reads", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=4)
+    args = parser.parse_args()
+
+    store = InMemoryGameStore()
+    logic.game_store = store
+    routes.controller.games = store
+    logic.TURN_TIMEOUT_SECONDS = 0
+    logic.BOT_FALLBACK_SECONDS = 0
+    logic._save_match_to_history = lambda game: None
+    routes.validate_user_token = lambda header: (header.split()[1], header.split()[1])
+    client = app.test_client()
+    game_id = new_game(store, args.rounds)
+
+    endpoints = (
+        ("state", f"/state/{game_id}",
+         lambda: logic.get_game_state(game_id, store),
+         lambda: logic.get_game_state_json(game_id, store)),
+        ("hand", f"/hand/{game_id}",
+         lambda: logic.get_player_hand(game_id, "p1", store),
+         lambda: logic.get_player_hand_json(game_id, "p1", store)),
+        ("view", f"/view/{game_id}",
+         lambda: logic.get_player_view(game_id, "p1", store),
+         lambda: logic.get_player_view_json(game_id, "p1", store)),
+    )
+    http_reads = max(1, args.reads // 10)
+    print(f"{'endpoint':<8} {'byte':>5} {'costruito µs':>13} {'cache µs':>9} {'req/s senza':>12} {'req/s cache':>12}")
+    for name, url, build, cached in endpoints:
+        size = len(client.get(url, headers=HEADERS).data)
+        build_us = timed(lambda: json.dumps(build(), sort_keys=True, separators=(",", ":")), args.reads) * 1e6
+        cached_us = timed(cached, args.reads) * 1e6
+
+        # Senza cache: ogni lookup manca (versione mai in cache)
+        original_get = logic.response_cache.get
+        logic.response_cache.get = lambda game_id, version, key: None
+        uncached_rps = 1 / timed(lambda: client.get(url, headers=HEADERS), http_reads)
+        logic.response_cache.get = original_get
+        cached_rps = 1 / timed(lambda: client.get(url, headers=HEADERS), http_reads)
+        print(f"{name:<8} {size:>5} {build_us:>13.1f} {cached_us:>9.1f} {uncached_rps:>12.0f} {cached_rps:>12.0f}")
+    print("cache:", logic.response_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Throughput del simulatore Monte-Carlo (game_engine/simulator.py) contro
+il percorso Python puro (modelli di models.py + tabella OUTCOME, una
+partita alla volta), con carte giocate a caso da entrambi i giocatori.
+
+Uso:  python docs/benchmarks/bench_simulator.py [--matches 1000000] [--python-matches 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+
+from game_engine import models, simulator  # noqa: E402
+from game_engine.cards import OUTCOME, PLAYER1, PLAYER2, DOUBLE_WIN  # noqa: E402
+
+DECK1 = [
+    {"value": "2", "suit": "hearts"}, {"value": "K", "suit": "hearts"},
+    {"value": "3", "suit": "diamonds"}, {"value": "Q", "suit": "diamonds"},
+    {"value": "4", "suit": "clubs"}, {"value": "J", "suit": "clubs"},
+    {"value": "5", "suit": "spades"}, {"value": "10", "suit": "spades"},
+    {"value": "JOKER", "suit": "none"},
+]
+DECK2 = [
+    {"value": "A", "suit": "hearts"}, {"value": "8", "suit": "hearts"},
+    {"value": "A", "suit": "diamonds"}, {"value": "8", "suit": "diamonds"},
+    {"value": "7", "suit": "clubs"}, {"value": "8", "suit": "clubs"},
+    {"value": "A", "suit": "spades"}, {"value": "8", "suit": "spades"},
+    {"value": "JOKER", "suit": "none"},
+]
+
+
+def python_match(rng):
+    p1, p2 = models.Player("p1", "P1"), models.Player("p2", "P2")
+    p1.deck, p2.deck = models.Deck.from_dict(DECK1), models.Deck.from_dict(DECK2)
+    rng.shuffle(p1.deck.codes)
+    rng.shuffle(p2.deck.codes)
+    for _ in range(simulator.OPENING_HAND):
+        p1.draw_card()
+        p2.draw_card()
+    while True:
+        c1 = p1.hand.codes.pop(rng.randrange(len(p1.hand)))
+        c2 = p2.hand.codes.pop(rng.randrange(len(p2.hand)))
+        outcome = OUTCOME[c1][c2]
+        p1.score += outcome in (PLAYER1, DOUBLE_WIN)
+        p2.score += outcome in (PLAYER2, DOUBLE_WIN)
+        if p1.score >= simulator.WINNING_SCORE or p2.score >= simulator.WINNING_SCORE:
+            return
+        if not p1.hand and not p1.deck:
+            return
+        p1.draw_card()
+        p2.draw_card()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del simulatore Monte-Carlo")
+    parser.add_argument("--matches", type=int, default=1_000_000)
+    parser.add_argument("--python-matches", type=int, default=20_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    start = time.perf_counter()
+    for _ in range(args.python_matches):
+        python_match(rng)
+    python_rate = args.python_matches / (time.perf_counter() - start)
+
+    print(f"{'percorso':<28} {'partite/s':>12} {'speedup':>8}")
+    print(f"{'python (una alla volta)':<28} {python_rate:>12.0f} {1:>7.1f}x")
+    for batch_size in (10_000, 100_000):
+        start = time.perf_counter()
+        result = simulator.simulate(DECK1, DECK2, args.matches, batch_size=batch_size, seed=0)
+        rate = args.matches / (time.perf_counter() - start)
+        print(f"{f'numpy (blocchi da {batch_size})':<28} {rate:>12.0f} {rate / python_rate:>7.1f}x")
+
+    stats = result.to_dict()
+    print(f"\nDECK1 vs DECK2: {stats['player1_win_rate']:.1%} / {stats['player2_win_rate']:.1%}"
+          f" (pareggi {stats['draw_rate']:.1%}), {stats['mean_rounds']:.2f} round in media")
+
+
+if __name__ == "__main__":
+    main()
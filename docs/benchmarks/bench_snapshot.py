@@ -0,0 +1,138 @@
+"""
+Snapshot e riavvio a caldo con molte partite attive (game_engine/snapshot.py).
+
+Crea --games partite a metà gioco nello store in memoria (deck assegnati,
+3 carte pescate, --rounds round giocati, metà delle partite con la carta
+del round corrente già giocata da un giocatore) più --queue giocatori in
+coda, poi misura:
+
+  - snapshot: codifica binaria (lock per partita) + scrittura atomica con fsync
+  - restore:  lettura e decodifica del file, poi logic.restore_snapshot
+              completo (partite nello store, scadenze di reaper e turni, coda)
+
+Per confronto: dimensione e tempi della stessa serializzazione in JSON
+(Game.to_dict, il formato usato dallo store Redis).
+
+Uso:  python docs/benchmarks/bench_snapshot.py [--games 50000] [--rounds 3] [--queue 1000]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+
+from game_engine import logic, models, snapshot  # noqa: E402
+from game_engine.cards import OUTCOME  # noqa: E402
+from game_engine.store import InMemoryGameStore  # noqa: E402
+
+DECK = [
+    {"value": "2", "suit": "hearts"}, {"value": "K", "suit": "hearts"},
+    {"value": "3", "suit": "diamonds"}, {"value": "Q", "suit": "diamonds"},
+    {"value": "4", "suit": "clubs"}, {"value": "J", "suit": "clubs"},
+    {"value": "5", "suit": "spades"}, {"value": "10", "suit": "spades"},
+    {"value": "JOKER", "suit": "none"},
+]
+
+
+def new_game(i, rounds, rng):
+    players = []
+    for n in (1, 2):
+        p = models.Player(uuid=str(uuid.uuid4()), name=f"player{n}-{i}")
+        p.deck = models.Deck.from_dict(DECK)
+        rng.shuffle(p.deck.codes)
+        players.append(p)
+    game = models.Game(*players)
+    for _ in range(3):
+        game.player1.draw_card()
+        game.player2.draw_card()
+    for _ in range(rounds):
+        for p in players:
+            game.current_round[p.uuid] = models.Card.from_code(p.hand.codes.pop(0))
+        c1, c2 = game.current_round[game.player1.uuid], game.current_round[game.player2.uuid]
+        game.resolve_round(OUTCOME[c1.code][c2.code])
+        game.version += 1
+        game.player1.draw_card()
+        game.player2.draw_card()
+    if i % 2:
+        game.current_round[game.player1.uuid] = models.Card.from_code(game.player1.hand.codes.pop(0))
+        game.missed_turns[game.player1.uuid] = 0
+    game.turn_deadline = time.time() + 60
+    return game
+
+
+def fill_store(store, games, rounds, queue):
+    rng = random.Random(42)
+    for i in range(games):
+        store.add(new_game(i, rounds, rng))
+    now = time.time()
+    for i in range(queue):
+        store.queue_join({
+            'uuid': str(uuid.uuid4()), 'name': f"waiting-{i}", 'deck_slot': 1, 'deck': DECK,
+            'deck_etag': '"1"', 'rating': rng.randint(0, 3000), 'joined_at': now,
+        })
+
+
+def timed(func, collect=True):
+    # collect=False: decodifiche senza garbage collector, come in restore_snapshot
+    if not collect:
+        gc.disable()
+    start = time.perf_counter()
+    try:
+        result = func()
+    finally:
+        gc.enable()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo di snapshot e restore con molte partite attive")
+    parser.add_argument("--games", type=int, default=50000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--queue", type=int, default=1000)
+    args = parser.parse_args()
+
+    logic.BOT_FALLBACK_SECONDS = 0
+    store = InMemoryGameStore()
+    fill_store(store, args.games, args.rounds, args.queue)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "snapshot.bin")
+        writer = snapshot.GameSnapshotter(path, store, 0)
+        data, encode_ms = timed(lambda: snapshot.encode_snapshot(store))
+        size, save_ms = timed(writer.save)
+        _, decode_ms = timed(lambda: snapshot.decode_snapshot(data), collect=False)
+
+        # Riavvio: store vuoto e restore completo dallo snapshot su disco
+        restored = InMemoryGameStore()
+        logic.game_store = restored
+        logic.reaper.store = restored
+        logic.snapshotter = snapshot.GameSnapshotter(path, restored, 0)
+        logic.SNAPSHOT_INTERVAL_SECONDS = 3600  # attivi, ma nessun salvataggio durante la misura
+        count, restore_ms = timed(logic.restore_snapshot)
+        logic.snapshotter.stop()
+        assert count == args.games and len(restored) == args.games and restored.queue_len() == args.queue
+        sample = store.game_ids()[:100]
+        assert all(restored.get(g).to_dict() | {"updated_at": 0, "turn_deadline": 0}
+                   == store.get(g).to_dict() | {"updated_at": 0, "turn_deadline": 0} for g in sample)
+
+    games = [store.get(g) for g in store.game_ids()]
+    json_data, json_encode_ms = timed(lambda: json.dumps([g.to_dict() for g in games]).encode())
+    _, json_decode_ms = timed(lambda: [models.Game.from_dict(d) for d in json.loads(json_data)], collect=False)
+
+    print(f"{args.games} partite attive ({args.rounds} round giocati), {args.queue} giocatori in coda")
+    print(f"{'formato':<8} {'MB':>7} {'byte/partita':>12} {'codifica ms':>12} {'decodifica ms':>14}")
+    print(f"{'binario':<8} {len(data) / 1e6:>7.1f} {len(data) / args.games:>12.0f} {encode_ms:>12.0f} {decode_ms:>14.0f}")
+    print(f"{'json':<8} {len(json_data) / 1e6:>7.1f} {len(json_data) / args.games:>12.0f} "
+          f"{json_encode_ms:>12.0f} {json_decode_ms:>14.0f}")
+    print(f"snapshot completo (codifica + scrittura atomica con fsync): {save_ms:.0f} ms, {size / 1e6:.1f} MB")
+    print(f"restore completo (lettura + decodifica + store + scadenze): {restore_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
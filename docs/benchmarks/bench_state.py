@@ -0,0 +1,102 @@
+"""
+Costo di un poll di GET /state/<game_id> durante la partita: risposta
+completa, incrementale (?since=<versione> dell'ultimo stato ricevuto) e
+partita non cambiata (If-None-Match -> 304).
+
+Per ogni round: byte della risposta (dall'app Flask, test client, con la
+validazione del token sostituita da una funzione locale) e tempo del
+lavoro del server per quella risposta (stato + codifica JSON, oppure il
+solo controllo di versione per il 304), senza l'overhead fisso di Flask.
+
+Uso:  python docs/benchmarks/bench_state.py [--polls 20000]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+
+# Outbox e snapshot in una cartella temporanea, non in data/ della cartella corrente
+DATA_DIR = tempfile.TemporaryDirectory(prefix="game-engine-")
+os.environ.setdefault("OUTBOX_PATH", os.path.join(DATA_DIR.name, "outbox.db"))
+os.environ.setdefault("SNAPSHOT_PATH", os.path.join(DATA_DIR.name, "snapshot.bin"))
+
+from game_engine import logic, routes  # noqa: E402
+from game_engine.app import app  # noqa: E402
+from game_engine.store import InMemoryGameStore  # noqa: E402
+
+DECK = [
+    {"value": "2", "suit": "hearts"}, {"value": "K", "suit": "hearts"},
+    {"value": "3", "suit": "diamonds"}, {"value": "Q", "suit": "diamonds"},
+    {"value": "4", "suit": "clubs"}, {"value": "J", "suit": "clubs"},
+    {"value": "5", "suit": "spades"}, {"value": "10", "suit": "spades"},
+    {"value": "JOKER", "suit": "none"},
+]
+HEADERS = {"Authorization": "Bearer p1"}
+
+
+def new_game(store):
+    logic.deck_cache.put("p1", 1, DECK, None)
+    logic.deck_cache.put("p2", 1, DECK, None)
+    logic.rating_cache.put("p1", 0)
+    logic.rating_cache.put("p2", 0)
+    logic.process_matchmaking_request("p1", "p1", 1, store)
+    return logic.process_matchmaking_request("p2", "p2", 1, store)["game_id"]
+
+
+def play_round(store, game_id):
+    """Un round: entrambi i giocatori giocano la prima carta in mano."""
+    game = store.get(game_id)
+    for player in (game.player1, game.player2):
+        logic.submit_card(game_id, player.uuid, player.hand.codes[0], store)
+
+
+def timed(func, polls):
+    start = time.perf_counter()
+    for _ in range(polls):
+        func()
+    return (time.perf_counter() - start) / polls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Costo di un poll di /state")
+    parser.add_argument("--polls", type=int, default=20000)
+    args = parser.parse_args()
+
+    store = InMemoryGameStore()
+    logic.game_store = store
+    routes.controller.games = store
+    logic.TURN_TIMEOUT_SECONDS = 0
+    logic.BOT_FALLBACK_SECONDS = 0
+    logic._save_match_to_history = lambda game: None
+    routes.validate_user_token = lambda header: (header.split()[1], header.split()[1])
+    client = app.test_client()
+
+    game_id = new_game(store)
+    print(f"{'round':>5} {'completo µs':>12} {'byte':>6} {'since µs':>9} {'byte':>6} {'304 µs':>7} {'byte':>5}")
+    previous = 0
+    while True:
+        game = store.get(game_id)
+        if game.winner or not game.player1.hand:
+            break
+        url = f"/state/{game_id}"
+        full_bytes = len(client.get(url, headers=HEADERS).data)
+        since_bytes = len(client.get(f"{url}?since={previous}", headers=HEADERS).data)
+        response = client.get(url, headers={**HEADERS, "If-None-Match": f'"{game.version}"'})
+        assert response.status_code == 304
+        cached_bytes = len(response.data)
+
+        full_us = timed(lambda: json.dumps(logic.get_game_state(game_id, store)), args.polls)
+        since_us = timed(lambda: json.dumps(logic.get_game_state(game_id, store, previous)), args.polls)
+        cached_us = timed(lambda: str(store.get_version(game_id)) == str(game.version), args.polls)
+        print(f"{game.turn_number:>5} {full_us:>12.1f} {full_bytes:>6} {since_us:>9.1f} {since_bytes:>6} "
+              f"{cached_us:>7.1f} {cached_bytes:>5}")
+        previous = game.version
+        play_round(store, game_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Locust: partite complete giocate direttamente contro il game engine (senza
+gateway), usato da bench_asgi.py per confrontare l'app Flask (WSGI) e il
+server ASGI.
+
+Ogni utente Locust è un giocatore nuovo a ogni partita: join, long-poll di
+/match/status finché non trova un avversario, poi /view (con If-None-Match)
+e /play fino alla fine della partita. Ogni partita finita viene registrata
+come richiesta "GAME finished" (tempo = durata della partita).
+
+Il token è il nome del giocatore: user-manager, collection e game_history
+sono simulati da bench_asgi.py.
+
+Uso:  locust -f docs/benchmarks/locust_game_engine.py --host http://127.0.0.1:5000 --headless -u 200 -r 50 -t 60s
+"""
+import time
+import uuid
+
+from locust import HttpUser, constant, task
+
+POLL_SECONDS = 0.1  # attesa tra due /view quando tocca all'avversario
+
+
+class Player(HttpUser):
+    wait_time = constant(0)
+
+    @task
+    def play_match(self):
+        name = f"load-{uuid.uuid4().hex[:12]}"
+        headers = {"Authorization": f"Bearer {name}"}
+        started = time.perf_counter()
+
+        with self.client.post("/match/join", json={"deck_slot": 1}, headers=headers,
+                              name="/match/join", catch_response=True) as response:
+            if response.status_code != 200:
+                response.failure(f"join {response.status_code}: {response.text[:100]}")
+                return
+            game_id = response.json().get("game_id")
+
+        while not game_id:
+            with self.client.get("/match/status?wait=10", headers=headers,
+                                 name="/match/status", catch_response=True) as response:
+                data = response.json() if response.status_code == 200 else {}
+                if data.get("status") == "error" or response.status_code != 200:
+                    response.failure(f"status {response.status_code}: {response.text[:100]}")
+                    return
+                game_id = data.get("game_id")
+
+        etag = None
+        while True:
+            view_headers = {**headers, "If-None-Match": etag} if etag else headers
+            with self.client.get(f"/view/{game_id}", headers=view_headers,
+                                 name="/view", catch_response=True) as response:
+                if response.status_code == 304:
+                    response.success()
+                    time.sleep(POLL_SECONDS)
+                    continue
+                if response.status_code != 200:
+                    response.failure(f"view {response.status_code}: {response.text[:100]}")
+                    return
+                view = response.json()
+                etag = response.headers.get("ETag")
+
+            if view["winner"]:
+                self.environment.events.request.fire(
+                    request_type="GAME", name="finished", response_time=(time.perf_counter() - started) * 1000,
+                    response_length=0, exception=None, context={})
+                return
+            if view["played"] or not view["hand"]:
+                time.sleep(POLL_SECONDS)
+                continue
+
+            with self.client.post(f"/play/{game_id}", json={"card": view["hand"][0]}, headers=headers,
+                                  name="/play", catch_response=True) as response:
+                if response.status_code != 200:
+                    response.failure(f"play {response.status_code}: {response.text[:100]}")
+                    return
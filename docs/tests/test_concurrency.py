@@ -0,0 +1,214 @@
+"""
+Stress test di concorrenza del game engine (in-process, senza docker).
+
+Per ogni numero di thread:
+  1. 2*N giocatori entrano in matchmaking in parallelo -> N partite
+  2. i thread giocano tutte le partite in parallelo: le due carte di ogni
+     round vengono inviate contemporaneamente da thread diversi
+  3. vengono verificati gli invarianti (nessun doppio abbinamento, round
+     risolti una sola volta, carte e punteggi coerenti)
+
+La latenza di rete di una richiesta reale (validazione token, ecc.) è
+simulata con --io-latency, fuori dai lock. Con latenza > 0 lo speedup viene
+soprattutto dalle sleep sovrapposte, quindi ogni configurazione gira anche
+con un solo lock globale (registro a 1 shard, stesso lock per tutte le
+partite e per il matchmaking): il confronto sharded/globale a parità di
+thread, in particolare con --io-latency 0, misura il solo effetto dello
+sharding. In un solo processo CPython il GIL serializza comunque il lavoro
+in memoria: con latenza 0 ci si aspetta "vs global" vicino a 1x, e lo
+sharding conta solo quando dentro il lock c'è attesa che rilascia il GIL.
+
+Uso:  python docs/tests/test_concurrency.py [--games 200] [--threads 1,2,4,8,16]
+                                            [--io-latency 0,0.002] [--locking sharded,global]
+"""
+import argparse
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src"))
+
+# Outbox e snapshot in una cartella temporanea, non in data/ della cartella corrente
+DATA_DIR = tempfile.TemporaryDirectory(prefix="game-engine-")
+os.environ.setdefault("OUTBOX_PATH", os.path.join(DATA_DIR.name, "outbox.db"))
+os.environ.setdefault("SNAPSHOT_PATH", os.path.join(DATA_DIR.name, "snapshot.bin"))
+
+from game_engine import logic  # noqa: E402
+from game_engine.store import InMemoryGameStore  # noqa: E402
+
+# Deck valido (8 carte + Joker, 2 per seme, somma per seme <= 15)
+DECK = [
+    {"value": "2", "suit": "hearts"}, {"value": "K", "suit": "hearts"},
+    {"value": "3", "suit": "diamonds"}, {"value": "Q", "suit": "diamonds"},
+    {"value": "4", "suit": "clubs"}, {"value": "J", "suit": "clubs"},
+    {"value": "5", "suit": "spades"}, {"value": "10", "suit": "spades"},
+    {"value": "JOKER", "suit": "none"},
+]
+
+failures = []
+
+
+class GlobalLockStore(InMemoryGameStore):
+    """Store di confronto: un solo lock per tutte le partite e per il matchmaking."""
+
+    def __init__(self):
+        super().__init__(shards=1)
+        self._global_lock = threading.RLock()
+
+    def game_lock(self, game_id):
+        return self._global_lock
+
+    def matchmaking_lock(self):
+        return self._global_lock
+
+
+def check(condition, message):
+    if not condition:
+        failures.append(message)
+
+
+def run(num_games, num_threads, io_latency, locking="sharded"):
+    # Stato pulito a ogni giro
+    store = GlobalLockStore() if locking == "global" else InMemoryGameStore()
+    logic.game_store = store
+    logic.reaper.store = store
+    logic.deck_cache.clear()
+    published = []
+    logic._save_match_to_history = lambda game: published.append(game.game_id)
+
+    users = [f"user-{locking}-{io_latency}-{num_threads}-{i}" for i in range(2 * num_games)]
+    for u in users:
+        # Deck già validato e rating in cache: nessuna chiamata a collection e game_history
+        logic.deck_cache.put(u, 1, DECK, None)
+        logic.rating_cache.put(u, 0)
+
+    # --- 1. Matchmaking concorrente ---
+    join_queue = queue.Queue()
+    for u in users:
+        join_queue.put(u)
+    matched = {}
+    matched_lock = threading.Lock()
+
+    def join_worker():
+        while True:
+            try:
+                u = join_queue.get_nowait()
+            except queue.Empty:
+                return
+            time.sleep(io_latency)
+            result = logic.process_matchmaking_request(u, u, 1, store)
+            if result["status"] == "matched":
+                with matched_lock:
+                    matched[result["game_id"]] = result
+
+    _run_threads(join_worker, num_threads)
+
+    game_ids = list(matched)
+    check(len(game_ids) == num_games, f"[{num_threads}t] {len(game_ids)} partite create, attese {num_games}")
+    check(store.queue_len() == 0, f"[{num_threads}t] {store.queue_len()} giocatori rimasti in coda")
+    seen = Counter()
+    for gid in game_ids:
+        game = store.get(gid)
+        seen[game.player1.uuid] += 1
+        seen[game.player2.uuid] += 1
+    check(all(c == 1 for c in seen.values()) and len(seen) == len(users),
+          f"[{num_threads}t] giocatori abbinati più volte o mai abbinati")
+
+    # --- 2. Partite giocate in parallelo ---
+    plays = queue.Queue()
+    for gid in game_ids:
+        game = store.get(gid)
+        plays.put((gid, game.player1.uuid))
+        plays.put((gid, game.player2.uuid))
+    remaining = [len(game_ids)]
+    remaining_lock = threading.Lock()
+    play_count = [0]
+
+    def play_worker():
+        while True:
+            item = plays.get()
+            if item is None:
+                return
+            gid, player_uuid = item
+            time.sleep(io_latency)
+            card = logic.get_player_hand(gid, player_uuid, store)[0]
+            result = logic.submit_card(gid, player_uuid, card, store)
+            with remaining_lock:
+                play_count[0] += 1
+            if result["status"] == "resolved":
+                # Chi risolve il round fa partire il successivo: di nuovo due carte in parallelo
+                game = store.get(gid)
+                plays.put((gid, game.player1.uuid))
+                plays.put((gid, game.player2.uuid))
+            elif result["status"] == "finished":
+                with remaining_lock:
+                    remaining[0] -= 1
+                    if remaining[0] == 0:
+                        for _ in range(num_threads):
+                            plays.put(None)
+
+    start = time.perf_counter()
+    _run_threads(play_worker, num_threads)
+    elapsed = time.perf_counter() - start
+
+    # --- 3. Invarianti ---
+    for gid in game_ids:
+        game = store.get(gid)
+        check(game.winner is not None, f"[{num_threads}t] partita {gid} non finita")
+        check([t["turn"] for t in game.turns] == list(range(1, game.turn_number + 1)),
+              f"[{num_threads}t] turni duplicati o mancanti in {gid}")
+        played = Counter(uuid for t in game.turns for uuid in t["cards"])
+        for p in (game.player1, game.player2):
+            total = len(p.hand) + len(p.deck.cards) + played[p.uuid]
+            check(total == len(DECK), f"[{num_threads}t] {p.uuid}: {total} carte invece di {len(DECK)}")
+            wins = sum(1 for t in game.turns if t["winner"] in (p.name, "both"))
+            check(wins == p.score, f"[{num_threads}t] {p.uuid}: punteggio {p.score}, round vinti {wins}")
+    check(len(published) == num_games, f"[{num_threads}t] {len(published)} partite inviate allo storico, attese {num_games}")
+
+    return play_count[0], elapsed
+
+
+def _run_threads(target, count):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress test di concorrenza del game engine")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--threads", default="1,2,4,8,16")
+    parser.add_argument("--io-latency", default="0,0.002", help="secondi di latenza simulata per richiesta (lista)")
+    parser.add_argument("--locking", default="sharded,global", help="sharded (lock per partita) e/o global")
+    args = parser.parse_args()
+    thread_counts = [int(x) for x in args.threads.split(",")]
+    modes = args.locking.split(",")
+
+    for io_latency in [float(x) for x in args.io_latency.split(",")]:
+        print(f"\n--io-latency {io_latency}")
+        print(f"{'lock':>8} {'thread':>7} {'giocate':>8} {'secondi':>8} {'giocate/s':>10} {'speedup':>8} {'vs global':>10}")
+        results = {(mode, n): run(args.games, n, io_latency, mode) for mode in modes for n in thread_counts}
+        rates = {key: count / elapsed for key, (count, elapsed) in results.items()}
+        for (mode, n), (count, elapsed) in results.items():
+            rate = rates[mode, n]
+            # speedup rispetto allo stesso lock con il primo numero di thread
+            speedup = rate / rates[mode, thread_counts[0]]
+            versus = f"{rate / rates['global', n]:>9.2f}x" if ("global", n) in rates else f"{'-':>10}"
+            print(f"{mode:>8} {n:>7} {count:>8} {elapsed:>8.2f} {rate:>10.0f} {speedup:>7.1f}x {versus}")
+
+    if failures:
+        print(f"\n❌ {len(failures)} violazioni:")
+        for f in failures[:20]:
+            print(f"   - {f}")
+        sys.exit(1)
+    print("\n✅ Nessuna corruzione dello stato")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Request
-from utils import forward_request
+from fastapi import APIRouter, Request, WebSocket
+from utils import forward_request, forward_stream, forward_websocket
 
 
 GAME_URL = 'https://game_engine:5000'  # URL interno del microservizio Game Engine
+GAME_WS_URL = 'wss://game_engine:5000'
+LONG_POLL_MAX_WAIT = 60  # secondi massimi di attesa accettati per /match/status?wait=N
 
 router = APIRouter()
+# Solo route esplicite: gli endpoint /internal/* del game engine (invalidazione
+# della cache deck, metriche) non hanno autenticazione e non vanno mai inoltrati
 
 # Matchmaking
 @router.post("/match/join")
@@ -15,6 +19,23 @@ async def game_join(request: Request):
 @router.get("/match/status")
 async def game_status(request: Request):
     URL = GAME_URL + '/match/status'
+    # Long-poll (?wait=N): il timeout verso il game engine deve superare l'attesa
+    try:
+        wait = min(max(float(request.query_params.get('wait', 0)), 0), LONG_POLL_MAX_WAIT)
+    except ValueError:
+        wait = 0
+    timeout = wait + 10 if wait else None
+    return await forward_request(request, URL, body_data=None, timeout=timeout)
+
+@router.post("/match/leave")
+async def game_leave(request: Request):
+    URL = GAME_URL + '/match/leave'
+    return await forward_request(request, URL, body_data=None)
+
+# Forza precalcolata del deck nello slot (?slot=N)
+@router.get("/deck/rating")
+async def game_deck_rating(request: Request):
+    URL = GAME_URL + '/deck/rating'
     return await forward_request(request, URL, body_data=None)
 
 # Gameplay
@@ -36,4 +57,22 @@ async def game_play(game_id: str, request: Request):
 @router.get("/state/{game_id}")
 async def game_state(game_id: str, request: Request):
     URL = f"{GAME_URL}/state/{game_id}"
-    return await forward_request(request, URL, body_data=None)
\ No newline at end of file
+    return await forward_request(request, URL, body_data=None)
+
+# Mano e stato della partita per il giocatore in una sola richiesta
+@router.get("/view/{game_id}")
+async def game_view(game_id: str, request: Request):
+    URL = f"{GAME_URL}/view/{game_id}"
+    return await forward_request(request, URL, body_data=None)
+
+# Stream Server-Sent Events della partita (passthrough senza buffering)
+@router.get("/events/{game_id}")
+async def game_events(game_id: str, request: Request):
+    URL = f"{GAME_URL}/events/{game_id}"
+    return await forward_stream(request, URL)
+
+# Canale WebSocket di gioco (autenticazione una volta, giocate e eventi sulla stessa connessione)
+@router.websocket("/ws/{game_id}")
+async def game_socket(game_id: str, websocket: WebSocket):
+    URL = f"{GAME_WS_URL}/ws/{game_id}"
+    await forward_websocket(websocket, URL)
\ No newline at end of file
@@ -1,11 +1,13 @@
 import collection, users, game_engine, history, usereditor
 from fastapi import FastAPI
+from utils import lifespan
 
 
 app = FastAPI(
     title="Api Gateway Client Side", 
     description="Handles user registration, JWT login, and core user data management.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # User manager routes
@@ -1,8 +1,12 @@
+import asyncio
 import httpx
 import ssl
 import os
-from fastapi import Request, HTTPException, status
-from fastapi.responses import Response
+import websockets
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
 from urllib.parse import urlparse
 
 SERVICE_CERTS = {
@@ -13,34 +17,112 @@ SERVICE_CERTS = {
     "user-editor": "/run/secrets/user_editor_cert",
 }
 
-# ❌ RIMUOVI O COMMENTA IL CLIENT GLOBALE
-# http_client = httpx.AsyncClient(timeout=10.0) 
+# --- Configurazione del pool di connessioni verso i microservizi ---
+# Limiti del pool (per ogni upstream)
+MAX_CONNECTIONS = int(os.environ.get("GATEWAY_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("GATEWAY_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.environ.get("GATEWAY_KEEPALIVE_EXPIRY", "30"))
 
-async def forward_request(request: Request, internal_url: str, body_data: dict = None, is_json: bool = True) -> Response:
-    headers = dict(request.headers)
-    headers.pop('host', None)
-    headers.pop('content-length', None)
+# Timeout di default e override per singolo upstream.
+# Si possono sovrascrivere con variabili d'ambiente, es. GAME_ENGINE_TIMEOUT=45
+DEFAULT_TIMEOUT = float(os.environ.get("GATEWAY_DEFAULT_TIMEOUT", "10"))
+UPSTREAM_TIMEOUTS = {
+    "user-manager": 5.0,
+    "user-editor": 10.0,
+    "collection": 10.0,
+    "game_history": 10.0,
+    "game_engine": 10.0,
+}
 
-    parsed_url = urlparse(internal_url)
-    hostname = parsed_url.hostname
-    cert_path = SERVICE_CERTS.get(hostname)
+# HTTP/2 viene negoziato via ALPN: se l'upstream non lo supporta
+# httpx ricade automaticamente su HTTP/1.1 (es. GAME_ENGINE_HTTP2=false per disabilitarlo)
+HTTP2_ENABLED = os.environ.get("GATEWAY_HTTP2", "true").lower() == "true"
+
+# Un client persistente (keep-alive) per ogni hostname upstream
+_clients = {}
+
+
+def _env_name(hostname: str, suffix: str) -> str:
+    return f"{hostname.replace('-', '_').upper()}_{suffix}"
 
-    # 1. Determina la strategia di verifica SSL
-    verify_option = False # Default (insicuro)
+
+def _upstream_timeout(hostname: str) -> float:
+    default = UPSTREAM_TIMEOUTS.get(hostname, DEFAULT_TIMEOUT)
+    return float(os.environ.get(_env_name(hostname, "TIMEOUT"), default))
+
+
+def _upstream_http2(hostname: str) -> bool:
+    return os.environ.get(_env_name(hostname, "HTTP2"), str(HTTP2_ENABLED)).lower() == "true"
+
+
+def _verify_option(hostname: str):
+    """Determina la strategia di verifica SSL per un upstream."""
+    cert_path = SERVICE_CERTS.get(hostname)
 
     if cert_path and os.path.exists(cert_path):
         try:
             ssl_context = ssl.create_default_context(cafile=cert_path)
             ssl_context.check_hostname = False # Decommenta se hai problemi di Hostname Mismatch
-            verify_option = ssl_context
             print(f"Using SSL Context with cert: {cert_path}")
+            return ssl_context
         except Exception as e:
             print(f"Error loading cert {cert_path}: {e}")
-            verify_option = False 
     elif cert_path:
         print(f"⚠️ Certificate path configured but file missing: {cert_path}")
 
-    # 2. Prepara i kwargs (SENZA 'verify' e SENZA 'timeout', li mettiamo nel Client)
+    return False # Default (insicuro)
+
+
+def _build_client(hostname: str) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        verify=_verify_option(hostname),
+        timeout=_upstream_timeout(hostname),
+        limits=limits,
+        http2=_upstream_http2(hostname),
+    )
+
+
+def get_client(hostname: str) -> httpx.AsyncClient:
+    """Restituisce il client pooled per l'upstream, creandolo se necessario."""
+    client = _clients.get(hostname)
+    if client is None or client.is_closed:
+        client = _build_client(hostname)
+        _clients[hostname] = client
+    return client
+
+
+async def open_clients():
+    for hostname in SERVICE_CERTS:
+        get_client(hostname)
+
+
+async def close_clients():
+    for client in list(_clients.values()):
+        await client.aclose()
+    _clients.clear()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Client creati una sola volta all'avvio e chiusi allo shutdown
+    await open_clients()
+    yield
+    await close_clients()
+
+
+async def forward_request(request: Request, internal_url: str, body_data: dict = None, is_json: bool = True, timeout: float = None) -> Response:
+    headers = dict(request.headers)
+    headers.pop('host', None)
+    headers.pop('content-length', None)
+
+    hostname = urlparse(internal_url).hostname
+
+    # 1. Prepara i kwargs (verify, timeout e pool sono nel Client)
     request_kwargs = {
         "method": request.method,
         "url": internal_url,
@@ -48,7 +130,7 @@ async def forward_request(request: Request, internal_url: str, body_data: dict =
         "params": request.query_params,
     }
 
-    # 3. Gestione Body
+    # 2. Gestione Body
     if body_data is not None:
         if is_json:
             request_kwargs['json'] = body_data
@@ -57,15 +139,18 @@ async def forward_request(request: Request, internal_url: str, body_data: dict =
     else:
         request_kwargs['content'] = None
 
-    # 4. ESECUZIONE RICHIESTA
-    # Creiamo un client "usa e getta" configurato specificamente per QUESTO certificato
+    # Timeout specifico per la singola richiesta (es. long-poll)
+    if timeout is not None:
+        request_kwargs['timeout'] = timeout
+
+    # 3. ESECUZIONE RICHIESTA sul client persistente dell'upstream
     try:
-        async with httpx.AsyncClient(verify=verify_option, timeout=10.0) as client:
-            response = await client.request(**request_kwargs)
-            
+        client = get_client(hostname)
+        response = await client.request(**request_kwargs)
+
         # Controllo errori HTTP (4xx, 5xx del servizio target)
         response.raise_for_status()
-        
+
         return Response(
             content=response.content,
             status_code=response.status_code,
@@ -92,4 +177,105 @@ async def forward_request(request: Request, internal_url: str, body_data: dict =
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Target service not reachable"
-        )
\ No newline at end of file
+        )
+
+
+async def forward_stream(request: Request, internal_url: str) -> Response:
+    """
+    Inoltra una risposta in streaming (es. Server-Sent Events) senza bufferizzarla:
+    i byte vengono passati al client man mano che arrivano dal microservizio.
+    """
+    headers = dict(request.headers)
+    headers.pop('host', None)
+    headers.pop('content-length', None)
+
+    hostname = urlparse(internal_url).hostname
+    client = get_client(hostname)
+
+    # Nessun timeout di lettura: lo stream resta aperto per tutta la partita
+    upstream_request = client.build_request(
+        "GET",
+        internal_url,
+        headers=headers,
+        params=request.query_params,
+        timeout=httpx.Timeout(_upstream_timeout(hostname), read=None),
+    )
+
+    try:
+        response = await client.send(upstream_request, stream=True)
+    except httpx.ConnectError as e:
+        print(f"❌ Connection/SSL Error contacting {internal_url}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"SSL Handshake failed or host unreachable: {str(e)}"
+        )
+    except httpx.RequestError as e:
+        print(f"Generic Request Error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Target service not reachable"
+        )
+
+    # Errori (401, 400...) inoltrati come risposta normale
+    if response.status_code != 200:
+        content = await response.aread()
+        await response.aclose()
+        return Response(content=content, status_code=response.status_code, headers=response.headers)
+
+    return StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        media_type=response.headers.get("content-type", "text/event-stream"),
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(response.aclose),
+    )
+
+
+async def forward_websocket(websocket: WebSocket, internal_url: str):
+    """
+    Inoltra una connessione WebSocket al microservizio (wss://...) e
+    copia i messaggi in entrambe le direzioni finché uno dei due lati chiude.
+    """
+    await websocket.accept()
+
+    parsed_url = urlparse(internal_url)
+    ssl_context = _verify_option(parsed_url.hostname) if parsed_url.scheme == "wss" else None
+    if ssl_context is False:
+        # Stesso comportamento di forward_request quando il certificato manca
+        ssl_context = ssl.create_default_context()
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+
+    headers = {}
+    if "authorization" in websocket.headers:
+        headers["Authorization"] = websocket.headers["authorization"]
+
+    try:
+        async with websockets.connect(internal_url, ssl=ssl_context, extra_headers=headers) as upstream:
+
+            async def client_to_upstream():
+                while True:
+                    await upstream.send(await websocket.receive_text())
+
+            async def upstream_to_client():
+                async for message in upstream:
+                    await websocket.send_text(message)
+
+            tasks = [asyncio.create_task(client_to_upstream()), asyncio.create_task(upstream_to_client())]
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            for task in done:
+                # WebSocketDisconnect / ConnectionClosed sono la normale chiusura
+                if task.exception() and not isinstance(task.exception(), (WebSocketDisconnect, websockets.ConnectionClosed)):
+                    print(f"WebSocket relay error: {task.exception()}")
+
+    except (OSError, websockets.InvalidHandshake) as e:
+        print(f"❌ WebSocket connection error contacting {internal_url}: {e}")
+        await websocket.close(code=1011)
+        return
+
+    try:
+        await websocket.close()
+    except RuntimeError:
+        pass  # già chiusa dal client
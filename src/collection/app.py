@@ -1,8 +1,10 @@
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory
 from pymongo import MongoClient
 from bson import ObjectId
+import hashlib
 import json
 from utilities import require_auth, validate_user_token
+import utilities
 import os
 
 app = Flask(__name__)
@@ -35,6 +37,11 @@ def load_cards():
     with open('cards/cards.json', 'r') as f:
         return json.load(f)
 
+# versione di un mazzo: cambia se il mazzo nello slot viene sostituito o modificato
+def deck_etag(deck):
+    fingerprint = f"{deck['_id']}:{','.join(deck.get('cards', []))}"
+    return hashlib.sha256(fingerprint.encode()).hexdigest()[:32]
+
 # serialize ObjectId to string
 def serialize_deck(deck):
     if deck and '_id' in deck:
@@ -186,6 +193,9 @@ def create_deck(user_id, username):
         result = decks_collection.insert_one(new_deck)
         new_deck['_id'] = str(result.inserted_id)
 
+        # il deck nello slot è cambiato: il game-engine non deve più usare la copia in cache
+        utilities.notify_deck_changed(user_id, deck_slot)
+
         return jsonify({'success': True, 'message': 'Deck created successfully', 'data': new_deck}), 201
     
     except Exception as e:
@@ -213,6 +223,7 @@ def delete_deck(user_id, username, deck_id):
         
         # elimina il deck
         decks_collection.delete_one({'_id': oid})
+        utilities.notify_deck_changed(user_id, deck.get('slot'))
         return jsonify({'success': True, 'message': 'Deck deleted successfully'}), 200
     
     except Exception as e:
@@ -255,6 +266,13 @@ def get_deck_by_query():
         if not deck:
             return jsonify({'success': False, 'error': 'Deck not found in this slot'}), 404
 
+        # il game-engine rimanda l'ETag del mazzo che ha già: se non è cambiato risponde 304
+        etag = deck_etag(deck)
+        if request.if_none_match.contains(etag):
+            not_modified = Response(status=304)
+            not_modified.set_etag(etag)
+            return not_modified
+
         populated_cards = []
         for card_id in deck.get('cards', []):
             if card_id in cards_dict:
@@ -271,7 +289,9 @@ def get_deck_by_query():
             app.logger.error(f"Deck {deck['_id']} for user {user_id} is incomplete. Found {len(populated_cards)-1} cards.")
             return jsonify({'success': False, 'error': 'Deck data is corrupt or incomplete'}), 500
 
-        return jsonify({'success': True, 'data': populated_cards}), 200
+        response = jsonify({'success': True, 'data': populated_cards})
+        response.set_etag(etag)
+        return response, 200
 
     except Exception as e:
         app.logger.error(f"Error in get_deck_by_query: {e}")
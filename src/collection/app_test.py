@@ -17,6 +17,7 @@ def mock_db_conn():
 
 # Imposta i mock
 utils.mock_token_validator = mock_token_validator
+utils.notify_deck_changed = lambda user_id, slot: None  # nessun game-engine nei test
 main_app.mock_db_conn = mock_db_conn
 
 # Configura l'app per i test
@@ -4,6 +4,8 @@ import requests
 import os
 
 USER_MANAGER_URL = os.environ.get('USER_MANAGER_URL', 'https://user-manager:5000')
+GAME_ENGINE_URL = os.environ.get('GAME_ENGINE_URL', 'https://game_engine:5000')
+GAME_ENGINE_CERT = os.environ.get('GAME_ENGINE_CERT', '/run/secrets/game_engine_cert')
 
 def validate_user_token(token_header: str):
     """
@@ -61,4 +63,23 @@ def require_auth(f):
         # Inietta user_id e username nella funzione
         return f(user_id=user_id, username=username, *args, **kwargs)
     
-    return decorated_function
\ No newline at end of file
+    return decorated_function
+
+
+def notify_deck_changed(user_id, slot):
+    """
+    Avvisa il game-engine che il deck di uno slot è stato sostituito o
+    cancellato, così può rimuoverlo dalla sua cache.
+    Best effort: un errore non deve far fallire l'operazione sul deck.
+    """
+    try:
+        requests.post(
+            f"{GAME_ENGINE_URL}/internal/decks/invalidate",
+            json={'user': user_id, 'slot': slot},
+            timeout=2,
+            verify=GAME_ENGINE_CERT
+        )
+    except Exception as e:
+        # Anche errori locali (es. GAME_ENGINE_CERT mancante: OSError da verify):
+        # il deck è già stato scritto su Mongo e la cache scade comunque per TTL
+        print(f"Impossibile invalidare la cache deck del game-engine: {e}")
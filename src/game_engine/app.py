@@ -1,5 +1,8 @@
+import threading
 from flask import Flask
 from .routes import game_blueprint
+from .publisher import match_publisher
+from .logic import restore_snapshot
 from flask_swagger_ui import get_swaggerui_blueprint
 
 app = Flask(__name__)
@@ -17,5 +20,30 @@ app.register_blueprint(swaggerui_blueprint, url_prefix=SWAGGER_URL)
 # Registrazione Blueprint Gioco
 app.register_blueprint(game_blueprint)
 
+_services_started = False
+_services_lock = threading.Lock()
+
+
+@app.before_request
+def start_services():
+    """
+    Avvio alla prima richiesta, non all'import: importare l'app (test,
+    benchmark) non apre outbox e snapshot nella cartella corrente.
+    (Il server ASGI fa lo stesso nel lifespan, vedi asgi.py.)
+    """
+    global _services_started
+    if _services_started:
+        return
+    with _services_lock:
+        if _services_started:
+            return
+        # Riavvio a caldo: partite e coda dall'ultimo snapshot, poi snapshot periodici
+        restore_snapshot()
+        # Avvio del publisher RabbitMQ: rispedisce subito le partite rimaste nell'outbox
+        match_publisher.start()
+        _services_started = True
+
+
 if __name__ == '__main__':
+    start_services()
     app.run(debug=False, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,282 @@
+"""
+Server ASGI del game engine (FastAPI, avviato con uvicorn, vedi Dockerfile).
+
+Stessi endpoint e stesse risposte JSON dell'app Flask (routes.py / app.py,
+che resta per lo sviluppo locale e i confronti di carico): cambia solo il
+modo di aspettare. Validazione del token, deck e rating arrivano dagli
+altri servizi con client httpx asincroni (async_logic.py); SSE, WebSocket
+e long-poll di /match/status aspettano nell'event loop invece di tenere
+fermo un thread per client. Le operazioni sulle partite restano quelle di
+logic.py (vedi async_logic.run_sync); parametri, errori -> status, ETag e
+messaggi del WebSocket sono quelli di handlers.py, condivisi con routes.py.
+"""
+import asyncio
+import json
+import os
+import queue
+from contextlib import asynccontextmanager
+
+import anyio
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.openapi.docs import get_swagger_ui_html
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+
+from . import async_logic, handlers
+from .async_logic import run_sync
+from .logic import (
+    submit_card,
+    get_game_state_json,
+    get_player_hand_json,
+    get_player_view_json,
+    leave_matchmaking,
+    get_metrics,
+    restore_snapshot,
+    save_snapshot,
+)
+from .events import event_bus, format_sse, GAME_FINISHED, GAME_EXPIRED
+from .publisher import match_publisher
+from .store import game_store
+from .config import SSE_HEARTBEAT_SECONDS, WS_AUTH_TIMEOUT, ASGI_SYNC_WORKERS
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+
+async def _json_body(request):
+    """Body JSON della richiesta, None se assente o non valido (come request.get_json(silent=True))."""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+class AsyncGameController:
+    def __init__(self):
+        # Partite condivise tra i worker se GAME_STORE_BACKEND=redis (vedi store.py)
+        self.games = game_store
+
+    async def choose_deck(self, game_id: str, request: Request):
+        async def call(user_uuid, _):
+            deck_slot = handlers.json_field(await _json_body(request), "deck_slot")
+            return await async_logic.select_deck(game_id, user_uuid, deck_slot, self.games)
+        return await self._handle(request, "choose_deck", call)
+
+    async def deck_rating(self, request: Request):
+        async def call(user_uuid, _):
+            deck_slot = handlers.query_number(request.query_params, "slot", int)
+            return await async_logic.get_deck_rating(user_uuid, deck_slot)
+        return await self._handle(request, "deck_rating", call)
+
+    async def play_turn(self, game_id: str, request: Request):
+        async def call(user_uuid, _):
+            card = handlers.json_field(await _json_body(request), "card")
+            return await run_sync(submit_card, game_id, user_uuid, card, self.games)
+        return await self._handle(request, "play_turn", call)
+
+    async def get_hand(self, game_id: str, request: Request):
+        compact = handlers.is_compact(request.query_params)
+        return await self._handle(request, "get_hand", lambda user_uuid, _: self._versioned_json(
+            request, game_id, user_uuid, get_player_hand_json, game_id, user_uuid, self.games, compact))
+
+    async def get_state(self, game_id: str, request: Request):
+        # ?since=<versione>: solo i turni risolti dopo quella versione
+        since = handlers.query_number(request.query_params, "since", int)
+        return await self._handle(request, "get_state", lambda user_uuid, _: self._versioned_json(
+            request, game_id, user_uuid, get_game_state_json, game_id, self.games, since))
+
+    async def get_view(self, game_id: str, request: Request):
+        """Mano del giocatore + stato della partita in una sola richiesta (un solo controllo del token)."""
+        compact = handlers.is_compact(request.query_params)
+        return await self._handle(request, "get_view", lambda user_uuid, _: self._versioned_json(
+            request, game_id, user_uuid, get_player_view_json, game_id, user_uuid, self.games, compact))
+
+    async def join_matchmaking(self, request: Request):
+        async def call(user_uuid, username):
+            deck_slot = handlers.required_deck_slot(await _json_body(request))
+            return await async_logic.process_matchmaking_request(user_uuid, username, deck_slot, self.games)
+        return await self._handle(request, "join_matchmaking", call)
+
+    async def status_matchmaking(self, request: Request):
+        wait = handlers.wait_seconds(request.query_params)
+        return await self._handle(request, "status_matchmaking", lambda user_uuid, _: async_logic.check_matchmaking_status(
+            user_uuid, wait))
+
+    async def leave_matchmaking(self, request: Request):
+        return await self._handle(request, "leave_matchmaking", lambda user_uuid, _: run_sync(
+            leave_matchmaking, user_uuid))
+
+    async def _handle(self, request, endpoint, call):
+        """Come GameController._handle: await call(user_uuid, username) -> corpo JSON o Response."""
+        try:
+            user_uuid, username = await async_logic.validate_user_token(request.headers.get("Authorization"))
+        except Exception as e:
+            return self._error(endpoint, "auth", e)
+        try:
+            result = await call(user_uuid, username)
+        except Exception as e:
+            return self._error(endpoint, "call", e)
+        return result if isinstance(result, Response) else JSONResponse(result)
+
+    def _error(self, endpoint, stage, exc):
+        error = handlers.error_response(endpoint, stage, exc)
+        if error is None:
+            raise exc
+        body, status, headers = error
+        return JSONResponse(body, status_code=status, headers=headers)
+
+    async def _versioned_json(self, request, game_id, user_uuid, read, *args):
+        """Come GameController._versioned_json, controlli e lettura in un solo passaggio nel pool di thread."""
+        tags = handlers.if_none_match(request.headers.get("If-None-Match"))
+        data, version = await run_sync(handlers.versioned_read, self.games, tags, game_id, user_uuid, read, *args)
+        headers = {"ETag": handlers.etag(version)}
+        if data is None:
+            return Response(status_code=304, headers=headers)
+        return Response(data, media_type="application/json", headers=headers)
+
+    async def stream_events(self, game_id: str, request: Request):
+        """Stream Server-Sent Events della partita (vedi GameController.stream_events)."""
+        try:
+            user_uuid, _ = await async_logic.validate_user_token(request.headers.get("Authorization"))
+        except Exception as e:
+            return self._error("stream_events", "auth", e)
+
+        # Iscrizione prima dello snapshot, così nessun evento va perso
+        subscription = event_bus.subscribe(game_id, user_uuid, loop=asyncio.get_running_loop())
+        try:
+            snapshot = await run_sync(handlers.event_snapshot, game_id, user_uuid, self.games)
+        except Exception as e:
+            event_bus.unsubscribe(subscription)
+            return self._error("stream_events", "call", e)
+
+        async def generate():
+            try:
+                yield format_sse("snapshot", snapshot)
+                if snapshot["winner"]:
+                    return
+                while True:
+                    try:
+                        event, data, event_id = await subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+                    except queue.Empty:
+                        yield ": keep-alive\n\n"
+                        continue
+                    yield format_sse(event, data, event_id)
+                    if event in (GAME_FINISHED, GAME_EXPIRED):
+                        return
+            finally:
+                event_bus.unsubscribe(subscription)
+
+        return StreamingResponse(generate(), media_type="text/event-stream", headers=handlers.STREAM_HEADERS)
+
+    async def play_socket(self, ws: WebSocket, game_id: str):
+        """Canale WebSocket della partita, stesso protocollo di GameController.play_socket."""
+        await ws.accept()
+
+        send_lock = asyncio.Lock()
+
+        async def send(payload):
+            # send viene chiamato sia da questo handler che dal task degli eventi
+            async with send_lock:
+                await ws.send_text(json.dumps(payload))
+
+        # 1. Autenticazione (una volta per connessione)
+        token_header = ws.headers.get("Authorization")
+        if not token_header:
+            try:
+                token_header = handlers.socket_token_header(await asyncio.wait_for(ws.receive_text(), WS_AUTH_TIMEOUT))
+            except asyncio.TimeoutError:
+                token_header = None
+            except WebSocketDisconnect:
+                return
+
+        try:
+            user_uuid, _ = await async_logic.validate_user_token(token_header)
+        except ValueError as e:
+            await send({"type": "error", "error": str(e)})
+            await ws.close()
+            return
+
+        # 2. Iscrizione agli eventi e stato iniziale
+        subscription = event_bus.subscribe(game_id, user_uuid, loop=asyncio.get_running_loop())
+        try:
+            snapshot = await run_sync(handlers.socket_snapshot, game_id, user_uuid, self.games)
+        except ValueError as e:
+            event_bus.unsubscribe(subscription)
+            await send({"type": "error", "error": str(e)})
+            await ws.close()
+            return
+
+        await send(snapshot)
+
+        # 3. Task che inoltra gli eventi della partita al client
+        async def pump_events():
+            while True:
+                event, data, event_id = await subscription.get()
+                await send(handlers.socket_event(event, data, event_id))
+
+        pump = asyncio.create_task(pump_events())
+
+        # 4. Messaggi del client
+        try:
+            while True:
+                raw = await ws.receive_text()
+                await send(await run_sync(handlers.socket_reply, raw, game_id, user_uuid, self.games))
+        except WebSocketDisconnect:
+            pass
+        finally:
+            pump.cancel()
+            event_bus.unsubscribe(subscription)
+
+    # --- Endpoint INTERNI (non esposti dal gateway) ---
+
+    async def invalidate_deck(self, request: Request):
+        """Usato dal servizio collection quando un deck viene sostituito o cancellato."""
+        body, status = handlers.invalidate_deck(await _json_body(request))
+        return JSONResponse(body, status_code=status)
+
+    async def metrics(self):
+        return JSONResponse(await run_sync(get_metrics))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Pool di thread per le operazioni sincrone sulle partite (run_sync)
+    anyio.to_thread.current_default_thread_limiter().total_tokens = ASGI_SYNC_WORKERS
+    # Riavvio a caldo: partite e coda dall'ultimo snapshot, poi snapshot periodici
+    await anyio.to_thread.run_sync(restore_snapshot)
+    # Avvio del publisher RabbitMQ: rispedisce subito le partite rimaste nell'outbox
+    match_publisher.start()
+    yield
+    await async_logic.clients.aclose()
+    # Shutdown (es. deploy): ultimo snapshot, così le partite riprendono senza perdere giocate
+    await anyio.to_thread.run_sync(save_snapshot)
+
+
+controller = AsyncGameController()
+
+# Documentazione: stessa openapi.yml statica e stesso /apidocs dell'app Flask
+app = FastAPI(title="Card Game API", lifespan=lifespan, docs_url=None, redoc_url=None, openapi_url=None)
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+
+
+@app.get("/apidocs/", include_in_schema=False)
+async def apidocs():
+    return get_swagger_ui_html(openapi_url="/static/openapi.yml", title="Card Game API Documentation")
+
+
+app.add_api_route("/match/join", controller.join_matchmaking, methods=["POST"])
+app.add_api_route("/match/status", controller.status_matchmaking, methods=["GET"])
+app.add_api_route("/match/leave", controller.leave_matchmaking, methods=["POST"])
+app.add_api_route("/deck/rating", controller.deck_rating, methods=["GET"])
+app.add_api_route("/deck/{game_id}", controller.choose_deck, methods=["POST"])
+app.add_api_route("/play/{game_id}", controller.play_turn, methods=["POST"])
+app.add_api_route("/hand/{game_id}", controller.get_hand, methods=["GET"])
+app.add_api_route("/state/{game_id}", controller.get_state, methods=["GET"])
+app.add_api_route("/view/{game_id}", controller.get_view, methods=["GET"])
+app.add_api_route("/events/{game_id}", controller.stream_events, methods=["GET"])
+app.add_api_websocket_route("/ws/{game_id}", controller.play_socket)
+
+# Endpoint interni: chiamati solo dagli altri servizi sulla rete docker, senza
+# autenticazione del chiamante. Non vanno mai inoltrati dal gateway
+# (api_gateway/game_engine.py ha solo route esplicite) né pubblicati su una porta dell'host
+app.add_api_route("/internal/decks/invalidate", controller.invalidate_deck, methods=["POST"])
+app.add_api_route("/internal/metrics", controller.metrics, methods=["GET"])
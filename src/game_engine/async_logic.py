@@ -0,0 +1,247 @@
+"""
+Parti di logic.py che chiamano altri servizi, in versione asincrona per il
+server ASGI (asgi.py).
+
+Le chiamate a user-manager, collection e game_history usano client httpx
+asincroni condivisi (connessioni riusate), quindi un servizio lento tiene
+occupata solo una coroutine e non un thread. Le operazioni sullo stato
+delle partite restano quelle sincrone di logic.py (lock per partita e
+store condivisi con scheduler, reaper e matchmaking a blocchi) e passano
+da run_sync, sempre nel pool di thread del server: anche con lo store in
+memoria possono aspettare un lock tenuto da un altro thread o scrivere
+nell'outbox SQLite, e nell'event loop fermerebbero tutte le richieste.
+"""
+import asyncio
+import os
+
+import httpx
+from starlette.concurrency import run_in_threadpool
+
+from . import logic
+from .store import InMemoryGameStore
+from .config import COLLECTION_URL, COLLECTION_CERT, USER_MANAGER_URL, USER_MANAGER_CERT
+from .config import GAME_HISTORY_RATINGS_URL, HISTORY_CERT, MATCH_STATUS_MAX_WAIT
+from .config import UPSTREAM_MAX_CONNECTIONS
+
+# Transport httpx alternativo per i test (es. httpx.MockTransport), come mock_redis_client in store.py
+mock_upstream_transport = None
+
+SERVICES = {
+    "user_manager": USER_MANAGER_CERT,
+    "collection": COLLECTION_CERT,
+    "game_history": HISTORY_CERT,
+}
+
+
+class ServiceClients:
+    """
+    Un httpx.AsyncClient per servizio (ognuno con il suo certificato),
+    creato al primo uso nell'event loop corrente e chiuso allo shutdown.
+
+    Al massimo UPSTREAM_MAX_CONNECTIONS richieste per servizio sono in
+    corso insieme; le altre aspettano sul semaforo del servizio e non nella
+    coda del pool di httpcore, che a ogni richiesta confronta tutte le
+    richieste in coda con tutte le connessioni.
+    """
+
+    def __init__(self):
+        self._clients = {}
+        self._limits = {}
+        self._loop = None
+
+    async def get(self, service, url, **kwargs):
+        client = self._client(service)
+        async with self._limits[service]:
+            return await client.get(url, **kwargs)
+
+    def _client(self, service):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Nuovo event loop (es. riavvio del server nei test): i client vecchi non sono utilizzabili
+            self._clients = {}
+            self._limits = {}
+            self._loop = loop
+        client = self._clients.get(service)
+        if client is None:
+            cert = SERVICES[service]
+            client = self._clients[service] = httpx.AsyncClient(
+                # httpx carica il certificato alla creazione del client (requests solo per URL https):
+                # senza il file si usano i CA di sistema
+                verify=cert if os.path.exists(cert) else True,
+                limits=httpx.Limits(max_connections=UPSTREAM_MAX_CONNECTIONS),
+                transport=mock_upstream_transport,
+            )
+            self._limits[service] = asyncio.Semaphore(UPSTREAM_MAX_CONNECTIONS)
+        return client
+
+    async def aclose(self):
+        clients, self._clients, self._limits = list(self._clients.values()), {}, {}
+        for client in clients:
+            await client.aclose()
+
+
+clients = ServiceClients()
+
+
+async def run_sync(func, *args):
+    """Operazione sincrona sulle partite (lock, store, outbox) nel pool di thread del server."""
+    return await run_in_threadpool(func, *args)
+
+
+# ------------------------------------------------------------
+# 🔐 Token, deck e rating
+# ------------------------------------------------------------
+async def validate_user_token(token_header):
+    token = logic._bearer_token(token_header)
+    try:
+        response = await clients.get(
+            "user_manager", f"{USER_MANAGER_URL}/users/validate-token", headers={"Authorization": f"Bearer {token}"}, timeout=5)
+        response.raise_for_status()
+        user_data = response.json()
+        return user_data["id"], user_data["username"]
+    except (httpx.HTTPError, ValueError, KeyError) as e:
+        print(f"Errore validazione token: {e}")
+        raise ValueError("Token non valido o servizio utenti irraggiungibile")
+
+
+async def _fetch_deck(user_uuid, deck_slot, etag=None):
+    """Come logic._fetch_deck: (deck_cards, etag), (None, etag) se il deck non è cambiato."""
+    headers = {'If-None-Match': etag} if etag else {}
+    try:
+        response = await clients.get(
+            "collection", f"{COLLECTION_URL}/user-decks", params={'user': user_uuid, 'slot': deck_slot}, headers=headers, timeout=5)
+    except httpx.HTTPError as e:
+        raise ValueError(f"Could not reach collection service: {e}")
+    return logic._deck_from_response(response, deck_slot, etag)
+
+
+async def _get_validated_deck(user_uuid, deck_slot):
+    cached = logic.deck_cache.get(user_uuid, deck_slot)
+    if cached:
+        return cached
+
+    deck_cards, etag = await _fetch_deck(user_uuid, deck_slot)
+    logic.deck_cache.put(user_uuid, deck_slot, deck_cards, etag)
+    return deck_cards, etag
+
+
+async def _revalidate_queued_deck(entry):
+    """Come logic._revalidate_queued_deck (richiesta condizionale con l'ETag del join)."""
+    cached = logic.deck_cache.get(entry['uuid'], entry['deck_slot'])
+    if cached:
+        return cached[0]
+
+    if not entry.get('deck_etag'):
+        deck_cards, _ = await _get_validated_deck(entry['uuid'], entry['deck_slot'])
+        return deck_cards
+
+    deck_cards, etag = await _fetch_deck(entry['uuid'], entry['deck_slot'], etag=entry['deck_etag'])
+    if deck_cards is None:
+        deck_cards = entry['deck']
+    logic.deck_cache.put(entry['uuid'], entry['deck_slot'], deck_cards, etag)
+    return deck_cards
+
+
+async def _get_rating(user_uuid):
+    """Come logic._get_rating: 0 (non in cache) se game_history non risponde."""
+    rating = logic.rating_cache.get(user_uuid)
+    if rating is not None:
+        return rating
+    try:
+        response = await clients.get("game_history", GAME_HISTORY_RATINGS_URL, params={'id': user_uuid}, timeout=2)
+        response.raise_for_status()
+        rating = response.json()['ratings'].get(user_uuid, 0)
+    except (httpx.HTTPError, ValueError, KeyError) as e:
+        print(f"Rating di {user_uuid} non disponibile, uso 0: {e}", flush=True)
+        return 0
+    logic.rating_cache.put(user_uuid, rating)
+    return rating
+
+
+# ------------------------------------------------------------
+# 🔗 Matchmaking e deck
+# ------------------------------------------------------------
+async def process_matchmaking_request(user_uuid, user_name, deck_slot, games):
+    """Stessi passi di logic.process_matchmaking_request, con deck e rating scaricati in parallelo."""
+    result = await run_sync(logic._join_without_fetch, user_uuid, user_name, deck_slot)
+    if result:
+        return result
+
+    if logic.MATCHMAKING_RATED:
+        (deck_cards, deck_etag), rating = await asyncio.gather(
+            _get_validated_deck(user_uuid, deck_slot), _get_rating(user_uuid))
+    else:
+        (deck_cards, deck_etag), rating = await _get_validated_deck(user_uuid, deck_slot), None
+
+    opponent = await run_sync(
+        logic._pop_opponent_or_join, user_uuid, user_name, deck_slot, deck_cards, deck_etag, rating)
+    if not opponent:
+        return logic._waiting_response(deck_slot)
+
+    try:
+        opponent_deck = await _revalidate_queued_deck(opponent)
+    except Exception as e:
+        raise ValueError(f"Failed to load decks: {str(e)}")
+    return await run_sync(logic._create_match, opponent, opponent_deck, user_uuid, user_name, deck_cards, games)
+
+
+async def check_matchmaking_status(user_uuid, wait=0):
+    """
+    Come logic.check_matchmaking_status, ma il long-poll non tiene un thread
+    fermo su wait_for_match: con lo store in memoria la coroutine aspetta un
+    asyncio.Event che notify_match sveglia con call_soon_threadsafe, con
+    Redis un BLPOP asincrono. Poi lo stato viene letto una sola volta
+    (partita trovata, uscita o timeout).
+    """
+    if wait:
+        await run_sync(logic.game_store.queue_touch, user_uuid)
+        await _wait_for_match(user_uuid, min(wait, MATCH_STATUS_MAX_WAIT))
+    return await run_sync(logic.check_matchmaking_status, user_uuid)
+
+
+async def _wait_for_match(user_uuid, timeout):
+    store = logic.game_store
+    if not isinstance(store, InMemoryGameStore):
+        # Redis: la partita può essere creata da un altro worker, il segnale arriva
+        # solo con BLPOP, atteso nell'event loop (redis.asyncio) e non nel pool di thread
+        if await run_sync(_still_waiting, user_uuid):
+            await store.wait_for_match_async(user_uuid, timeout)
+        return
+
+    loop = asyncio.get_running_loop()
+    matched = asyncio.Event()
+
+    def wake():
+        try:
+            loop.call_soon_threadsafe(matched.set)
+        except RuntimeError:
+            pass  # loop già chiuso: il client non è più collegato
+
+    # Registrato prima del controllo: un abbinamento tra i due non va perso
+    store.add_match_waiter(user_uuid, wake)
+    try:
+        if await run_sync(_still_waiting, user_uuid):
+            await asyncio.wait_for(matched.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        store.remove_match_waiter(user_uuid, wake)
+
+
+def _still_waiting(user_uuid):
+    return not logic.game_store.get_pending(user_uuid) and logic.game_store.queue_contains(user_uuid)
+
+
+async def select_deck(game_id, player_uuid, deck_slot, games):
+    if not await run_sync(games.__contains__, game_id):
+        raise ValueError("Invalid game ID")
+    deck_cards, _ = await _get_validated_deck(player_uuid, deck_slot)
+    return await run_sync(logic._assign_selected_deck, game_id, player_uuid, deck_cards, games)
+
+
+async def get_deck_rating(user_uuid, deck_slot):
+    if not deck_slot or deck_slot not in [1, 2, 3, 4, 5]:
+        raise ValueError("deck_slot must be between 1 and 5")
+    deck_cards, _ = await _get_validated_deck(user_uuid, deck_slot)
+    # Indice dei deck (numpy, caricato da disco al primo uso): sempre in un thread
+    return await run_in_threadpool(logic._deck_rating, deck_cards, deck_slot)
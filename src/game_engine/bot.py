@@ -0,0 +1,60 @@
+"""
+Avversario gestito dal server, usato quando un giocatore resta in coda
+troppo a lungo (BOT_FALLBACK_SECONDS).
+
+Il bot è un normale Player della partita (sempre player2) e gioca tramite
+submit_card come un giocatore umano. La scelta della carta è una lookup
+in POLICY, tabella precalcolata all'avvio da cards.OUTCOME: ogni carta ha
+una priorità pari al suo margine atteso contro una carta di un deck
+legale casuale (vedi deck_index.py) e il bot gioca per prima la carta più
+forte che ha in mano (con il simulatore questa policy batte il gioco
+casuale, vedi simulator.py).
+"""
+from .deck_index import MARGIN, field_frequencies
+from .models import Player, Deck
+
+# Identità riservata: user-manager assegna come id solo ObjectId (24 cifre
+# esadecimali) e toglie "<" e ">" dagli username (bleach), quindi nessun
+# utente può avere lo stesso id o lo stesso nome del bot. Il nome conta
+# perché vincitore e round vinti sono registrati per nome; il bot si
+# riconosce comunque solo dall'id (is_bot)
+BOT_UUID = "game-engine:bot"
+BOT_NAME = "<bot>"
+
+# Deck legale di forza mediana (percentile ~50 nell'indice di deck_index.py)
+BOT_DECK = [
+    {"value": "3", "suit": "hearts"}, {"value": "4", "suit": "hearts"},
+    {"value": "3", "suit": "diamonds"}, {"value": "5", "suit": "diamonds"},
+    {"value": "6", "suit": "clubs"}, {"value": "7", "suit": "clubs"},
+    {"value": "2", "suit": "spades"}, {"value": "10", "suit": "spades"},
+    {"value": "JOKER", "suit": "none"},
+]
+
+
+def _build_policy():
+    margins = MARGIN @ field_frequencies()
+    ranking = sorted(range(len(margins)), key=lambda code: margins[code])
+    policy = bytearray(len(margins))
+    for rank, code in enumerate(ranking):
+        policy[code] = rank
+    return bytes(policy)
+
+
+# POLICY[code] -> priorità della carta (più alta = giocata prima)
+POLICY = _build_policy()
+
+
+def is_bot(player_uuid):
+    return player_uuid == BOT_UUID
+
+
+def new_player():
+    player = Player(uuid=BOT_UUID, name=BOT_NAME)
+    player.deck = Deck.from_dict(BOT_DECK)
+    player.deck.shuffle()
+    return player
+
+
+def choose_card(hand_codes):
+    """Codice della carta da giocare tra quelle in mano."""
+    return max(hand_codes, key=POLICY.__getitem__)
@@ -0,0 +1,116 @@
+"""
+Codifica intera delle 53 carte e tabella precalcolata degli esiti.
+
+    code = indice_seme * 13 + indice_valore   (0..51)
+    JOKER = 52
+
+Le regole di confronto restano scritte in forma leggibile in
+compare_by_rules; all'import vengono valutate una sola volta per tutte
+le 53x53 coppie e salvate in OUTCOME, così risolvere un round è una
+doppia indicizzazione.
+"""
+
+SUITS = ["hearts", "diamonds", "clubs", "spades"]
+VALUES = [str(n) for n in range(2, 11)] + ["J", "Q", "K", "A"]
+JOKER = 52
+NUM_CARDS = 53
+
+# Esiti del confronto (carta del player1, carta del player2)
+DRAW = 0
+PLAYER1 = 1
+PLAYER2 = 2
+DOUBLE_WIN = 3
+OUTCOME_NAMES = ["draw", "player1", "player2", "double_win"]
+
+_DECODED = [(v, s) for s in SUITS for v in VALUES] + [("JOKER", "none")]
+_CODES = {(v, s): code for code, (v, s) in enumerate(_DECODED)}
+
+
+def encode(value, suit):
+    """(value, suit) -> codice intero. Solleva ValueError per carte inesistenti."""
+    if value == "JOKER":
+        return JOKER
+    try:
+        return _CODES[(value, suit)]
+    except (KeyError, TypeError):
+        raise ValueError(f"Invalid card: {value} of {suit}")
+
+
+def decode(code):
+    """Codice intero -> (value, suit)."""
+    if type(code) is not int or not 0 <= code < NUM_CARDS:
+        raise ValueError(f"Invalid card code: {code}")
+    return _DECODED[code]
+
+
+def parse_card(card_data):
+    """
+    Carta ricevuta dal client, in uno dei formati accettati:
+      {"value": "K", "suit": "hearts"}   (formato esteso)
+      17  oppure  {"code": 17}           (formato compatto)
+    """
+    if type(card_data) is dict:
+        if "code" not in card_data:
+            return encode(card_data.get("value"), card_data.get("suit"))
+        card_data = card_data["code"]
+    if type(card_data) is int and 0 <= card_data < NUM_CARDS:
+        return card_data
+    raise ValueError("Invalid card format")
+
+
+def compare_by_rules(value1, suit1, value2, suit2):
+    """Confronto secondo il regolamento ufficiale (usato per costruire OUTCOME)."""
+    suit_priority = {"hearts": 4, "diamonds": 3, "clubs": 2, "spades": 1, "none": 0}
+    numeric_value = {
+        "2": 2, "3": 3, "4": 4, "5": 5, "6": 6,
+        "7": 7, "8": 8, "9": 9, "10": 10,
+        "J": 11, "Q": 12, "K": 13, "A": 7, "JOKER": 99
+    }
+
+    # Joker beats everything
+    if value1 == "JOKER" and value2 == "JOKER":
+        return "double_win"
+    elif value1 == "JOKER":
+        return "player1"
+    elif value2 == "JOKER":
+        return "player2"
+
+    # --- Ace special interactions ---
+    if value1 == "A" and value2 in ["J", "Q", "K"]:
+        return "player1"
+    if value2 == "A" and value1 in ["J", "Q", "K"]:
+        return "player2"
+    if value1 == "A" and value2.isdigit():
+        return "player2"
+    if value2 == "A" and value1.isdigit():
+        return "player1"
+
+    # --- Normal numeric comparison ---
+    v1, v2 = numeric_value[value1], numeric_value[value2]
+    if v1 > v2:
+        return "player1"
+    elif v2 > v1:
+        return "player2"
+    else:
+        # Same value → suit priority
+        if suit_priority[suit1] > suit_priority[suit2]:
+            return "player1"
+        elif suit_priority[suit1] < suit_priority[suit2]:
+            return "player2"
+        else:
+            return "draw"
+
+
+def _build_outcome_table():
+    table = []
+    for code1 in range(NUM_CARDS):
+        row = bytearray(NUM_CARDS)
+        for code2 in range(NUM_CARDS):
+            result = compare_by_rules(*decode(code1), *decode(code2))
+            row[code2] = OUTCOME_NAMES.index(result)
+        table.append(bytes(row))
+    return tuple(table)
+
+
+# OUTCOME[code1][code2] -> DRAW / PLAYER1 / PLAYER2 / DOUBLE_WIN
+OUTCOME = _build_outcome_table()
@@ -0,0 +1,83 @@
+"""
+Test della codifica intera delle carte e della tabella degli esiti
+(cards.py) rispetto alle regole scritte su stringhe.
+
+Uso:  python -m pytest src/game_engine
+"""
+import pytest
+
+from game_engine import cards
+from game_engine.cards import DOUBLE_WIN, DRAW, JOKER, OUTCOME, PLAYER1, PLAYER2, compare_by_rules, encode
+
+
+def outcome(card1, card2):
+    return OUTCOME[encode(*card1)][encode(*card2)]
+
+
+def test_encode_decode_round_trip():
+    codes = [encode(value, suit) for suit in cards.SUITS for value in cards.VALUES]
+    assert codes == list(range(52))
+    assert encode("JOKER", "none") == JOKER
+    for code in range(cards.NUM_CARDS):
+        assert encode(*cards.decode(code)) == code
+
+
+@pytest.mark.parametrize("value, suit", [("1", "hearts"), ("K", "stars"), (None, None), ("10", None)])
+def test_encode_rejects_unknown_cards(value, suit):
+    with pytest.raises(ValueError):
+        encode(value, suit)
+
+
+@pytest.mark.parametrize("code", [-1, 53, True, "17", 1.0])
+def test_decode_rejects_invalid_codes(code):
+    with pytest.raises(ValueError):
+        cards.decode(code)
+
+
+def test_parse_card_formats():
+    king = encode("K", "hearts")
+    assert cards.parse_card({"value": "K", "suit": "hearts"}) == king
+    assert cards.parse_card(king) == king
+    assert cards.parse_card({"code": king}) == king
+    assert cards.parse_card({"value": "JOKER", "suit": "none"}) == JOKER
+
+
+@pytest.mark.parametrize("card_data", [None, True, 53, "17", {"code": "17"}, {"value": "K"}, ["K", "hearts"]])
+def test_parse_card_rejects_invalid_cards(card_data):
+    with pytest.raises(ValueError):
+        cards.parse_card(card_data)
+
+
+def test_outcome_table_matches_string_rules():
+    # compare_by_rules è il confronto su stringhe di logic.compare_cards prima della tabella
+    names = {DRAW: "draw", PLAYER1: "player1", PLAYER2: "player2", DOUBLE_WIN: "double_win"}
+    for code1 in range(cards.NUM_CARDS):
+        for code2 in range(cards.NUM_CARDS):
+            expected = compare_by_rules(*cards.decode(code1), *cards.decode(code2))
+            assert names[OUTCOME[code1][code2]] == expected, (cards.decode(code1), cards.decode(code2))
+
+
+def test_outcome_table_is_antisymmetric():
+    swapped = {DRAW: DRAW, PLAYER1: PLAYER2, PLAYER2: PLAYER1, DOUBLE_WIN: DOUBLE_WIN}
+    for code1 in range(cards.NUM_CARDS):
+        for code2 in range(cards.NUM_CARDS):
+            assert OUTCOME[code2][code1] == swapped[OUTCOME[code1][code2]]
+
+
+@pytest.mark.parametrize("card1, card2, expected", [
+    (("JOKER", "none"), ("JOKER", "none"), DOUBLE_WIN),
+    (("JOKER", "none"), ("A", "hearts"), PLAYER1),
+    (("2", "spades"), ("JOKER", "none"), PLAYER2),
+    # L'Asso batte le figure ma perde contro le carte numeriche
+    (("A", "spades"), ("K", "hearts"), PLAYER1),
+    (("A", "hearts"), ("2", "spades"), PLAYER2),
+    (("10", "clubs"), ("A", "diamonds"), PLAYER1),
+    (("K", "spades"), ("Q", "hearts"), PLAYER1),
+    (("9", "hearts"), ("10", "spades"), PLAYER2),
+    # Stesso valore: conta il seme (cuori > quadri > fiori > picche)
+    (("7", "hearts"), ("7", "diamonds"), PLAYER1),
+    (("A", "spades"), ("A", "clubs"), PLAYER2),
+    (("Q", "clubs"), ("Q", "clubs"), DRAW),
+])
+def test_outcome_examples_from_rules(card1, card2, expected):
+    assert outcome(card1, card2) == expected
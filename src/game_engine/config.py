@@ -10,4 +10,108 @@ RABBITMQ_HOST = os.environ.get("RABBITMQ_HOST", "rabbitmq")
 RABBITMQ_PORT = int(os.environ.get("RABBITMQ_PORT", "5671"))
 RABBITMQ_USER = os.environ.get("RABBITMQ_USER", "rabbitmq_user")
 RABBITMQ_PASSWORD = os.environ.get("RABBITMQ_PASSWORD", "rabbitmq_password")
-RABBITMQ_CERT_PATH = "/run/secrets/rabbitmq_cert"
\ No newline at end of file
+RABBITMQ_CERT_PATH = "/run/secrets/rabbitmq_cert"
+
+# Long-poll di /match/status: attesa massima lato server (secondi)
+MATCH_STATUS_MAX_WAIT = float(os.environ.get("MATCH_STATUS_MAX_WAIT", "30"))
+
+# Server-Sent Events: intervallo dei commenti keep-alive (secondi)
+SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", "15"))
+
+# WebSocket: secondi concessi al client per inviare il messaggio di autenticazione
+WS_AUTH_TIMEOUT = float(os.environ.get("WS_AUTH_TIMEOUT", "10"))
+
+# Cache dei deck validati (chiave: utente + slot)
+DECK_CACHE_SIZE = int(os.environ.get("DECK_CACHE_SIZE", "10000"))
+DECK_CACHE_TTL = float(os.environ.get("DECK_CACHE_TTL", "300"))
+
+# Publisher RabbitMQ in background: messaggi inviati per blocco e attesa tra i tentativi
+PUBLISHER_BATCH_SIZE = int(os.environ.get("PUBLISHER_BATCH_SIZE", "100"))
+PUBLISHER_RETRY_SECONDS = float(os.environ.get("PUBLISHER_RETRY_SECONDS", "5"))
+
+# Outbox su disco degli esiti delle partite (SQLite).
+# OUTBOX_FSYNC: always | normal | off (vedi outbox.py)
+OUTBOX_PATH = os.environ.get("OUTBOX_PATH", "data/outbox.db")
+OUTBOX_MAX_ROWS = int(os.environ.get("OUTBOX_MAX_ROWS", "100000"))
+OUTBOX_FSYNC = os.environ.get("OUTBOX_FSYNC", "normal").lower()
+
+# Store di partite e matchmaking: "memory" (un solo worker) oppure "redis" (più worker/repliche)
+GAME_STORE_BACKEND = os.environ.get("GAME_STORE_BACKEND", "memory").lower()
+REDIS_URL = os.environ.get("REDIS_URL", "redis://redis:6379/0")
+# Numero di shard (ognuno con il proprio lock) del registro in memoria delle partite
+GAME_REGISTRY_SHARDS = int(os.environ.get("GAME_REGISTRY_SHARDS", "16"))
+# Durata massima (secondi) del lock Redis sulla sezione critica del matchmaking
+MATCHMAKING_LOCK_TIMEOUT = float(os.environ.get("MATCHMAKING_LOCK_TIMEOUT", "10"))
+# Tentativi di submit_card in caso di conflitto di versione
+SUBMIT_CARD_MAX_RETRIES = int(os.environ.get("SUBMIT_CARD_MAX_RETRIES", "5"))
+
+# Reaper: secondi dopo cui vengono rimosse
+#   - le partite finite
+#   - le partite senza giocate (abbandonate)
+#   - le entry di coda di giocatori che non controllano più lo stato
+#   - le partite trovate ma mai ritirate con /match/status
+GAME_FINISHED_TTL = float(os.environ.get("GAME_FINISHED_TTL", "300"))
+GAME_IDLE_TTL = float(os.environ.get("GAME_IDLE_TTL", "1800"))
+MATCHMAKING_ENTRY_TTL = float(os.environ.get("MATCHMAKING_ENTRY_TTL", "600"))
+PENDING_MATCH_TTL = float(os.environ.get("PENDING_MATCH_TTL", "300"))
+
+# Timeout di turno: secondi concessi per giocare la carta del round (0 = disattivato).
+# Allo scadere la carta viene giocata in automatico; dopo MAX_MISSED_TURNS round
+# consecutivi giocati in automatico il giocatore perde la partita a tavolino
+TURN_TIMEOUT_SECONDS = float(os.environ.get("TURN_TIMEOUT_SECONDS", "60"))
+MAX_MISSED_TURNS = int(os.environ.get("MAX_MISSED_TURNS", "2"))
+
+# Indice della forza dei deck legali (file .npy costruito offline con
+# "python -m game_engine.deck_index", letto in memmap da GET /deck/rating)
+DECK_INDEX_PATH = os.environ.get("DECK_INDEX_PATH", "data/deck_index.npy")
+
+# Bot: dopo BOT_FALLBACK_SECONDS secondi in coda senza avversario il giocatore
+# gioca contro un bot del server (0 = disattivato). Le partite contro il bot
+# vengono salvate nello storico ma non contano per la classifica
+BOT_FALLBACK_SECONDS = float(os.environ.get("BOT_FALLBACK_SECONDS", "30"))
+
+# Thread che eseguono le scadenze di bot e turni (abbinamento al bot, giocata
+# automatica): possono chiamare collection e scrivere nell'outbox, quindi non
+# girano nel thread unico dello scheduler
+DEADLINE_WORKERS = int(os.environ.get("DEADLINE_WORKERS", "8"))
+
+# Matchmaking per rating (punti della classifica di game_history, letti una volta
+# e tenuti in cache RATING_CACHE_TTL secondi). Un giocatore viene abbinato
+# all'avversario in coda con il rating più vicino se la differenza è entro la
+# finestra: MATCHMAKING_RATING_WINDOW punti, più MATCHMAKING_WINDOW_GROWTH punti
+# per ogni secondo di attesa, al massimo MATCHMAKING_MAX_WINDOW.
+# Con MATCHMAKING_RATED=false la coda è FIFO
+MATCHMAKING_RATED = os.environ.get("MATCHMAKING_RATED", "true").lower() == "true"
+GAME_HISTORY_RATINGS_URL = os.environ.get("GAME_HISTORY_RATINGS_URL", "https://game_history:5000/internal/ratings")
+RATING_CACHE_SIZE = int(os.environ.get("RATING_CACHE_SIZE", "10000"))
+RATING_CACHE_TTL = float(os.environ.get("RATING_CACHE_TTL", "600"))
+MATCHMAKING_RATING_WINDOW = float(os.environ.get("MATCHMAKING_RATING_WINDOW", "50"))
+MATCHMAKING_WINDOW_GROWTH = float(os.environ.get("MATCHMAKING_WINDOW_GROWTH", "5"))
+MATCHMAKING_MAX_WINDOW = float(os.environ.get("MATCHMAKING_MAX_WINDOW", "500"))
+# Larghezza (punti) dei bucket della coda in memoria
+MATCHMAKING_RATING_BUCKET = float(os.environ.get("MATCHMAKING_RATING_BUCKET", "25"))
+
+# Matchmaking a blocchi: con MATCHMAKING_BATCH_MS > 0 /match/join mette solo in
+# coda e ogni MATCHMAKING_BATCH_MS millisecondi tutta la coda viene abbinata in
+# un passo; i deck delle nuove partite sono caricati in parallelo da
+# MATCHMAKING_BATCH_WORKERS thread. 0 = abbinamento immediato durante il join
+MATCHMAKING_BATCH_MS = float(os.environ.get("MATCHMAKING_BATCH_MS", "0"))
+MATCHMAKING_BATCH_WORKERS = int(os.environ.get("MATCHMAKING_BATCH_WORKERS", "16"))
+
+# Cache delle risposte di lettura già codificate in JSON (numero massimo di partite)
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "10000"))
+
+# Server ASGI (asgi.py): le chiamate agli altri servizi sono asincrone, le
+# operazioni sullo stato delle partite (lock, store, outbox) girano in un
+# pool di ASGI_SYNC_WORKERS thread. Il long-poll di /match/status aspetta
+# nell'event loop senza occupare un thread.
+# UPSTREAM_MAX_CONNECTIONS: richieste contemporanee per servizio esterno; il
+# pool di httpx costa più CPU a ogni richiesta quante più connessioni ha
+ASGI_SYNC_WORKERS = int(os.environ.get("ASGI_SYNC_WORKERS", "40"))
+UPSTREAM_MAX_CONNECTIONS = int(os.environ.get("UPSTREAM_MAX_CONNECTIONS", "16"))
+
+# Snapshot di partite, coda di matchmaking e partite pendenti (solo store in
+# memoria): ogni SNAPSHOT_INTERVAL_SECONDS secondi su SNAPSHOT_PATH, ricaricato
+# all'avvio per riprendere le partite dopo un deploy o un crash (0 = disattivato)
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH", "data/snapshot.bin")
+SNAPSHOT_INTERVAL_SECONDS = float(os.environ.get("SNAPSHOT_INTERVAL_SECONDS", "10"))
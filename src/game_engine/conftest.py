@@ -0,0 +1,10 @@
+"""
+Configurazione dei test pytest del game engine: outbox e snapshot in una
+cartella temporanea, impostata prima che i test importino config.py.
+"""
+import os
+import tempfile
+
+DATA_DIR = tempfile.TemporaryDirectory(prefix="game-engine-test-")
+os.environ.setdefault("OUTBOX_PATH", os.path.join(DATA_DIR.name, "outbox.db"))
+os.environ.setdefault("SNAPSHOT_PATH", os.path.join(DATA_DIR.name, "snapshot.bin"))
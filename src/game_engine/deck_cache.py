@@ -0,0 +1,33 @@
+from .ttl_cache import TTLCache
+
+
+class DeckCache:
+    """
+    Cache LRU con TTL dei deck già validati, chiave (user_uuid, deck_slot)
+    (vedi TTLCache).
+
+    Il servizio collection invalida le entry quando un deck viene
+    sostituito o cancellato, quindi una entry presente è affidabile fino
+    alla scadenza del TTL.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300):
+        self._cache = TTLCache(maxsize, ttl)  # (user_uuid, deck_slot) -> (deck_cards, etag)
+
+    def get(self, user_uuid, deck_slot):
+        """Ritorna (deck_cards, etag) oppure None se assente o scaduto."""
+        return self._cache.get((user_uuid, deck_slot))
+
+    def put(self, user_uuid, deck_slot, deck_cards, etag=None):
+        self._cache.put((user_uuid, deck_slot), (deck_cards, etag))
+
+    def invalidate(self, user_uuid, deck_slot=None):
+        """Rimuove il deck di uno slot, o tutti i deck dell'utente se deck_slot è None."""
+        slots = [deck_slot] if deck_slot is not None else range(1, 6)
+        return sum(self._cache.invalidate((user_uuid, slot)) for slot in slots)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
@@ -0,0 +1,196 @@
+"""
+Indice offline della forza di tutti i deck legali.
+
+Un deck legale (vedi validate_deck) è il Joker più 2 carte per seme con
+somma dei punti <= 15 (A = 7, J/Q/K = 11/12/13): per ogni seme ci sono 50
+coppie possibili, quindi 50^4 = 6.250.000 deck. Ogni deck ha una
+posizione fissa nell'indice (numero in base 50 delle coppie dei 4 semi),
+quindi la ricerca è O(1) senza tabelle di supporto.
+
+Forza di un deck: margine atteso di punti per round (vinti - persi, in
+[-1, 1]) contro un avversario scelto a caso tra tutti i deck legali, con
+carte giocate a caso da entrambi. Con giocate casuali ogni round mette
+di fronte una carta uniforme di ciascun mazzo, quindi il valore è esatto
+e si scompone in una somma sulle carte del deck:
+
+    forza(D) = 1/9 * sum_{a in D} campo[a]
+    campo[a] = sum_b MARGIN[a, b] * freq[b] / 9
+
+con freq[b] = numero atteso di copie della carta b in un deck legale.
+Per il confronto tra due deck specifici vedi expected_round_margin.
+
+L'indice è un file .npy (memmap) con forza (float32) e percentile
+(uint16, centesimi di punto) per ogni deck. Si costruisce con:
+
+    python -m game_engine.deck_index [--output data/deck_index.npy] [--check 200]
+"""
+import argparse
+import itertools
+import os
+import threading
+
+import numpy as np
+
+from .cards import OUTCOME, NUM_CARDS, JOKER, SUITS, VALUES, PLAYER1, PLAYER2, encode, parse_card
+
+POINTS = {v: (int(v) if v.isdigit() else {"J": 11, "Q": 12, "K": 13, "A": 7}[v]) for v in VALUES}
+MAX_SUIT_POINTS = 15
+
+# Coppie (indici di valore, ordinate) ammesse in un seme
+SUIT_PAIRS = [p for p in itertools.combinations_with_replacement(range(len(VALUES)), 2)
+              if POINTS[VALUES[p[0]]] + POINTS[VALUES[p[1]]] <= MAX_SUIT_POINTS]
+_PAIR_INDEX = {p: i for i, p in enumerate(SUIT_PAIRS)}
+NUM_DECKS = len(SUIT_PAIRS) ** len(SUITS)
+
+INDEX_DTYPE = np.dtype([("strength", "<f4"), ("percentile", "<u2")])
+
+# +1 se vince la carta di riga, -1 se vince quella di colonna (pareggio e Joker contro Joker: 0)
+_OUTCOME = np.frombuffer(b"".join(OUTCOME), dtype=np.uint8).reshape(NUM_CARDS, NUM_CARDS)
+MARGIN = (_OUTCOME == PLAYER1).astype(np.float64) - (_OUTCOME == PLAYER2)
+
+
+def deck_position(deck_cards):
+    """Posizione del deck nell'indice. Solleva ValueError se il deck non è legale."""
+    codes = sorted(parse_card(c) for c in deck_cards)
+    if len(codes) != 9 or codes[-1] != JOKER or codes[-2] == JOKER:
+        raise ValueError("Deck must contain exactly 9 cards (8 + 1 Joker).")
+    position = 0
+    for s in range(len(SUITS)):
+        pair = tuple(c % 13 for c in codes[2 * s:2 * s + 2])
+        if len(pair) != 2 or any(c // 13 != s for c in codes[2 * s:2 * s + 2]) or pair not in _PAIR_INDEX:
+            raise ValueError(f"Suit '{SUITS[s]}' must have exactly 2 cards with at most {MAX_SUIT_POINTS} points.")
+        position = position * len(SUIT_PAIRS) + _PAIR_INDEX[pair]
+    return position
+
+
+def deck_at(position):
+    """Inverso di deck_position: lista di carte {"value", "suit"}."""
+    pairs = []
+    for _ in SUITS:
+        position, i = divmod(position, len(SUIT_PAIRS))
+        pairs.append(SUIT_PAIRS[i])
+    deck = []
+    for suit, pair in zip(SUITS, reversed(pairs)):
+        deck += [{"value": VALUES[v], "suit": suit} for v in pair]
+    return deck + [{"value": "JOKER", "suit": "none"}]
+
+
+def card_counts(deck_cards):
+    """Vettore (53) con il numero di copie di ogni carta nel deck."""
+    return np.bincount([parse_card(c) for c in deck_cards], minlength=NUM_CARDS).astype(np.float64)
+
+
+def expected_round_margin(deck1, deck2):
+    """Margine atteso per round di deck1 contro deck2 con giocate casuali (esatto)."""
+    c1, c2 = card_counts(deck1), card_counts(deck2)
+    return float(c1 @ MARGIN @ c2) / (c1.sum() * c2.sum())
+
+
+def field_frequencies():
+    """Numero atteso di copie di ogni carta in un deck legale uniforme."""
+    freq = np.zeros(NUM_CARDS)
+    for a, b in SUIT_PAIRS:
+        for s in range(len(SUITS)):
+            freq[s * 13 + a] += 1
+            freq[s * 13 + b] += 1
+    freq /= len(SUIT_PAIRS)
+    freq[JOKER] = 1.0
+    return freq
+
+
+def compute_strengths():
+    """Forza di tutti i deck, in ordine di posizione (float64)."""
+    field = MARGIN @ field_frequencies() / 9
+    # Contributo di ogni coppia in ogni seme, poi somma esterna sui 4 semi
+    suit_terms = [np.array([field[encode(VALUES[a], suit)] + field[encode(VALUES[b], suit)]
+                            for a, b in SUIT_PAIRS]) for suit in SUITS]
+    total = suit_terms[0]
+    for term in suit_terms[1:]:
+        total = np.add.outer(total, term).ravel()
+    return (total + field[JOKER]) / 9
+
+
+def build_index(path):
+    """Calcola forza e percentile di tutti i deck e scrive l'indice (scrittura atomica)."""
+    strengths = compute_strengths()
+    # Arrotondati: deck con la stessa forza devono avere lo stesso percentile
+    strengths = np.round(strengths, 9)
+    below = np.searchsorted(np.sort(strengths), strengths, side="left")
+
+    tmp_path = f"{path}.tmp"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    index = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=INDEX_DTYPE, shape=(NUM_DECKS,))
+    index["strength"] = strengths
+    index["percentile"] = np.floor(below * 10000 / NUM_DECKS)
+    index.flush()
+    del index
+    os.replace(tmp_path, path)
+    return strengths
+
+
+class DeckIndex:
+    """Indice aperto in memmap al primo utilizzo (il file è condiviso tra i worker)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    index = np.load(self.path, mmap_mode="r")
+                    if index.dtype != INDEX_DTYPE or index.shape != (NUM_DECKS,):
+                        raise ValueError(f"Deck index {self.path} does not match the current deck rules, rebuild it")
+                    self._index = index
+        return self._index
+
+    def rating(self, deck_cards):
+        """Forza e percentile del deck. FileNotFoundError se l'indice non è stato costruito."""
+        record = self._load()[deck_position(deck_cards)]
+        return {
+            "strength": round(float(record["strength"]), 6),
+            "percentile": int(record["percentile"]) / 100,
+        }
+
+
+def _check(strengths, samples, matches, seed=0):
+    """Confronta la forza con il tasso di vittoria simulato contro deck casuali (correlazione di rango)."""
+    from .simulator import simulate
+
+    rng = np.random.default_rng(seed)
+    positions = rng.choice(NUM_DECKS, size=samples, replace=False)
+    opponents = [deck_at(p) for p in rng.choice(NUM_DECKS, size=20, replace=False)]
+    win_rates = []
+    for p in positions:
+        deck = deck_at(p)
+        wins = sum(simulate(deck, o, matches, seed=int(p)).player1_wins for o in opponents)
+        win_rates.append(wins / (matches * len(opponents)))
+    ranks_a = np.argsort(np.argsort(strengths[positions]))
+    ranks_b = np.argsort(np.argsort(win_rates))
+    return float(np.corrcoef(ranks_a, ranks_b)[0, 1])
+
+
+def main():
+    from .config import DECK_INDEX_PATH
+
+    parser = argparse.ArgumentParser(description="Costruisce l'indice di forza dei deck legali")
+    parser.add_argument("--output", default=DECK_INDEX_PATH)
+    parser.add_argument("--check", type=int, default=0,
+                        help="deck campione da confrontare con il simulatore (0 = nessun controllo)")
+    parser.add_argument("--matches", type=int, default=500, help="partite simulate per avversario in --check")
+    args = parser.parse_args()
+
+    strengths = build_index(args.output)
+    size = os.path.getsize(args.output)
+    print(f"{NUM_DECKS} deck legali, indice {args.output} ({size / 2**20:.1f} MiB)")
+    print(f"forza: min {strengths.min():.4f}, mediana {np.median(strengths):.4f}, max {strengths.max():.4f}")
+    print(f"deck più forte: {deck_at(int(strengths.argmax()))}")
+    if args.check:
+        rho = _check(strengths, args.check, args.matches)
+        print(f"correlazione di rango forza / vittorie simulate su {args.check} deck: {rho:.3f}")
+
+
+if __name__ == "__main__":
+    main()
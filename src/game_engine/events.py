@@ -0,0 +1,133 @@
+import asyncio
+import itertools
+import json
+import queue
+import threading
+
+# Eventi di partita inviati ai client (Server-Sent Events)
+OPPONENT_PLAYED = "opponent_played"
+ROUND_RESOLVED = "round_resolved"
+CARDS_DRAWN = "cards_drawn"
+GAME_FINISHED = "game_finished"
+GAME_EXPIRED = "game_expired"  # partita rimossa dal reaper per inattività
+
+
+def format_sse(event, data, event_id=None):
+    """Serializza un evento nel formato text/event-stream."""
+    message = ""
+    if event_id is not None:
+        message += f"id: {event_id}\n"
+    message += f"event: {event}\n"
+    message += f"data: {json.dumps(data)}\n\n"
+    return message
+
+
+class Subscription:
+    """Coda di eventi di un singolo client collegato a una partita."""
+
+    def __init__(self, game_id, user_uuid, maxsize):
+        self.game_id = game_id
+        self.user_uuid = user_uuid
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def get(self, timeout=None):
+        """Ritorna (event, data, event_id). Solleva queue.Empty allo scadere del timeout."""
+        return self.queue.get(timeout=timeout)
+
+    def put(self, item):
+        """Chiamata da publish (qualsiasi thread). Solleva queue.Full se il client è troppo lento."""
+        self.queue.put_nowait(item)
+
+
+class AsyncSubscription(Subscription):
+    """
+    Coda di eventi letta da un event loop asyncio (server ASGI, vedi asgi.py).
+    publish può essere chiamato da qualsiasi thread: l'evento viene
+    consegnato nel loop con call_soon_threadsafe.
+    """
+
+    def __init__(self, game_id, user_uuid, maxsize, loop):
+        self.game_id = game_id
+        self.user_uuid = user_uuid
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self._loop = loop
+
+    async def get(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            raise queue.Empty
+
+    def put(self, item):
+        if self.queue.full():
+            raise queue.Full
+        try:
+            self._loop.call_soon_threadsafe(self._deliver, item)
+        except RuntimeError:
+            pass  # loop già chiuso: il client non è più collegato
+
+    def _deliver(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            print(f"Coda eventi piena per {self.user_uuid} (partita {self.game_id})", flush=True)
+
+
+class GameEventBus:
+    """
+    Publish/subscribe in memoria degli eventi di partita.
+    Ogni giocatore collegato ha la sua coda; gli eventi possono essere
+    destinati a tutti o solo ad alcuni giocatori (es. la propria mano).
+    """
+
+    def __init__(self, max_queued_events=100):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # game_id -> set(Subscription)
+        self._ids = itertools.count(1)
+        self._max_queued_events = max_queued_events
+
+    def subscribe(self, game_id, user_uuid, loop=None):
+        """Con loop (event loop asyncio) la coda si legge con await subscription.get()."""
+        if loop is None:
+            subscription = Subscription(game_id, user_uuid, self._max_queued_events)
+        else:
+            subscription = AsyncSubscription(game_id, user_uuid, self._max_queued_events, loop)
+        with self._lock:
+            self._subscribers.setdefault(game_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subs = self._subscribers.get(subscription.game_id)
+            if subs:
+                subs.discard(subscription)
+                if not subs:
+                    del self._subscribers[subscription.game_id]
+
+    def subscriber_count(self, game_id):
+        with self._lock:
+            return len(self._subscribers.get(game_id, ()))
+
+    def publish(self, game_id, event, data, recipients=None):
+        """
+        Invia un evento ai client della partita.
+        recipients: lista di uuid destinatari (None = tutti).
+        """
+        with self._lock:
+            subs = list(self._subscribers.get(game_id, ()))
+        if not subs:
+            return
+
+        event_id = next(self._ids)
+        for sub in subs:
+            if recipients is not None and sub.user_uuid not in recipients:
+                continue
+            try:
+                sub.put((event, data, event_id))
+            except queue.Full:
+                # Client troppo lento: l'evento viene scartato, al prossimo
+                # collegamento riceverà comunque lo snapshot completo
+                print(f"Coda eventi piena per {sub.user_uuid} (partita {game_id})", flush=True)
+
+
+event_bus = GameEventBus()
@@ -0,0 +1,198 @@
+"""
+Parte HTTP comune alle due app del game engine: routes.py (Flask) e
+asgi.py (FastAPI). Qui stanno lettura di body e query string, mappatura
+eccezione -> status, letture con ETag/304 e il protocollo del WebSocket.
+Gli adapter fanno solo l'I/O del proprio framework e le attese (thread in
+Flask, event loop in ASGI): una modifica al contratto delle API si fa qui.
+"""
+import json
+
+from .logic import (
+    submit_card,
+    get_game_state,
+    get_player_hand,
+    check_player,
+    invalidate_cached_deck,
+)
+from .outbox import OutboxFull
+from .config import PUBLISHER_RETRY_SECONDS
+
+
+class InvalidRequest(ValueError):
+    """Body o parametri della richiesta non validi: sempre 400."""
+
+
+# Eccezione -> status per endpoint, separate per fase: "auth" (validazione del
+# token) e "call" (lettura della richiesta e chiamata a logic). Vince la prima
+# classe che corrisponde; le eccezioni non elencate arrivano al framework (500).
+_READ_ERRORS = {"auth": ((ValueError, 400),), "call": ((ValueError, 400),)}
+_QUEUE_ERRORS = {"auth": ((ValueError, 401), (Exception, 500)), "call": ((ValueError, 401), (Exception, 500))}
+
+ERRORS = {
+    "choose_deck": {"auth": ((ValueError, 401), (Exception, 400)), "call": ((ValueError, 401), (Exception, 400))},
+    "deck_rating": {"auth": ((ValueError, 401),), "call": ((ValueError, 400), (FileNotFoundError, 503))},
+    "play_turn": {"auth": ((ValueError, 400),), "call": ((OutboxFull, 503), (ValueError, 400))},
+    "get_hand": _READ_ERRORS,
+    "get_state": _READ_ERRORS,
+    "get_view": _READ_ERRORS,
+    "join_matchmaking": {"auth": ((ValueError, 401), (Exception, 500)), "call": ((ValueError, 400), (Exception, 500))},
+    "status_matchmaking": _QUEUE_ERRORS,
+    "leave_matchmaking": _QUEUE_ERRORS,
+    "stream_events": {"auth": ((ValueError, 401),), "call": ((ValueError, 400),)},
+}
+
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def error_response(endpoint, stage, exc):
+    """(corpo, status, header) della risposta di errore per exc, None se l'endpoint non la gestisce."""
+    if stage == "call" and isinstance(exc, InvalidRequest):
+        status = 400
+    else:
+        status = next((status for cls, status in ERRORS[endpoint][stage] if isinstance(exc, cls)), None)
+        if status is None:
+            return None
+
+    message, headers = str(exc), {}
+    if isinstance(exc, OutboxFull):
+        # Storico irraggiungibile da troppo tempo: giocata non applicata, il client riprova
+        headers["Retry-After"] = str(int(PUBLISHER_RETRY_SECONDS))
+    elif isinstance(exc, FileNotFoundError):
+        message = "Deck rating index not available"
+    return {"error": message}, status, headers
+
+
+# --- Lettura della richiesta ---
+
+def json_field(body, name):
+    """Campo del body JSON (None se manca); body assente o non oggetto -> InvalidRequest."""
+    if not isinstance(body, dict):
+        raise InvalidRequest("Invalid JSON body")
+    return body.get(name)
+
+
+def required_deck_slot(body):
+    deck_slot = body.get("deck_slot") if isinstance(body, dict) else None
+    if not deck_slot:
+        raise InvalidRequest("deck_slot is required (1-5)")
+    return deck_slot
+
+
+def query_number(args, name, type, default=None):
+    """Parametro numerico della query string, default se manca o non è un numero."""
+    try:
+        return type(args[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def is_compact(args):
+    # ?format=compact -> carte come codici interi (vedi cards.py)
+    return args.get("format") == "compact"
+
+
+def wait_seconds(args):
+    # ?wait=N -> long-poll: la risposta arriva appena si trova un avversario
+    return max(query_number(args, "wait", float, 0), 0)
+
+
+# --- Letture con ETag ---
+
+def if_none_match(header):
+    """ETag elencati in If-None-Match (con le virgolette, come li invia il client)."""
+    return {tag.strip().removeprefix("W/") for tag in (header or "").split(",")}
+
+
+def etag(version):
+    return f'"{version}"'
+
+
+def versioned_read(games, tags, game_id, user_uuid, read, *args):
+    """
+    Lettura con ETag = versione della partita (stato, mano e vista cambiano
+    solo quando cambia la versione). Ritorna (None, versione) se il client ha
+    già questa versione (304, la partita non viene letta), altrimenti
+    read(*args), cioè (JSON già codificato dalla cache per versione, versione).
+    Il confronto con l'ETag avviene solo dopo aver verificato che la partita
+    esista e che l'utente sia un suo giocatore: altrimenti un 304 rivelerebbe
+    a chiunque esistenza e versione della partita.
+    """
+    check_player(game_id, user_uuid, games)
+    version = games.get_version(game_id)
+    if version is not None and (etag(version) in tags or "*" in tags):
+        return None, version
+    return read(*args)
+
+
+# --- Stream SSE e WebSocket ---
+
+def event_snapshot(game_id, user_uuid, games):
+    """Stato iniziale di uno stream, solo per i giocatori della partita (ValueError altrimenti)."""
+    snapshot = get_game_state(game_id, games)
+    if user_uuid not in [p["uuid"] for p in snapshot["players"]]:
+        raise ValueError("Player UUID not found in this game")
+    return snapshot
+
+
+def socket_token_header(raw):
+    """Header Authorization dal primo messaggio {"type": "auth", "token": "..."}, None se non lo è."""
+    try:
+        first = json.loads(raw or "{}")
+    except json.JSONDecodeError:
+        return None
+    if isinstance(first, dict) and first.get("type") == "auth" and first.get("token"):
+        return f"Bearer {first['token']}"
+    return None
+
+
+def socket_snapshot(game_id, user_uuid, games):
+    return {
+        "type": "snapshot",
+        "data": get_game_state(game_id, games),
+        "hand": get_player_hand(game_id, user_uuid, games),
+    }
+
+
+def socket_event(event, data, event_id):
+    return {"type": "event", "event": event, "data": data, "id": event_id}
+
+
+def socket_reply(raw, game_id, user_uuid, games):
+    """Risposta a un messaggio del client sul WebSocket (play, hand, state, ping)."""
+    try:
+        message = json.loads(raw)
+    except (TypeError, json.JSONDecodeError):
+        return {"type": "error", "error": "Invalid JSON message"}
+    if not isinstance(message, dict):
+        return {"type": "error", "error": "Invalid JSON message"}
+
+    msg_type = message.get("type")
+    try:
+        if msg_type == "play":
+            return {"type": "play_result", "data": submit_card(game_id, user_uuid, message.get("card"), games)}
+        if msg_type == "hand":
+            compact = message.get("format") == "compact"
+            return {"type": "hand", "data": get_player_hand(game_id, user_uuid, games, compact)}
+        if msg_type == "state":
+            return {"type": "state", "data": get_game_state(game_id, games, message.get("since"))}
+        if msg_type == "ping":
+            return {"type": "pong"}
+        return {"type": "error", "error": f"Unknown message type: {msg_type}"}
+    except (ValueError, KeyError, TypeError) as e:
+        return {"type": "error", "error": str(e)}
+
+
+# --- Endpoint interni ---
+
+def invalidate_deck(body):
+    """/internal/decks/invalidate, usato dal servizio collection: (corpo, status)."""
+    data = body if isinstance(body, dict) else {}
+    user_uuid = data.get("user")
+    deck_slot = data.get("slot")
+
+    if not user_uuid:
+        return {"error": "Missing user"}, 400
+    if deck_slot is not None and deck_slot not in [1, 2, 3, 4, 5]:
+        return {"error": "slot must be between 1 and 5"}, 400
+
+    return {"invalidated": invalidate_cached_deck(user_uuid, deck_slot)}, 200
@@ -1,32 +1,79 @@
 from datetime import datetime
 from .models import Game, Player, Card, Deck
+from .cards import OUTCOME, OUTCOME_NAMES, PLAYER1, PLAYER2, DOUBLE_WIN, NUM_CARDS, encode, parse_card
+from .store import game_store, VersionConflict, RATING_WINDOW, InMemoryGameStore
+from .events import event_bus, OPPONENT_PLAYED, ROUND_RESOLVED, CARDS_DRAWN, GAME_FINISHED
+from .deck_cache import DeckCache
+from .ratings import RatingCache
+from .response_cache import ResponseCache
+from .publisher import match_publisher
+from .outbox import OutboxFull
+from .scheduler import scheduler
+from .reaper import GameReaper
+from .deck_index import DeckIndex
+from .matchmaking import MatchmakingTicker, pair_queue
+from .snapshot import GameSnapshotter
+from . import bot
+from concurrent.futures import ThreadPoolExecutor
+import gc
+import json
 import random
 import requests
+import time
 import uuid
-import json
 import urllib3
-import pika
 from .config import COLLECTION_URL, COLLECTION_CERT, USER_MANAGER_URL, USER_MANAGER_CERT
-from .config import RABBITMQ_HOST, RABBITMQ_PORT, RABBITMQ_USER, RABBITMQ_PASSWORD, RABBITMQ_CERT_PATH
+from .config import MATCH_STATUS_MAX_WAIT, DECK_CACHE_SIZE, DECK_CACHE_TTL, SUBMIT_CARD_MAX_RETRIES
+from .config import GAME_FINISHED_TTL, GAME_IDLE_TTL, MATCHMAKING_ENTRY_TTL, PENDING_MATCH_TTL
+from .config import TURN_TIMEOUT_SECONDS, MAX_MISSED_TURNS, DECK_INDEX_PATH
+from .config import BOT_FALLBACK_SECONDS, DEADLINE_WORKERS
+from .config import MATCHMAKING_BATCH_MS, MATCHMAKING_BATCH_WORKERS, RESPONSE_CACHE_SIZE
+from .config import MATCHMAKING_RATED, GAME_HISTORY_RATINGS_URL, HISTORY_CERT, RATING_CACHE_SIZE, RATING_CACHE_TTL
+from .config import SNAPSHOT_PATH, SNAPSHOT_INTERVAL_SECONDS
+from .config import PUBLISHER_RETRY_SECONDS
 # Disabilita warning per certificati self-signed interni
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
 
-# --- STRUTTURE DATI PER MATCHMAKING REST ---
-matchmaking_queue = []
-pending_matches = {}
-games = {}
+# Partite, coda di matchmaking e partite pendenti vivono in game_store
+# (in memoria o su Redis, vedi store.py)
+
+# Deck già validati: rivincite e nuovi join non richiamano il servizio collection
+deck_cache = DeckCache(maxsize=DECK_CACHE_SIZE, ttl=DECK_CACHE_TTL)
+
+# Risposte di lettura (stato, mano, vista) già codificate, per versione della partita
+response_cache = ResponseCache(maxsize=RESPONSE_CACHE_SIZE)
+
+# Rating (punti in classifica) usati dal matchmaking, letti da game_history una volta per TTL
+rating_cache = RatingCache(maxsize=RATING_CACHE_SIZE, ttl=RATING_CACHE_TTL)
+
+# Pulizia in background di partite finite/abbandonate e code scadute
+reaper = GameReaper(game_store, scheduler, GAME_FINISHED_TTL, GAME_IDLE_TTL, MATCHMAKING_ENTRY_TTL, PENDING_MATCH_TTL)
+
+# Forza precalcolata di tutti i deck legali (vedi deck_index.py)
+deck_index = DeckIndex(DECK_INDEX_PATH)
+
+# Matchmaking a blocchi (MATCHMAKING_BATCH_MS > 0): abbinamento periodico di
+# tutta la coda, deck e rating caricati in parallelo fuori dalle richieste
+matchmaking_ticker = MatchmakingTicker(MATCHMAKING_BATCH_MS / 1000, lambda: run_matchmaking_tick())
+_batch_loader = ThreadPoolExecutor(max_workers=MATCHMAKING_BATCH_WORKERS, thread_name_prefix="matchmaking-loader")
+
+# Scadenze di bot e turni: lo scheduler ha un solo thread, che passa il
+# callback a questo pool (rivalidazione del deck via HTTP, submit_card con
+# scrittura nell'outbox) e resta libero per le scadenze successive
+_deadline_workers = ThreadPoolExecutor(max_workers=DEADLINE_WORKERS, thread_name_prefix="deadline-worker")
+
+# Snapshot periodici su disco di partite e coda (solo store in memoria: con
+# Redis lo stato sopravvive già al riavvio del processo), vedi restore_snapshot
+snapshotter = GameSnapshotter(SNAPSHOT_PATH, game_store, SNAPSHOT_INTERVAL_SECONDS)
 
 # ------------------------------------------------------------
 # 🂡 Utility: Create a full deck (for testing or reference)
 # ------------------------------------------------------------
 def generate_full_deck():
-    suits = ["hearts", "diamonds", "clubs", "spades"]
-    values = [str(n) for n in range(2, 11)] + ["J", "Q", "K", "A"]
-    deck = [Card(value, suit) for suit in suits for value in values]
-    deck.append(Card("JOKER", "none"))
-    return deck
+    # Codici 0..51 (seme per seme) + Joker, vedi cards.py
+    return [Card.from_code(code) for code in range(NUM_CARDS)]
 
 
 # ------------------------------------------------------------
@@ -56,6 +103,9 @@ def validate_deck(deck_cards):
         if value is None or suit is None:
             raise ValueError(f"Invalid card data: value or suit is null/missing. Card: {card}")
 
+        # Solo le 53 carte esistenti (le altre non hanno codifica né esito)
+        encode(value, suit)
+
         if value == "JOKER":
             joker_found = True
             continue
@@ -92,7 +142,8 @@ def start_new_game(player1_uuid, player1_name, player2_uuid, player2_name, games
     p2 = Player(uuid=player2_uuid, name=player2_name)
     
     game = Game(p1, p2) # Game ora usa i nuovi Player
-    games[game.game_id] = game
+    games.add(game)
+    reaper.track_game(game.game_id)
     return game.game_id
 
 
@@ -107,287 +158,598 @@ def process_matchmaking_request(user_uuid, user_name, deck_slot, games_dict):
         user_uuid: Player's unique identifier
         user_name: Player's username
         deck_slot: The deck slot (1-5) the player wants to use
-        games_dict: Dictionary of active games
+        games_dict: Game store of active games (see store.py)
     
     Returns:
         Dict with matchmaking status (waiting/matched)
     """
-    global matchmaking_queue, pending_matches
+    # 1-2. Match pendente, validazione dello slot e matchmaking a blocchi
+    result = _join_without_fetch(user_uuid, user_name, deck_slot)
+    if result:
+        return result
 
-    # 1. Controllo match pendente
-    if user_uuid in pending_matches:
-        return {"status": "matched", "game_id": pending_matches[user_uuid], "message": "Partita trovata!"}
+    # 3. Scarica e valida il deck selezionato (una sola volta: viene
+    #    conservato nella entry di coda e riusato quando si forma la partita)
+    deck_cards, deck_etag = _get_validated_deck(user_uuid, deck_slot)
+    rating = _get_rating(user_uuid) if MATCHMAKING_RATED else None
+
+    # 4. Sezione critica (condivisa tra i worker): pulizia coda e matching
+    opponent = _pop_opponent_or_join(user_uuid, user_name, deck_slot, deck_cards, deck_etag, rating)
+    if not opponent:
+        return _waiting_response(deck_slot)
+
+    # 5. Crea la partita (l'avversario è già stato tolto dalla coda)
+    try:
+        # Deck dell'opponent (player1): riusa quello validato al join se non è cambiato
+        opponent_deck = _revalidate_queued_deck(opponent)
+    except Exception as e:
+        raise ValueError(f"Failed to load decks: {str(e)}")
+    return _create_match(opponent, opponent_deck, user_uuid, user_name, deck_cards, games_dict)
+
+
+def _waiting_response(deck_slot):
+    return {"status": "waiting", "message": f"Waiting for opponent... (Using deck #{deck_slot})"}
+
+
+def _join_without_fetch(user_uuid, user_name, deck_slot):
+    """
+    Parte del join che non chiama altri servizi: match pendente, validazione
+    dello slot e, con il matchmaking a blocchi, l'ingresso in coda. Ritorna
+    la risposta del join oppure None se servono deck e rating.
+    """
+    pending_game_id = game_store.get_pending(user_uuid)
+    if pending_game_id:
+        return {"status": "matched", "game_id": pending_game_id, "message": "Partita trovata!"}
 
-    # 2. Valida il deck_slot
     if not deck_slot or deck_slot not in [1, 2, 3, 4, 5]:
         raise ValueError("deck_slot must be between 1 and 5")
 
-    # 3. Verifica che il deck selezionato esista
+    # Matchmaking a blocchi: il join mette solo in coda, il resto lo fa run_matchmaking_tick
+    if MATCHMAKING_BATCH_MS > 0:
+        with game_store.matchmaking_lock():
+            game_store.queue_cancel(user_uuid)
+            _join_queue({
+                'uuid': user_uuid,
+                'name': user_name,
+                'deck_slot': deck_slot,
+                'deck': None,
+                'deck_etag': None,
+                'rating': None,
+                'joined_at': time.time()
+            })
+        matchmaking_ticker.start()
+        return _waiting_response(deck_slot)
+    return None
+
+
+def _pop_opponent_or_join(user_uuid, user_name, deck_slot, deck_cards, deck_etag, rating):
+    """Avversario tolto dalla coda, oppure None se il giocatore è entrato in coda."""
+    with game_store.matchmaking_lock():
+        # Rimuove un'eventuale entry precedente dello stesso utente
+        game_store.queue_cancel(user_uuid)
+        # FIFO, oppure l'avversario con il rating più vicino entro la finestra
+        opponent = game_store.queue_pop(rating)
+        if not opponent:
+            # Aggiungi alla coda con il deck_slot e il deck già validato
+            _join_queue({
+                'uuid': user_uuid,
+                'name': user_name,
+                'deck_slot': deck_slot,
+                'deck': deck_cards,
+                'deck_etag': deck_etag,
+                'rating': rating,
+                'joined_at': time.time()
+            })
+        return opponent
+
+
+def _create_match(opponent, opponent_deck, user_uuid, user_name, deck_cards, games_dict):
+    """Partita tra l'avversario tolto dalla coda (player1) e chi ha fatto il join."""
+    game = Game(Player(uuid=opponent['uuid'], name=opponent['name']), Player(uuid=user_uuid, name=user_name))
+
+    # Auto-carica i deck per entrambi i giocatori
     try:
-        check_url = f"{COLLECTION_URL}/user-decks"
-        params = {'user': user_uuid, 'slot': deck_slot}
-        response = requests.get(check_url, params=params, timeout=5, verify=COLLECTION_CERT)
-        
-        if response.status_code != 200:
-            raise ValueError(f"Deck slot {deck_slot} not found. Please create a deck in this slot first.")
-        
-        # Valida il deck ricevuto
-        deck_data = response.json()
-        if not deck_data.get('success') or 'data' not in deck_data:
-            raise ValueError("Invalid deck data from collection service")
-        
-        validate_deck(deck_data['data'])
-            
-    except requests.RequestException as e:
-        # Se non riusciamo a contattare il servizio collection
-        if hasattr(e, 'response') and e.response:
-            try:
-                error_msg = e.response.json().get('error', 'Unknown error')
-            except:
-                error_msg = e.response.text
-            raise ValueError(f"Collection Service error: {error_msg}")
-        else:
-            raise ValueError(f"Could not reach collection service: {e}")
+        _assign_deck(game.player1, opponent_deck)
+        # Deck del current user (player2): appena scaricato
+        _assign_deck(game.player2, deck_cards)
 
-    # 4. Pulizia coda
-    matchmaking_queue = [p for p in matchmaking_queue if p['uuid'] != user_uuid]
+        # Pesca 3 carte per entrambi i giocatori
+        for _ in range(3):
+            game.player1.draw_card()
+            game.player2.draw_card()
+    except Exception as e:
+        raise ValueError(f"Failed to load decks: {str(e)}")
 
-    # 5. Matching
-    if len(matchmaking_queue) > 0:
-        opponent = matchmaking_queue.pop(0)
-        
-        # Crea la partita
-        game_id = start_new_game(opponent['uuid'], opponent['name'], user_uuid, user_name, games_dict)
-        game = games_dict.get(game_id)
-        
-        if not game:
-            raise ValueError("Failed to create game")
-        
-        # Auto-carica i deck per entrambi i giocatori
-        try:
-            # Carica deck per opponent (player1)
-            _load_deck_for_player(game, game.player1, opponent['deck_slot'], games_dict)
-            # Carica deck per current user (player2)
-            _load_deck_for_player(game, game.player2, deck_slot, games_dict)
-            
-            # Pesca 3 carte per entrambi i giocatori
-            for _ in range(3):
-                game.player1.draw_card()
-                game.player2.draw_card()
-            
-            pending_matches[opponent['uuid']] = game_id
-            
-            return {
-                "status": "matched",
-                "game_id": game_id,
-                "opponent": opponent['name'],
-                "role": "player2",
-                "message": "Match found! Decks loaded and 3 cards drawn. Ready to play!"
-            }
-        except Exception as e:
-            # Se il caricamento del deck fallisce, rimuovi il gioco
-            games_dict.pop(game_id, None)
-            raise ValueError(f"Failed to load decks: {str(e)}")
-    else:
-        # Aggiungi alla coda con il deck_slot
-        matchmaking_queue.append({
-            'uuid': user_uuid,
-            'name': user_name,
-            'deck_slot': deck_slot
-        })
-        return {"status": "waiting", "message": f"Waiting for opponent... (Using deck #{deck_slot})"}
+    _start_match(game, games_dict, opponent['uuid'])
+
+    return {
+        "status": "matched",
+        "game_id": game.game_id,
+        "opponent": opponent['name'],
+        "role": "player2",
+        "message": "Match found! Decks loaded and 3 cards drawn. Ready to play!"
+    }
+
+
+def _join_queue(entry):
+    """Mette il giocatore in coda (da chiamare con il lock del matchmaking)."""
+    user_uuid = entry['uuid']
+    game_store.queue_join(entry)
+    reaper.track_queue_entry(user_uuid)
+    if BOT_FALLBACK_SECONDS > 0:
+        # Se nessuno arriva entro BOT_FALLBACK_SECONDS si gioca contro il bot
+        _schedule_deadline(("bot", user_uuid), BOT_FALLBACK_SECONDS, _match_with_bot, user_uuid)
+
+
+def _start_match(game, games, *waiting_uuids):
+    """Registra una partita appena formata e avvisa i giocatori che erano in coda."""
+    _start_turn_clock(game)
+    games.add(game)
+    reaper.track_game(game.game_id)
+    _schedule_turn_deadline(game)
+    for waiting_uuid in waiting_uuids:
+        reaper.forget_queue_entry(waiting_uuid)
+        scheduler.cancel(("bot", waiting_uuid))
+        game_store.set_pending(waiting_uuid, game.game_id)
+        reaper.track_pending(waiting_uuid, game.game_id)
+        game_store.notify_match(waiting_uuid)
 
 
-def _load_deck_for_player(game, player, deck_slot, games_dict):
+def run_matchmaking_tick():
     """
-    Helper function to load a deck for a player.
-    
-    Args:
-        game: The Game object
-        player: The Player object
-        deck_slot: The deck slot to load
-        games_dict: Dictionary of active games
+    Un passo del matchmaking a blocchi (thread di matchmaking_ticker).
+
+    1. rating mancanti letti in parallelo (fuori dal lock)
+    2. sotto il lock: abbinamento di tutta la coda in un passo (pair_queue)
+       e rimozione dalla coda dei giocatori abbinati
+    3. deck di tutte le nuove partite caricati in parallelo (fuori dal lock)
+    4. partite create e registrate come pendenti per check_matchmaking_status
+
+    Se il deck di un giocatore non è più valido quel giocatore esce dalla
+    coda e il suo avversario ci rientra. Ritorna il numero di partite create.
+    """
+    if game_store.queue_len() < 2:
+        return 0
+
+    ratings = {}
+    if MATCHMAKING_RATED:
+        missing = [e['uuid'] for e in game_store.queue_entries() if e.get('rating') is None]
+        ratings = dict(zip(missing, _batch_loader.map(_get_rating, missing)))
+
+    def rating_of(entry):
+        rating = entry.get('rating')
+        return rating if rating is not None else ratings.get(entry['uuid'], 0)
+
+    with game_store.matchmaking_lock():
+        # Riletta sotto il lock: join e uscite avvenuti durante la lettura dei rating
+        entries = game_store.queue_entries()
+        pairs = pair_queue(entries, RATING_WINDOW if MATCHMAKING_RATED else None, rating_of)
+        for first, second in pairs:
+            game_store.queue_cancel(first['uuid'])
+            game_store.queue_cancel(second['uuid'])
+    if not pairs:
+        return 0
+
+    players = [entry for pair in pairs for entry in pair]
+    decks = list(_batch_loader.map(_load_queued_deck, players))
+
+    started = 0
+    for (first, second), deck1, deck2 in zip(pairs, decks[0::2], decks[1::2]):
+        if isinstance(deck1, ValueError) or isinstance(deck2, ValueError):
+            for entry, deck in ((first, deck1), (second, deck2)):
+                if isinstance(deck, ValueError):
+                    _drop_queue_entry(entry, deck)
+                else:
+                    # _join_queue riarma anche reaper e bot: le loro scadenze
+                    # possono essere già scattate mentre il giocatore era fuori coda
+                    with game_store.matchmaking_lock():
+                        if not game_store.queue_contains(entry['uuid']):
+                            _join_queue(entry)
+            continue
+
+        game = Game(Player(uuid=first['uuid'], name=first['name']), Player(uuid=second['uuid'], name=second['name']))
+        _assign_deck(game.player1, deck1)
+        _assign_deck(game.player2, deck2)
+        for _ in range(3):
+            game.player1.draw_card()
+            game.player2.draw_card()
+        _start_match(game, game_store, first['uuid'], second['uuid'])
+        started += 1
+    return started
+
+
+def _load_queued_deck(entry):
+    """Deck di un giocatore abbinato dal tick; l'errore viene restituito invece che sollevato."""
+    try:
+        return _revalidate_queued_deck(entry)
+    except ValueError as e:
+        return e
+
+
+def _drop_queue_entry(entry, error):
+    """Giocatore abbinato dal tick ma con un deck non valido: esce dalla coda."""
+    user_uuid = entry['uuid']
+    print(f"Matchmaking: impossibile caricare il deck di {user_uuid}: {error}", flush=True)
+    reaper.forget_queue_entry(user_uuid)
+    scheduler.cancel(("bot", user_uuid))
+    game_store.notify_match(user_uuid)
+    game_store.discard_match_signal(user_uuid)
+
+
+def _match_with_bot(user_uuid):
+    """
+    Scadenza dell'attesa in coda (thread di _deadline_workers): il giocatore, se
+    è ancora in coda, viene abbinato al bot del server.
+    """
+    with game_store.matchmaking_lock():
+        entry = game_store.queue_cancel(user_uuid)
+    if not entry:
+        return  # già abbinato, uscito dalla coda o rimosso dal reaper
+
+    game = Game(Player(uuid=user_uuid, name=entry['name']), bot.new_player())
+    try:
+        _assign_deck(game.player1, _revalidate_queued_deck(entry))
+    except ValueError as e:
+        print(f"Bot: impossibile caricare il deck di {user_uuid}: {e}", flush=True)
+        reaper.forget_queue_entry(user_uuid)
+        game_store.notify_match(user_uuid)
+        game_store.discard_match_signal(user_uuid)
+        return
+    for _ in range(3):
+        game.player1.draw_card()
+        game.player2.draw_card()
+
+    _start_match(game, game_store, user_uuid)
+    print(f"Bot: {entry['name']} abbinato al bot dopo {BOT_FALLBACK_SECONDS:.0f}s in coda (partita {game.game_id})", flush=True)
+    _bot_play(game)
+
+
+def _is_bot_game(game):
+    return bot.is_bot(game.player2.uuid)
+
+
+def _bot_play(game):
+    """Il bot gioca la sua carta del round (stesso percorso di un giocatore)."""
+    player = game.player2
+    if game.winner or player.uuid in game.current_round or not player.hand:
+        return
+    try:
+        submit_card(game.game_id, player.uuid, bot.choose_card(player.hand.codes), game_store)
+    except OutboxFull:
+        pass  # la carta del bot verrà giocata allo scadere del turno
+
+
+def _fetch_deck(user_uuid, deck_slot, etag=None):
+    """
+    Scarica un deck dal servizio collection e lo valida.
+
+    Se viene passato l'ETag di una versione già validata, la richiesta è
+    condizionale: se il deck non è cambiato il servizio risponde 304 e
+    viene restituito (None, etag).
+
+    Returns:
+        (deck_cards, etag)
     """
     deck_url = f"{COLLECTION_URL}/user-decks"
-    params = {'user': player.uuid, 'slot': deck_slot}
-    response = requests.get(deck_url, params=params, timeout=5, verify=COLLECTION_CERT)
-    response.raise_for_status()
-    
-    deck_data = response.json()
+    params = {'user': user_uuid, 'slot': deck_slot}
+    headers = {'If-None-Match': etag} if etag else {}
+
+    try:
+        response = requests.get(deck_url, params=params, headers=headers, timeout=5, verify=COLLECTION_CERT)
+    except requests.RequestException as e:
+        # Se non riusciamo a contattare il servizio collection
+        raise ValueError(f"Could not reach collection service: {e}")
+    return _deck_from_response(response, deck_slot, etag)
+
+
+def _deck_from_response(response, deck_slot, etag=None):
+    """(deck_cards, etag) da una risposta di collection (requests o httpx)."""
+    if response.status_code == 304:
+        return None, etag
+
+    if response.status_code == 404:
+        raise ValueError(f"Deck slot {deck_slot} not found. Please create a deck in this slot first.")
+
+    if response.status_code != 200:
+        try:
+            error_msg = response.json().get('error', 'Unknown error')
+        except ValueError:
+            error_msg = response.text
+        raise ValueError(f"Collection Service error: {error_msg}")
+
+    try:
+        deck_data = response.json()
+    except ValueError:
+        raise ValueError("Failed to parse deck data from collection service")
+
     if not deck_data.get('success') or 'data' not in deck_data:
-        raise ValueError(f"Invalid deck data for {player.name}")
-    
+        raise ValueError("Invalid deck data from collection service")
+
     deck_cards = deck_data['data']
     validate_deck(deck_cards)
-    
-    player.deck.cards = [Card(c["value"], c["suit"]) for c in deck_cards]
+    return deck_cards, response.headers.get('ETag')
+
+
+def _get_validated_deck(user_uuid, deck_slot):
+    """Deck validato dalla cache, oppure scaricato da collection e messo in cache."""
+    cached = deck_cache.get(user_uuid, deck_slot)
+    if cached:
+        return cached
+
+    deck_cards, etag = _fetch_deck(user_uuid, deck_slot)
+    deck_cache.put(user_uuid, deck_slot, deck_cards, etag)
+    return deck_cards, etag
+
+
+def _get_rating(user_uuid):
+    """
+    Punti in classifica del giocatore (0 se non ha ancora partite), dalla
+    cache o da game_history. Se game_history non risponde si usa 0 senza
+    metterlo in cache, così il join non fallisce.
+    """
+    rating = rating_cache.get(user_uuid)
+    if rating is not None:
+        return rating
+    try:
+        response = requests.get(GAME_HISTORY_RATINGS_URL, params={'id': user_uuid}, timeout=2, verify=HISTORY_CERT)
+        response.raise_for_status()
+        rating = response.json()['ratings'].get(user_uuid, 0)
+    except (requests.RequestException, ValueError, KeyError) as e:
+        print(f"Rating di {user_uuid} non disponibile, uso 0: {e}", flush=True)
+        return 0
+    rating_cache.put(user_uuid, rating)
+    return rating
+
+
+def _revalidate_queued_deck(entry):
+    """
+    Deck di un giocatore in coda. Se è ancora in cache (collection non l'ha
+    invalidato) si usa quello; altrimenti, se collection fornisce un ETag,
+    viene fatta una richiesta condizionale: con 304 si riusa il deck
+    validato al join, altrimenti si usa (e si rivalida) la nuova versione.
+    """
+    cached = deck_cache.get(entry['uuid'], entry['deck_slot'])
+    if cached:
+        return cached[0]
+
+    if not entry.get('deck_etag'):
+        deck_cards, _ = _get_validated_deck(entry['uuid'], entry['deck_slot'])
+        return deck_cards
+
+    deck_cards, etag = _fetch_deck(entry['uuid'], entry['deck_slot'], etag=entry['deck_etag'])
+    if deck_cards is None:
+        deck_cards = entry['deck']
+    deck_cache.put(entry['uuid'], entry['deck_slot'], deck_cards, etag)
+    return deck_cards
+
+
+def invalidate_cached_deck(user_uuid, deck_slot=None):
+    """Chiamata dal servizio collection quando un deck viene sostituito o cancellato."""
+    return deck_cache.invalidate(user_uuid, deck_slot)
+
+
+def _assign_deck(player, deck_cards):
+    """Assegna al giocatore un deck già validato e lo mescola."""
+    player.deck = Deck.from_dict(deck_cards)
     player.deck.shuffle()
 
-def check_matchmaking_status(user_uuid):
-    global pending_matches, matchmaking_queue
-    if user_uuid in pending_matches:
-        game_id = pending_matches.pop(user_uuid)
+
+def get_deck_rating(user_uuid, deck_slot):
+    """Forza e percentile del deck nello slot, letti dall'indice precalcolato."""
+    if not deck_slot or deck_slot not in [1, 2, 3, 4, 5]:
+        raise ValueError("deck_slot must be between 1 and 5")
+    deck_cards, _ = _get_validated_deck(user_uuid, deck_slot)
+    return _deck_rating(deck_cards, deck_slot)
+
+
+def _deck_rating(deck_cards, deck_slot):
+    rating = deck_index.rating(deck_cards)
+    rating["deck_slot"] = deck_slot
+    return rating
+
+
+def check_matchmaking_status(user_uuid, wait=0):
+    """
+    Stato del matchmaking. Con wait > 0 la richiesta resta in attesa lato
+    server (long-poll) finché non viene trovata una partita o scade il timeout.
+    """
+    # Un giocatore che controlla lo stato è ancora in lobby: la sua entry non scade
+    game_store.queue_touch(user_uuid)
+
+    if wait and not game_store.get_pending(user_uuid) and game_store.queue_contains(user_uuid):
+        game_store.wait_for_match(user_uuid, min(wait, MATCH_STATUS_MAX_WAIT))
+
+    game_id = game_store.pop_pending(user_uuid)
+    if game_id:
+        game_store.discard_match_signal(user_uuid)
+        reaper.forget_pending(user_uuid)
         return {"status": "matched", "game_id": game_id}
     
-    if any(p['uuid'] == user_uuid for p in matchmaking_queue):
+    if game_store.queue_contains(user_uuid):
         return {"status": "waiting"}
 
     return {"status": "error", "message": "Non sei in coda."}
 
 
+def leave_matchmaking(user_uuid):
+    """Rimuove subito il giocatore dalla coda (es. client che abbandona la lobby)."""
+    with game_store.matchmaking_lock():
+        entry = game_store.queue_cancel(user_uuid)
+    if entry:
+        reaper.forget_queue_entry(user_uuid)
+        scheduler.cancel(("bot", user_uuid))
+        # Sveglia eventuali long-poll ancora aperti
+        game_store.notify_match(user_uuid)
+        game_store.discard_match_signal(user_uuid)
+        return {"status": "left", "message": "Sei uscito dalla coda."}
+
+    pending_game_id = game_store.get_pending(user_uuid)
+    if pending_game_id:
+        return {"status": "matched", "game_id": pending_game_id, "message": "Partita già trovata."}
+
+    return {"status": "error", "message": "Non sei in coda."}
+
+
 # ------------------------------------------------------------
 # 🃏 Deck Selection
 # ------------------------------------------------------------
 def select_deck(game_id, player_uuid, deck_slot, games):
-    game = games.get(game_id)
-    if not game:
+    if game_id not in games:
         raise ValueError("Invalid game ID")
 
-    try:
-        # 1. Contatta il microservizio 'collection' per ottenere il mazzo
-        deck_url = f"{COLLECTION_URL}/user-decks"
-        params = {'user': player_uuid, 'slot': deck_slot}
-        response = requests.get(deck_url, params=params, timeout=5, verify=COLLECTION_CERT)
-        
-        # Lancia un errore se la richiesta fallisce (es. 404 Deck non trovato)
-        response.raise_for_status() 
-        
-        deck_data = response.json()
-        
-        if not deck_data.get('success') or 'data' not in deck_data:
-            raise ValueError("Invalid response from collection service")
-            
-        # deck_cards è ora la lista di 9 carte (8 + 1 Joker)
-        deck_cards = deck_data['data'] 
-    
-    except requests.RequestException as e:
-        # Errore di connessione, timeout, o status code >= 400
-        if e.response:
-            try:
-                error_msg = e.response.json().get('error', 'Unknown error')
-            except json.JSONDecodeError:
-                error_msg = e.response.text
-            raise ValueError(f"Collection Service error: {error_msg}")
-        else:
-            raise ValueError(f"Could not reach collection service: {e}")
-    except (KeyError, json.JSONDecodeError):
-        raise ValueError("Failed to parse deck data from collection service")
+    # Contatta il microservizio 'collection' per ottenere e validare il mazzo
+    # deck_cards è la lista di 9 carte (8 + 1 Joker).
+    # La chiamata di rete avviene prima di prendere il lock della partita
+    deck_cards, _ = _get_validated_deck(player_uuid, deck_slot)
+    return _assign_selected_deck(game_id, player_uuid, deck_cards, games)
 
-    validate_deck(deck_cards) # Valida il mazzo ricevuto dal servizio
 
-    # Identifica il giocatore tramite UUID
-    player = game.player1 if game.player1.uuid == player_uuid else game.player2
-    if player.uuid != player_uuid:
-        raise ValueError("Player UUID not found in this game")
+def _assign_selected_deck(game_id, player_uuid, deck_cards, games):
+    """Assegna il deck già validato al giocatore e, se anche l'avversario è pronto, avvia la partita."""
+    with games.game_lock(game_id):
+        game = games.get(game_id)
+        if not game:
+            raise ValueError("Invalid game ID")
+        expected_version = game.version
 
-    player.deck.cards = [Card(c["value"], c["suit"]) for c in deck_cards]
-    player.deck.shuffle()
+        # Identifica il giocatore tramite UUID
+        player = game.player1 if game.player1.uuid == player_uuid else game.player2
+        if player.uuid != player_uuid:
+            raise ValueError("Player UUID not found in this game")
+
+        _assign_deck(player, deck_cards)
     
-    opponent = game.player2 if game.player1.uuid == player_uuid else game.player1
+        opponent = game.player2 if game.player1.uuid == player_uuid else game.player1
     
-    # Regola: 3 carte al primo turno
-    if opponent.deck.cards:  
-        for _ in range(3):
-            game.player1.draw_card()
-            game.player2.draw_card()
-        
-        return {"message": f"{player.name} deck selected. Both ready! Game started, 3 cards drawn."}
-    else:
-        return {"message": f"{player.name} deck selected. Waiting for opponent."}
+        # Regola: 3 carte al primo turno
+        both_ready = len(opponent.deck) > 0
+        if both_ready:
+            for _ in range(3):
+                game.player1.draw_card()
+                game.player2.draw_card()
+            _start_turn_clock(game)
+
+        try:
+            games.save(game, expected_version)
+        except VersionConflict:
+            raise ValueError("Game was updated concurrently, please retry")
+        _schedule_turn_deadline(game)
+
+        if both_ready:
+            return {"message": f"{player.name} deck selected. Both ready! Game started, 3 cards drawn."}
+        else:
+            return {"message": f"{player.name} deck selected. Waiting for opponent."}
 
 # ------------------------------------------------------------
 # 🧠 Card Comparison Logic
 # ------------------------------------------------------------
 def compare_cards(card1: Card, card2: Card):
-    """Compare two cards according to the official rules."""
-    suit_priority = {"hearts": 4, "diamonds": 3, "clubs": 2, "spades": 1, "none": 0}
-    numeric_value = {
-        "2": 2, "3": 3, "4": 4, "5": 5, "6": 6,
-        "7": 7, "8": 8, "9": 9, "10": 10,
-        "J": 11, "Q": 12, "K": 13, "A": 7, "JOKER": 99
-    }
-
-    # Joker beats everything
-    if card1.value == "JOKER" and card2.value == "JOKER":
-        return "double_win"
-    elif card1.value == "JOKER":
-        return "player1"
-    elif card2.value == "JOKER":
-        return "player2"
-
-    # --- Ace special interactions ---
-    if card1.value == "A" and card2.value in ["J", "Q", "K"]:
-        return "player1"
-    if card2.value == "A" and card1.value in ["J", "Q", "K"]:
-        return "player2"
-    if card1.value == "A" and card2.value.isdigit():
-        return "player2"
-    if card2.value == "A" and card1.value.isdigit():
-        return "player1"
-
-    # --- Normal numeric comparison ---
-    v1, v2 = numeric_value[card1.value], numeric_value[card2.value]
-    if v1 > v2:
-        return "player1"
-    elif v2 > v1:
-        return "player2"
-    else:
-        # Same value → suit priority
-        if suit_priority[card1.suit] > suit_priority[card2.suit]:
-            return "player1"
-        elif suit_priority[card1.suit] < suit_priority[card2.suit]:
-            return "player2"
-        else:
-            return "draw"
+    """Compare two cards according to the official rules (see cards.compare_by_rules)."""
+    return OUTCOME_NAMES[OUTCOME[card1.code][card2.code]]
 
 
 # ------------------------------------------------------------
 # 🎮 Turn Handling
 # ------------------------------------------------------------
-def submit_card(game_id, player_uuid, card_data, games):
-    game = games.get(game_id)
-    if not game:
-        raise ValueError("Invalid game ID")
-    
+def submit_card(game_id, player_uuid, card_data, games, auto=False):
+    """
+    Gioca una carta. La partita viene letta dallo store, modificata e salvata
+    con controllo di versione: se un'altra richiesta (anche di un altro worker)
+    l'ha salvata nel frattempo, la giocata viene ricalcolata sullo stato nuovo.
+    Gli eventi vengono pubblicati solo dopo un salvataggio riuscito.
+
+    auto=True: carta giocata dal server allo scadere del timeout di turno.
+    """
+    # Outbox pieno: la giocata potrebbe chiudere la partita e l'esito non avrebbe dove andare
+    match_publisher.check_capacity()
+    # Una sola giocata alla volta per partita: i due giocatori non risolvono lo stesso round
+    with games.game_lock(game_id):
+        for _ in range(SUBMIT_CARD_MAX_RETRIES):
+            game = games.get(game_id)
+            if not game:
+                raise ValueError("Invalid game ID")
+            expected_version = game.version
+
+            result, events = _apply_card(game, player_uuid, card_data, auto)
+            if not events:
+                return result  # nessuna modifica (partita già finita)
+
+            try:
+                games.save(game, expected_version)
+            except VersionConflict:
+                continue
+
+            _after_save(game, events)
+            return result
+
+        raise ValueError("Game was updated concurrently, please retry")
+
+
+def _after_save(game, events):
+    """Effetti di una modifica salvata: storico, scadenze ed eventi ai client."""
+    if game.winner:
+        _save_match_to_history(game)
+        scheduler.cancel(("turn", game.game_id))
+        reaper.game_finished(game.game_id)
+    else:
+        _schedule_turn_deadline(game)
+    for event, data, recipients in events:
+        event_bus.publish(game.game_id, event, data, recipients=recipients)
+    # Nuovo round di una partita contro il bot: il bot gioca subito
+    if _is_bot_game(game):
+        _bot_play(game)
+
+
+def _apply_card(game, player_uuid, card_data, auto=False):
+    """
+    Applica la giocata alla partita (in memoria).
+    Ritorna (risposta, eventi da pubblicare) con eventi = [(event, data, recipients)].
+    """
     # Se la partita è già finita, non fare nulla
     if game.winner:
-        return {"status": "finished", "message": f"Game already won by {game.winner}"}
+        return {"status": "finished", "message": f"Game already won by {game.winner}"}, []
 
     # Identifica il giocatore tramite UUID
     player = game.player1 if game.player1.uuid == player_uuid else game.player2
     if player.uuid != player_uuid:
         raise ValueError("Player UUID not found in this game")
 
-    matching_card = next(
-        (c for c in player.hand if c.value == card_data["value"] and c.suit == card_data["suit"]),
-        None
-    )
-    if not matching_card:
+    # Carta in formato esteso ({"value", "suit"}) o compatto (codice intero)
+    code = parse_card(card_data)
+    if code not in player.hand.codes:
         raise ValueError(f"{player.name} tried to play a card not in hand.")
 
-    player.hand.remove(matching_card)
+    # Una sola carta per round (altrimenti la prima andrebbe persa)
+    if player.uuid in game.current_round:
+        raise ValueError(f"{player.name} already played a card this round.")
+
+    player.hand.codes.remove(code)
     
     # Usa l'UUID del giocatore come chiave
-    game.current_round[player.uuid] = matching_card
+    game.current_round[player.uuid] = Card.from_code(code)
+
+    # Round consecutivi giocati dal server: si azzerano appena il giocatore torna a giocare
+    game.missed_turns[player.uuid] = game.missed_turns.get(player.uuid, 0) + 1 if auto else 0
 
     if len(game.current_round) < 2:
-        return {"status": "waiting"}
+        opponent = game.player2 if player is game.player1 else game.player1
+        return {"status": "waiting"}, [(OPPONENT_PLAYED, {"player": player.name, "auto": auto}, [opponent.uuid])]
 
     # Entrambi i giocatori hanno giocato
     c1 = game.current_round.get(game.player1.uuid)
     c2 = game.current_round.get(game.player2.uuid)
-    result = compare_cards(c1, c2)
+    result = OUTCOME[c1.code][c2.code]
 
     winner_name = None
-    if result == "player1":
+    if result == PLAYER1:
         game.player1.score += 1
         winner_name = game.player1.name
         message = f"{winner_name} wins round {game.turn_number + 1}!"
-    elif result == "player2":
+    elif result == PLAYER2:
         game.player2.score += 1
         winner_name = game.player2.name
         message = f"{winner_name} wins round {game.turn_number + 1}!"
-    elif result == "double_win": # Joker vs Joker
+    elif result == DOUBLE_WIN: # Joker vs Joker
         game.player1.score += 1
         game.player2.score += 1
         winner_name = "both"
@@ -397,7 +759,16 @@ def submit_card(game_id, player_uuid, card_data, games):
         message = f"Round {game.turn_number + 1} is a draw (stessa carta)."
 
     # Salva il log del turno (usa la funzione definita in models.py)
-    game.resolve_round(winner_name)
+    game.resolve_round(result)
+
+    scores = {game.player1.name: game.player1.score, game.player2.name: game.player2.score}
+    events = [(ROUND_RESOLVED, {
+        "turn_number": game.turn_number,
+        "cards": game.turns[-1]["cards"],
+        "round_winner": winner_name,
+        "message": message,
+        "scores": scores,
+    }, None)]
 
     # Controlla la condizione di fine partita (Regola 5 punti)
     match_winner = None
@@ -415,8 +786,8 @@ def submit_card(game_id, player_uuid, card_data, games):
     else:
         # 2. Controllo Esaurimento Carte (se nessuno ha ancora vinto)
         # Se entrambi i giocatori non hanno carte in mano E il mazzo è vuoto
-        p1_finished = len(game.player1.hand) == 0 and len(game.player1.deck.cards) == 0
-        p2_finished = len(game.player2.hand) == 0 and len(game.player2.deck.cards) == 0
+        p1_finished = len(game.player1.hand) == 0 and len(game.player1.deck) == 0
+        p2_finished = len(game.player2.hand) == 0 and len(game.player2.deck) == 0
 
         if p1_finished and p2_finished:
             # La partita finisce per esaurimento carte, controlliamo chi ha più punti
@@ -429,41 +800,225 @@ def submit_card(game_id, player_uuid, card_data, games):
 
     # --- GESTIONE FINE PARTITA ---
     if match_winner:
-        game.winner = match_winner
-        game.ended_at = datetime.now()
-        
-        _save_match_to_history(game)
-        
-        return {
-            "status": "finished",
-            "match_winner": match_winner,
-            "message": f"Game Over! Result: {match_winner}",
-            "scores": {game.player1.name: game.player1.score, game.player2.name: game.player2.score}
-        }
+        return _finish_game(game, match_winner, events), events
         
     else:
         # La partita continua: pescano se hanno carte nel mazzo
         game.player1.draw_card()
         game.player2.draw_card()
+        _start_turn_clock(game)
+
+        # Ogni giocatore riceve solo la propria mano
+        for p in (game.player1, game.player2):
+            events.append((CARDS_DRAWN, {
+                "turn_number": game.turn_number,
+                "hand": _serialize_hand(p),
+                "deck_size": len(p.deck),
+            }, [p.uuid]))
 
     return {
         "status": "resolved",
         "message": message,
-        "scores": {game.player1.name: game.player1.score, game.player2.name: game.player2.score},
+        "scores": scores,
         "turn_number": game.turn_number,
         "match_winner": game.winner,
+    }, events
+
+def _finish_game(game, match_winner, events, reason=None):
+    """
+    Chiude la partita (in memoria) e aggiunge l'evento game_finished.
+    L'invio a Game History avviene in _after_save, dopo il salvataggio.
+    """
+    game.winner = match_winner
+    game.ended_at = datetime.now()
+    game.turn_deadline = None
+
+    scores = {game.player1.name: game.player1.score, game.player2.name: game.player2.score}
+    data = {
+        "match_winner": match_winner,
+        "turn_number": game.turn_number,
+        "scores": scores,
+    }
+    if reason:
+        data["reason"] = reason
+    events.append((GAME_FINISHED, data, None))
+
+    return {
+        "status": "finished",
+        "match_winner": match_winner,
+        "message": f"Game Over! Result: {match_winner}",
+        "scores": scores
     }
 
+
+# ------------------------------------------------------------
+# ⏱️ Turn Timeout
+# ------------------------------------------------------------
+def _start_turn_clock(game):
+    """Nuovo round: i giocatori hanno TURN_TIMEOUT_SECONDS per giocare."""
+    if TURN_TIMEOUT_SECONDS > 0:
+        game.turn_deadline = time.time() + TURN_TIMEOUT_SECONDS
+
+
+def _schedule_turn_deadline(game):
+    # Una sola scadenza per partita nello scheduler: se nel frattempo il
+    # round è cambiato, _on_turn_timeout la riprogramma per il tempo mancante
+    if game.turn_deadline is None or game.winner or ("turn", game.game_id) in scheduler:
+        return
+    game_id = game.game_id
+    _schedule_deadline(("turn", game_id), max(game.turn_deadline - time.time(), 0), _on_turn_timeout, game_id)
+
+
+def _schedule_deadline(key, delay, func, *args):
+    """Programma func(*args) nello scheduler; allo scadere gira in _deadline_workers."""
+    scheduler.schedule(key, delay, lambda: _deadline_workers.submit(_run_deadline, key, func, *args))
+
+
+def _run_deadline(key, func, *args):
+    try:
+        func(*args)
+    except Exception as e:
+        print(f"Scheduler: errore nel callback {key}: {e}", flush=True)
+
+
+def _on_turn_timeout(game_id):
+    """
+    Scadenza del turno (thread di _deadline_workers). Per ogni giocatore che non
+    ha ancora giocato nel round: se ha già saltato MAX_MISSED_TURNS - 1 round
+    di fila perde a tavolino, altrimenti il server gioca per lui una carta
+    tramite il normale percorso di submit_card.
+    """
+    try:
+        match_publisher.check_capacity()
+    except OutboxFull:
+        # Outbox pieno: nessuna giocata automatica né sconfitta a tavolino, si riprova più tardi
+        _schedule_deadline(("turn", game_id), PUBLISHER_RETRY_SECONDS, _on_turn_timeout, game_id)
+        return
+
+    with game_store.game_lock(game_id):
+        game = game_store.get(game_id)
+        if not game or game.winner or game.turn_deadline is None:
+            return
+
+        remaining = game.turn_deadline - time.time()
+        if remaining > 0:
+            _schedule_turn_deadline(game)
+            return
+
+        absent = [p for p in (game.player1, game.player2) if p.uuid not in game.current_round]
+        forfeiting = [p for p in absent if game.missed_turns.get(p.uuid, 0) + 1 >= MAX_MISSED_TURNS]
+        if forfeiting:
+            forfeit_game(game_id, [p.uuid for p in forfeiting], game_store)
+            return
+
+        for p in absent:
+            hand = get_player_hand(game_id, p.uuid, game_store, compact=True)
+            if hand:
+                print(f"Timeout di turno: carta giocata in automatico per {p.name} (partita {game_id})", flush=True)
+                submit_card(game_id, p.uuid, random.choice(hand), game_store, auto=True)
+
+
+def forfeit_game(game_id, loser_uuids, games):
+    """
+    Sconfitta a tavolino dei giocatori indicati (pareggio se sono entrambi).
+    L'esito segue lo stesso percorso di fine partita di submit_card.
+    """
+    match_publisher.check_capacity()
+    with games.game_lock(game_id):
+        for _ in range(SUBMIT_CARD_MAX_RETRIES):
+            game = games.get(game_id)
+            if not game:
+                raise ValueError("Invalid game ID")
+            if game.winner:
+                return {"status": "finished", "message": f"Game already won by {game.winner}"}
+            expected_version = game.version
+
+            winners = [p for p in (game.player1, game.player2) if p.uuid not in loser_uuids]
+            match_winner = winners[0].name if len(winners) == 1 else "Draw"
+            game.current_round = {}
+
+            events = []
+            result = _finish_game(game, match_winner, events, reason="forfeit")
+            print(f"Partita {game_id} terminata a tavolino: {match_winner}", flush=True)
+
+            try:
+                games.save(game, expected_version)
+            except VersionConflict:
+                continue
+
+            _after_save(game, events)
+            return result
+
+        raise ValueError("Game was updated concurrently, please retry")
+
+
 # ------------------------------------------------------------
 # 📊 Game State
 # ------------------------------------------------------------
-def get_game_state(game_id, games):
-    game = games.get(game_id)
-    if not game:
+def get_game_state(game_id, games, since=None):
+    """
+    Stato pubblico della partita. Con since (una versione già ricevuta dal
+    client) turn_history contiene solo i turni risolti dopo quella versione,
+    quindi la risposta ha dimensione costante durante la partita.
+    """
+    _check_since(since)
+    return _read_game(game_id, games, lambda game: _game_state(game, since))
+
+
+def get_game_state_json(game_id, games, since=None):
+    """Come get_game_state, già codificato in JSON: (bytes, versione)."""
+    _check_since(since)
+    return _encoded(game_id, games, ("state", since), lambda game: _game_state(game, since))
+
+
+def _check_since(since):
+    if since is not None and since < 0:
+        raise ValueError("since must be a non-negative version")
+
+
+def check_player(game_id, player_uuid, games):
+    """La partita esiste e player_uuid è uno dei suoi giocatori, senza leggerla (ValueError altrimenti)."""
+    players = games.get_players(game_id)
+    if players is None:
         raise ValueError("Invalid game ID")
-    
+    if player_uuid not in players:
+        raise ValueError("Player UUID not found in this game")
+
+
+def _read_game(game_id, games, build):
+    # Lettura sotto lock: nessuno stato "a metà" di una giocata
+    with games.game_lock(game_id):
+        game = games.get(game_id)
+        if not game:
+            raise ValueError("Invalid game ID")
+        return build(game)
+
+
+def _encoded(game_id, games, key, build):
+    """
+    Risposta di lettura in JSON dalla cache per versione (vedi response_cache):
+    se la partita non è cambiata è una lookup, altrimenti viene costruita
+    sotto il lock della partita e messa in cache. Ritorna (bytes, versione).
+    """
+    version = games.get_version(game_id)
+    if version is not None:
+        data = response_cache.get(game_id, version, key)
+        if data is not None:
+            return data, version
+    with games.game_lock(game_id):
+        game = games.get(game_id)
+        if not game:
+            raise ValueError("Invalid game ID")
+        # Stesso formato di jsonify (chiavi ordinate, separatori compatti)
+        data = (json.dumps(build(game), sort_keys=True, separators=(",", ":")) + "\n").encode()
+        response_cache.put(game_id, game.version, key, data)
+        return data, game.version
+
+
+def _game_state(game, since=None):
     state = {
         "game_id": game.game_id,
+        "version": game.version,
         "turn_number": game.turn_number,
         "winner": game.winner,
         "scores": {
@@ -474,8 +1029,10 @@ def get_game_state(game_id, games):
             {"uuid": game.player1.uuid, "name": game.player1.name, "hand_size": len(game.player1.hand)},
             {"uuid": game.player2.uuid, "name": game.player2.name, "hand_size": len(game.player2.hand)}
         ],
-        "turn_history": game.turns,
+        "turn_history": game.turns if since is None else game.turns_since(since),
     }
+    if since is not None:
+        state["since"] = since
     return state
 
 # ------------------------------------------------------------
@@ -484,6 +1041,8 @@ def get_game_state(game_id, games):
 def _save_match_to_history(game: Game):
     """
     Invia l'esito della partita al servizio Game History in modo Asincrono tramite RabbitMQ.
+    Il messaggio viene scritto nell'outbox su disco e inviato dal publisher in background
+    (vedi publisher.py e outbox.py).
     """
     
     winner_index = "draw" # Default
@@ -494,88 +1053,202 @@ def _save_match_to_history(game: Game):
     elif game.winner == "Draw":
         winner_index = "draw"
 
-    # Il log (game.turns) è già stato serializzato 
-    # dalla funzione game.resolve_round()
+    # game.turns espande il log compatto dei round
+    # (registrato da game.resolve_round()) nel formato esteso
     
     payload = {
+        "game_id": game.game_id,  # chiave di idempotenza: l'outbox può rispedire lo stesso messaggio
         "player1": game.player1.uuid,
         "player2": game.player2.uuid,
         "winner": winner_index,
         "log": game.turns,
+        "bot": _is_bot_game(game),  # partita contro il bot: non conta per la classifica
         "points1": game.player1.score,
         "points2": game.player2.score,
         "started_at": game.started_at.isoformat() if game.started_at else None,
         "ended_at": game.ended_at.isoformat() if game.ended_at else None
     }
 
+    # Invio delegato al thread del publisher: qui si paga solo la scrittura nell'outbox
+    # (sempre accettata: le giocate sono già state fermate da check_capacity se l'outbox è pieno)
     try:
-        # Configure SSL connection (always enabled)
-        import ssl
-        ssl_context = ssl.create_default_context(cafile=RABBITMQ_CERT_PATH)
-        ssl_context.check_hostname = True
-        ssl_options = pika.SSLOptions(ssl_context, RABBITMQ_HOST)
-        credentials = pika.PlainCredentials(RABBITMQ_USER, RABBITMQ_PASSWORD)
-        connection_params = pika.ConnectionParameters(
-            host=RABBITMQ_HOST,
-            port=RABBITMQ_PORT,
-            ssl_options=ssl_options,
-            credentials=credentials
-        )
-        
-        connection = pika.BlockingConnection(connection_params)
-        channel = connection.channel()
-        channel.queue_declare(queue='game_history_queue', durable=True)
-        
-        channel.basic_publish(
-            exchange='',
-            routing_key='game_history_queue',
-            body=json.dumps(payload),
-            properties=pika.BasicProperties(
-                delivery_mode=2,  # make message persistent
-            ))
-        connection.close()
-        print(f"Match {game.game_id} inviato a RabbitMQ via SSL.", flush=True)
-    
+        match_publisher.publish(payload)
+        print(f"Match {game.game_id} salvato nell'outbox per RabbitMQ.", flush=True)
     except Exception as e:
-        print(f"ERRORE CRITICO: Impossibile inviare la partita {game.game_id} a RabbitMQ: {e}", flush=True)
-        
-        
+        print(f"ERRORE CRITICO: Impossibile salvare la partita {game.game_id} nell'outbox: {e}", flush=True)
+
+
 # ------------------------------------------------------------
 # 🃏 Get Player Hand
 # ------------------------------------------------------------
-def get_player_hand(game_id, player_uuid, games):
+def get_player_hand(game_id, player_uuid, games, compact=False):
     """
     Recupera la mano attuale di un giocatore specifico in formato JSON.
+    compact=True: lista di codici interi (vedi cards.py) invece di {"value", "suit"}.
     """
-    game = games.get(game_id)
-    if not game:
-        raise ValueError("Invalid game ID")
+    return _read_game(game_id, games, lambda game: _player_hand(game, player_uuid, compact))
+
+
+def get_player_hand_json(game_id, player_uuid, games, compact=False):
+    """Come get_player_hand, già codificata in JSON: (bytes, versione)."""
+    return _encoded(game_id, games, ("hand", player_uuid, compact),
+                    lambda game: _player_hand(game, player_uuid, compact))
+
 
+def _player_hand(game, player_uuid, compact):
     # Identifica il giocatore tramite UUID
     player = game.player1 if game.player1.uuid == player_uuid else game.player2
     if player.uuid != player_uuid:
         raise ValueError("Player UUID not found in this game")
+    return _serialize_hand(player, compact)
+
+
+def get_player_view(game_id, player_uuid, games, compact=False):
+    """
+    Vista della partita per un giocatore: la sua mano insieme a punteggi,
+    turno, vincitore e stato dell'avversario (ha già giocato il round
+    corrente o no). Una sola richiesta per ogni turno del client.
+    """
+    return _read_game(game_id, games, lambda game: _player_view(game, player_uuid, compact))
+
+
+def get_player_view_json(game_id, player_uuid, games, compact=False):
+    """Come get_player_view, già codificata in JSON: (bytes, versione)."""
+    return _encoded(game_id, games, ("view", player_uuid, compact),
+                    lambda game: _player_view(game, player_uuid, compact))
+
+
+def _player_view(game, player_uuid, compact):
+    if game.player1.uuid == player_uuid:
+        player, opponent = game.player1, game.player2
+    elif game.player2.uuid == player_uuid:
+        player, opponent = game.player2, game.player1
+    else:
+        raise ValueError("Player UUID not found in this game")
+
+    return {
+        "game_id": game.game_id,
+        "version": game.version,
+        "turn_number": game.turn_number,
+        "winner": game.winner,
+        "scores": {
+            game.player1.name: game.player1.score,
+            game.player2.name: game.player2.score
+        },
+        "hand": _serialize_hand(player, compact),
+        "played": player.uuid in game.current_round,
+        "deck_size": len(player.deck),
+        "opponent": {
+            "name": opponent.name,
+            "played": opponent.uuid in game.current_round,
+            "hand_size": len(opponent.hand),
+        },
+    }
 
+
+def _serialize_hand(player, compact=False):
     # Serializza le carte in un formato JSON-friendly
     # (Trasforma [Card(value='K', suit='hearts'), ...] 
-    # in [{'value': 'K', 'suit': 'hearts'}, ...])
-    hand_data = [{"value": card.value, "suit": card.suit} for card in player.hand]
-    
-    return hand_data
+    # in [{'value': 'K', 'suit': 'hearts'}, ...] oppure, compatto, in [24, ...])
+    if compact:
+        return list(player.hand.codes)
+    return [{"value": card.value, "suit": card.suit} for card in player.hand]
 
 
 # ------------------------------------------------------------
-# 🔐 User Token Validation (REALE con HTTPS bypass)
+# 💾 Snapshot e riavvio a caldo
 # ------------------------------------------------------------
-def validate_user_token(token_header: str):
-    if not token_header:
-        raise ValueError("Header Authorization mancante.")
+def snapshots_enabled():
+    return SNAPSHOT_INTERVAL_SECONDS > 0 and isinstance(game_store, InMemoryGameStore)
+
+
+def restore_snapshot():
+    """
+    Riavvio a caldo: ricarica partite, coda e partite pendenti dall'ultimo
+    snapshot e riprogramma le loro scadenze (reaper, turni, bot), poi avvia
+    gli snapshot periodici. Da chiamare all'avvio, prima di servire
+    richieste. Ritorna il numero di partite ripristinate.
+
+    Il tempo passato dallo snapshot (deploy o crash) non conta contro i
+    giocatori: scadenze di turno e ultimo aggiornamento vengono spostati
+    in avanti della stessa durata.
+    """
+    if not snapshots_enabled():
+        return 0
+    # Centinaia di migliaia di oggetti creati di fila e tutti vivi: il garbage
+    # collector li riscansionerebbe più volte senza liberare nulla
+    gc_enabled = gc.isenabled()
+    gc.disable()
     try:
-        token_type, token = token_header.split(" ")
-        if token_type.lower() != "bearer": raise ValueError("Token non Bearer")
-    except:
-        raise ValueError("Formato header invalido")
+        return _restore_snapshot()
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _restore_snapshot():
+    snapshot = snapshotter.load()
+    # Avviato dopo il load: uno snapshot dello store ancora vuoto sovrascriverebbe quello da ripristinare
+    snapshotter.start()
+    if snapshot is None:
+        return 0
+
+    downtime = max(time.time() - snapshot.created_at, 0)
+    for game in snapshot.games:
+        game.updated_at += downtime
+        if game.turn_deadline is not None:
+            game.turn_deadline += downtime
+        game_store.add(game)
+        if game.winner:
+            reaper.game_finished(game.game_id)
+        else:
+            reaper.track_game(game.game_id)
+            _schedule_turn_deadline(game)
+
+    with game_store.matchmaking_lock():
+        for entry in snapshot.queue:
+            _join_queue(entry)
+    for user_uuid, game_id in snapshot.pending:
+        if game_id in game_store:
+            game_store.set_pending(user_uuid, game_id)
+            reaper.track_pending(user_uuid, game_id)
+    if snapshot.queue and MATCHMAKING_BATCH_MS > 0:
+        matchmaking_ticker.start()
+
+    print(f"Snapshot: ripristinate {len(snapshot.games)} partite, {len(snapshot.queue)} giocatori in coda "
+          f"e {len(snapshot.pending)} partite pendenti da {snapshotter.path} "
+          f"({snapshotter.last_restore_ms:.0f} ms, snapshot di {downtime:.1f}s fa)", flush=True)
+    return len(snapshot.games)
+
 
+def save_snapshot():
+    """Snapshot immediato (es. allo shutdown del server), se gli snapshot sono attivi."""
+    if snapshots_enabled():
+        snapshotter.save()
+
+
+# ------------------------------------------------------------
+# 📈 Metriche interne
+# ------------------------------------------------------------
+def get_metrics():
+    return {
+        "deck_cache": deck_cache.stats(),
+        "rating_cache": rating_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "matchmaking_batch": matchmaking_ticker.stats() if MATCHMAKING_BATCH_MS > 0 else None,
+        "publisher": match_publisher.stats(),
+        "games": len(game_store),
+        "matchmaking_queue": game_store.queue_len(),
+        "reaper": reaper.stats(),
+        "snapshot": snapshotter.stats() if snapshots_enabled() else None,
+    }
+
+
+# ------------------------------------------------------------
+# 🔐 User Token Validation (REALE con HTTPS bypass)
+# ------------------------------------------------------------
+def validate_user_token(token_header: str):
+    token = _bearer_token(token_header)
     validate_url = f"{USER_MANAGER_URL}/users/validate-token"
     
     try:
@@ -586,4 +1259,15 @@ def validate_user_token(token_header: str):
         return user_data["id"], user_data["username"]
     except requests.RequestException as e:
         print(f"Errore validazione token: {e}")
-        raise ValueError("Token non valido o servizio utenti irraggiungibile")
\ No newline at end of file
+        raise ValueError("Token non valido o servizio utenti irraggiungibile")
+
+
+def _bearer_token(token_header):
+    if not token_header:
+        raise ValueError("Header Authorization mancante.")
+    try:
+        token_type, token = token_header.split(" ")
+        if token_type.lower() != "bearer": raise ValueError("Token non Bearer")
+    except:
+        raise ValueError("Formato header invalido")
+    return token
\ No newline at end of file
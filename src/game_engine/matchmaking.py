@@ -0,0 +1,233 @@
+import bisect
+import threading
+import time
+from collections import deque
+
+
+class RatingWindow:
+    """
+    Differenza di rating accettata tra due giocatori: parte da `base` e
+    cresce di `growth` punti per ogni secondo di attesa, fino a `maximum`.
+    """
+
+    def __init__(self, base, growth, maximum):
+        self.base = base
+        self.growth = growth
+        self.maximum = maximum
+
+    def __call__(self, waited):
+        return min(self.base + self.growth * max(waited, 0), self.maximum)
+
+    def accepts(self, rating_a, waited_a, rating_b, waited_b):
+        # Basta che la finestra di uno dei due (la più larga) copra la differenza
+        return abs(rating_a - rating_b) <= self(max(waited_a, waited_b))
+
+
+class MatchmakingQueue:
+    """
+    Coda FIFO di matchmaking con indice uuid -> entry.
+
+    - join / cancel / lookup in O(1)
+    - pop del giocatore più vecchio in O(1) ammortizzato
+    - pop_nearest dell'avversario più vicino per rating: le entry con
+      'rating' sono anche divise in bucket di larghezza bucket_width
+      (FIFO all'interno del bucket) e i bucket non vuoti sono tenuti
+      ordinati, quindi la ricerca è un bisect più la visita dei bucket
+      entro la finestra massima (numero costante, indipendente da n);
+      in ogni bucket visitato si confrontano tutte le entry valide, quindi
+      il costo dipende dall'occupazione dei bucket e non da n
+
+    Le entry cancellate restano nelle deque finché non vengono
+    scartate in pop (cancellazione "lazy"): una entry è valida solo
+    se l'indice punta ancora allo stesso oggetto.
+    """
+
+    def __init__(self, window=None, bucket_width=50):
+        self._order = deque()
+        self._index = {}
+        self.window = window
+        self.bucket_width = bucket_width
+        self._buckets = {}  # bucket -> deque di entry
+        self._bucket_keys = []  # bucket (anche vuoti, rimossi nel compact), ordinati
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, user_uuid):
+        return user_uuid in self._index
+
+    def get(self, user_uuid):
+        return self._index.get(user_uuid)
+
+    def join(self, entry):
+        """Aggiunge (o ri-accoda) un giocatore. entry deve contenere 'uuid'."""
+        self._index[entry['uuid']] = entry
+        self._order.append(entry)
+        if entry.get('rating') is not None:
+            self._bucket_add(entry)
+        self._compact()
+        return entry
+
+    def cancel(self, user_uuid):
+        """Rimuove un giocatore dalla coda. Ritorna la entry rimossa o None."""
+        entry = self._index.pop(user_uuid, None)
+        self._compact()
+        return entry
+
+    def pop(self):
+        """Estrae il giocatore in attesa da più tempo, o None se la coda è vuota."""
+        while self._order:
+            entry = self._order.popleft()
+            if self._index.get(entry['uuid']) is not entry:
+                continue  # entry cancellata o sostituita
+            del self._index[entry['uuid']]
+            return entry
+        return None
+
+    def pop_nearest(self, rating, waited=0, now=None):
+        """
+        Estrae l'avversario con rating più vicino accettato dalla finestra
+        (vedi RatingWindow), o None. waited: attesa di chi cerca.
+        """
+        now = time.time() if now is None else now
+        keys = self._bucket_keys
+        right = bisect.bisect_left(keys, self._bucket(rating))
+        left = right - 1
+        # Oltre questa distanza nessuna finestra può accettare
+        limit = self.window(float("inf"))
+        best = None
+
+        while True:
+            dist_left = self._bucket_distance(keys[left], rating) if left >= 0 else float("inf")
+            dist_right = self._bucket_distance(keys[right], rating) if right < len(keys) else float("inf")
+            # Stop quando i bucket rimasti sono più lontani del candidato migliore
+            if min(dist_left, dist_right) > (limit if best is None else abs(best[0]['rating'] - rating)):
+                break
+            if dist_left <= dist_right:
+                bucket, left = keys[left], left - 1
+            else:
+                bucket, right = keys[right], right + 1
+
+            # Tutte le entry del bucket: la più vecchia può essere fuori finestra
+            # mentre una più giovane con rating più vicino è accettata. A parità
+            # di distanza vince la più vecchia (la deque è in ordine di arrivo)
+            for entry in self._valid_bucket_entries(bucket):
+                if (self.window.accepts(rating, waited, entry['rating'], now - entry['joined_at'])
+                        and (best is None or abs(entry['rating'] - rating) < abs(best[0]['rating'] - rating))):
+                    best = (entry, bucket)
+
+        if best is None:
+            return None
+        entry, bucket = best
+        self._buckets[bucket].remove(entry)
+        del self._index[entry['uuid']]
+        return entry
+
+    def _valid_bucket_entries(self, bucket):
+        queue = self._buckets[bucket]
+        if any(self._index.get(e['uuid']) is not e for e in queue):
+            # Scarta le entry cancellate o sostituite
+            queue = self._buckets[bucket] = deque(e for e in queue if self._index.get(e['uuid']) is e)
+        return queue
+
+    def _bucket(self, rating):
+        return int(rating // self.bucket_width)
+
+    def _bucket_distance(self, bucket, rating):
+        low = bucket * self.bucket_width
+        if rating < low:
+            return low - rating
+        return max(rating - (low + self.bucket_width), 0)
+
+    def _bucket_add(self, entry):
+        bucket = self._bucket(entry['rating'])
+        queue = self._buckets.get(bucket)
+        if queue is None:
+            queue = self._buckets[bucket] = deque()
+            bisect.insort(self._bucket_keys, bucket)
+        queue.append(entry)
+
+    def entries(self):
+        """Entry valide in ordine di arrivo."""
+        return [e for e in self._order if self._index.get(e['uuid']) is e]
+
+    def _compact(self):
+        # Evita che le entry cancellate facciano crescere la deque senza limite
+        if len(self._order) > 2 * len(self._index) + 32:
+            self._order = deque(self.entries())
+            self._buckets = {}
+            self._bucket_keys = []
+            for entry in self._order:
+                if entry.get('rating') is not None:
+                    self._bucket_add(entry)
+
+
+def pair_queue(entries, window=None, rating_of=None, now=None):
+    """
+    Abbinamento di tutta la coda in un solo passo (matchmaking a blocchi).
+
+    Senza window le entry sono abbinate a due a due in ordine di arrivo.
+    Con window sono ordinate per rating (rating_of(entry)) e ogni giocatore
+    è abbinato al successivo se la finestra accetta la differenza: O(n log n).
+    In ogni coppia il primo è chi aspetta da più tempo (sarà player1).
+    """
+    if window is None:
+        return [(entries[i], entries[i + 1]) for i in range(0, len(entries) - 1, 2)]
+
+    now = time.time() if now is None else now
+    ranked = sorted(entries, key=rating_of)
+    pairs = []
+    i = 0
+    while i < len(ranked) - 1:
+        a, b = ranked[i], ranked[i + 1]
+        if window.accepts(rating_of(a), now - a['joined_at'], rating_of(b), now - b['joined_at']):
+            pairs.append((a, b) if a['joined_at'] <= b['joined_at'] else (b, a))
+            i += 2
+        else:
+            i += 1
+    return pairs
+
+
+class MatchmakingTicker:
+    """
+    Thread che esegue tick() ogni `interval` secondi (matchmaking a blocchi).
+    Parte al primo start(); tick() ritorna il numero di partite create.
+    """
+
+    def __init__(self, interval, tick):
+        self.interval = interval
+        self.tick = tick
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.ticks = 0
+        self.matches = 0
+        self.last_tick_ms = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="matchmaking-ticker", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            start = time.perf_counter()
+            try:
+                self.matches += self.tick()
+            except Exception as e:
+                print(f"Matchmaking: errore nel tick: {e}", flush=True)
+            self.ticks += 1
+            self.last_tick_ms = (time.perf_counter() - start) * 1000
+
+    def stats(self):
+        return {
+            "interval_ms": self.interval * 1000,
+            "ticks": self.ticks,
+            "matches": self.matches,
+            "last_tick_ms": round(self.last_tick_ms, 3),
+        }
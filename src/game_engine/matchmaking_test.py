@@ -0,0 +1,126 @@
+"""
+Test della coda di matchmaking (matchmaking.py) e della sua versione su
+Redis (store.RedisGameStore, con fakeredis al posto del server).
+
+Uso:  python -m pytest src/game_engine
+"""
+import time
+
+import fakeredis
+import pytest
+
+from game_engine import store
+from game_engine.matchmaking import MatchmakingQueue, RatingWindow, pair_queue
+
+NOW = 1_000_000.0
+
+
+def entry(user_uuid, rating=None, waited=0):
+    return {'uuid': user_uuid, 'rating': rating, 'joined_at': NOW - waited}
+
+
+@pytest.fixture
+def queue():
+    return MatchmakingQueue(RatingWindow(20, 1, 400), bucket_width=50)
+
+
+@pytest.fixture
+def redis_store(monkeypatch):
+    monkeypatch.setattr(store, "RATING_WINDOW", RatingWindow(20, 1, 400))
+    return store.RedisGameStore(client=fakeredis.FakeRedis())
+
+
+def test_join_cancel_pop_fifo(queue):
+    for user_uuid in "abc":
+        queue.join(entry(user_uuid))
+    assert len(queue) == 3 and "b" in queue
+
+    assert queue.cancel("b")['uuid'] == "b"
+    assert queue.cancel("b") is None
+    assert [queue.pop()['uuid'], queue.pop()['uuid'], queue.pop()] == ["a", "c", None]
+
+
+def test_rejoin_replaces_previous_entry(queue):
+    queue.join(entry("a", 100))
+    queue.join(entry("a", 300))
+    assert len(queue) == 1
+    assert queue.pop_nearest(100, now=NOW) is None
+    assert queue.pop_nearest(300, now=NOW)['rating'] == 300
+
+
+def test_pop_nearest_picks_closest_rating(queue):
+    queue.join(entry("far", 130))
+    queue.join(entry("near", 105))
+    queue.join(entry("other_bucket", 97))
+    assert queue.pop_nearest(100, now=NOW)['uuid'] == "other_bucket"
+    assert queue.pop_nearest(100, now=NOW)['uuid'] == "near"
+    assert queue.pop_nearest(100, now=NOW) is None  # 130: fuori finestra (20 punti)
+    assert len(queue) == 1
+
+
+def test_pop_nearest_looks_past_oldest_entry_of_bucket(queue):
+    # Il più vecchio del bucket [100, 150) è fuori finestra, il più giovane ha lo stesso rating
+    queue.join(entry("a", 149, waited=1))
+    queue.join(entry("b", 100))
+    assert queue.pop_nearest(100, 0, NOW)['uuid'] == "b"
+    assert "a" in queue
+
+
+def test_pop_nearest_window_grows_with_wait(queue):
+    queue.join(entry("a", 160, waited=45))  # finestra 20 + 45 = 65
+    assert queue.pop_nearest(100, now=NOW)['uuid'] == "a"
+
+
+def test_pop_nearest_ties_go_to_oldest(queue):
+    queue.join(entry("young", 110))
+    queue.join(entry("old", 110, waited=5))
+    queue.cancel("young")
+    queue.join(entry("young", 110))
+    assert queue.pop_nearest(100, now=NOW)['uuid'] == "old"
+
+
+def test_pop_nearest_skips_cancelled_entries(queue):
+    queue.join(entry("a", 100))
+    queue.join(entry("b", 110))
+    queue.cancel("a")
+    assert queue.pop_nearest(100, now=NOW)['uuid'] == "b"
+    assert queue.pop_nearest(100, now=NOW) is None
+
+
+def test_pair_queue_fifo_and_by_rating():
+    entries = [entry("a", 0, waited=3), entry("b", 500, waited=2), entry("c", 10, waited=1), entry("d", 505)]
+    fifo = pair_queue(entries)
+    assert [(a['uuid'], b['uuid']) for a, b in fifo] == [("a", "b"), ("c", "d")]
+
+    ranked = pair_queue(entries, RatingWindow(20, 1, 400), lambda e: e['rating'], now=NOW)
+    # Rating vicini abbinati, il primo della coppia è chi aspetta da più tempo
+    assert [(a['uuid'], b['uuid']) for a, b in ranked] == [("a", "c"), ("b", "d")]
+
+
+def test_pair_queue_leaves_out_of_window_players():
+    entries = [entry("a", 0), entry("b", 100), entry("c", 110)]
+    pairs = pair_queue(entries, RatingWindow(20, 1, 400), lambda e: e['rating'], now=NOW)
+    assert [(a['uuid'], b['uuid']) for a, b in pairs] == [("b", "c")]
+
+
+def test_redis_pop_nearest_looks_past_out_of_window_candidates(redis_store):
+    now = time.time()
+    redis_store.queue_join({'uuid': 'a', 'rating': 119, 'joined_at': now})
+    redis_store.queue_join({'uuid': 'b', 'rating': 100, 'joined_at': now})
+    redis_store.queue_join({'uuid': 'c', 'rating': 70, 'joined_at': now})
+    assert redis_store.queue_pop(100)['uuid'] == "b"
+    assert redis_store.queue_pop(100)['uuid'] == "a"
+    assert redis_store.queue_pop(100) is None  # c: 30 punti, fuori finestra
+    assert redis_store.queue_contains("c")
+
+
+def test_redis_pop_nearest_pages_through_candidates(redis_store, monkeypatch):
+    monkeypatch.setattr(store, "NEAREST_PAGE", 2)
+    now = time.time()
+    # Più vicini ma appena entrati (finestra 20), il più lontano aspetta da 60 s (finestra 80)
+    for i in range(5):
+        redis_store.queue_join({'uuid': f"young{i}", 'rating': 125 + i, 'joined_at': now})
+    redis_store.queue_join({'uuid': 'old', 'rating': 170, 'joined_at': now - 60})
+    redis_store.queue_cancel("young0")
+    assert redis_store.queue_pop(100)['uuid'] == "old"
+    assert redis_store.queue_len() == 4
@@ -1,41 +1,143 @@
+from array import array
+from bisect import bisect_right
 from datetime import datetime
+import time
 import uuid
 import random
 from dataclasses import dataclass, field
 from typing import List, Dict, Optional
+from . import cards
 
+# I modelli usano __slots__ (niente __dict__ per istanza): mazzi, mani e
+# log dei turni sono bytearray di codici carta (vedi cards.py) e le 53
+# carte sono istanze condivise. Memoria per partita: docs/benchmarks/bench_memory.py
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class Card:
     value: str
     suit: str
+    code: int = field(init=False, repr=False, compare=False)  # codifica intera 0..52 (vedi cards.py)
+
+    def __post_init__(self):
+        object.__setattr__(self, "code", cards.encode(self.value, self.suit))
 
     def __repr__(self):
         return f"{self.value} of {self.suit}"
 
+    def to_dict(self):
+        return {"value": self.value, "suit": self.suit}
+
+    @classmethod
+    def from_dict(cls, data):
+        return _CARDS[cards.encode(data["value"], data["suit"])]
+
+    @classmethod
+    def from_code(cls, code):
+        # Le carte sono immutabili: un'unica istanza per codice
+        return _CARDS[code]
+
+
+_CARDS = tuple(Card(*cards.decode(code)) for code in range(cards.NUM_CARDS))
+
 
-@dataclass
 class Deck:
-    cards: List[Card] = field(default_factory=list)
+    """
+    Mazzo come bytearray di codici carta. La cima del mazzo è l'ultimo
+    byte, così draw è un pop() in O(1); to_dict resta nell'ordine di
+    pesca (prima carta = prossima pescata).
+    """
+    __slots__ = ("codes",)
+
+    def __init__(self, cards_list: Optional[List[Card]] = None):
+        self.codes = bytearray(c.code for c in reversed(cards_list or []))
 
     def shuffle(self):
-        random.shuffle(self.cards)
+        random.shuffle(self.codes)
 
     def draw(self) -> Optional[Card]:
-        if not self.cards:
+        if not self.codes:
             return None
-        return self.cards.pop(0)
+        return _CARDS[self.codes.pop()]
 
     def add_card(self, card: Card):
-        self.cards.append(card)
+        # In fondo al mazzo
+        self.codes.insert(0, card.code)
+
+    @property
+    def cards(self) -> List[Card]:
+        return [_CARDS[c] for c in reversed(self.codes)]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __eq__(self, other):
+        return isinstance(other, Deck) and self.codes == other.codes
+
+    def __repr__(self):
+        return f"Deck({self.cards!r})"
+
+    def to_dict(self):
+        return [_CARDS[c].to_dict() for c in reversed(self.codes)]
+
+    @classmethod
+    def from_dict(cls, data):
+        deck = cls()
+        deck.codes = bytearray(cards.encode(c["value"], c["suit"]) for c in reversed(data))
+        return deck
+
+    @classmethod
+    def from_codes(cls, codes: bytearray):
+        """Mazzo dai codici nell'ordine interno (cima = ultimo byte), es. da uno snapshot."""
+        deck = cls.__new__(cls)
+        deck.codes = codes
+        return deck
+
+
+class Hand:
+    """Mano del giocatore come bytearray di codici carta."""
+    __slots__ = ("codes",)
+
+    def __init__(self, cards_list: Optional[List[Card]] = None):
+        self.codes = bytearray(c.code for c in cards_list or [])
 
+    def append(self, card: Card):
+        self.codes.append(card.code)
 
-@dataclass
+    def remove(self, card: Card):
+        self.codes.remove(card.code)
+
+    def __contains__(self, card):
+        return card.code in self.codes
+
+    def __iter__(self):
+        return (_CARDS[c] for c in self.codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        return _CARDS[self.codes[index]]
+
+    def __eq__(self, other):
+        return isinstance(other, Hand) and self.codes == other.codes
+
+    def __repr__(self):
+        return f"Hand({list(self)!r})"
+
+    @classmethod
+    def from_codes(cls, codes: bytearray):
+        hand = cls.__new__(cls)
+        hand.codes = codes
+        return hand
+
+
+@dataclass(slots=True)
 class Player:
     uuid: str
     name: str
     deck: Deck = field(default_factory=Deck)
-    hand: List[Card] = field(default_factory=list)
+    hand: Hand = field(default_factory=Hand)
     score: int = 0
 
     def draw_card(self):
@@ -50,8 +152,27 @@ class Player:
             return card
         raise ValueError(f"{self.name} does not have {card}")
 
+    def to_dict(self):
+        return {
+            "uuid": self.uuid,
+            "name": self.name,
+            "deck": self.deck.to_dict(),
+            "hand": [c.to_dict() for c in self.hand],
+            "score": self.score,
+        }
 
-@dataclass
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            uuid=data["uuid"],
+            name=data["name"],
+            deck=Deck.from_dict(data["deck"]),
+            hand=Hand([Card.from_dict(c) for c in data["hand"]]),
+            score=data["score"],
+        )
+
+
+@dataclass(slots=True)
 class Game:
     player1: Player
     player2: Player
@@ -59,15 +180,105 @@ class Game:
     current_round: Dict[str, Card] = field(default_factory=dict)
     turn_number: int = 0
     winner: Optional[str] = None
-    turns: List[Dict] = field(default_factory=list)
+    # 3 byte per round: carta del player1, carta del player2, esito (cards.OUTCOME)
+    turn_log: bytearray = field(default_factory=bytearray)
     started_at: datetime = field(default_factory=datetime.now)
     ended_at: Optional[datetime] = None
+    version: int = 0  # incrementata a ogni salvataggio nello store (optimistic locking)
+    updated_at: float = field(default_factory=time.time)  # ultimo salvataggio (usato dal reaper)
+    turn_deadline: Optional[float] = None  # epoch entro cui il round corrente va giocato
+    missed_turns: Dict[str, int] = field(default_factory=dict)  # uuid -> round consecutivi giocati in automatico
+    # Versione della partita in cui è stato risolto ogni round (per GET /state?since=)
+    turn_versions: array = field(default_factory=lambda: array("I"))
 
-    def resolve_round(self, winner_name: Optional[str]):
+    def resolve_round(self, outcome: int):
         self.turn_number += 1
-        self.turns.append({
-            "turn": self.turn_number,
-            "cards": {p: str(c) for p, c in self.current_round.items()},
-            "winner": winner_name
-        })
+        self.turn_log += bytes((
+            self.current_round[self.player1.uuid].code,
+            self.current_round[self.player2.uuid].code,
+            outcome,
+        ))
+        # Il round è risolto nella modifica che lo store salverà come versione + 1
+        self.turn_versions.append(self.version + 1)
         self.current_round = {}
+
+    def round_winner(self, outcome: int) -> str:
+        """Esito di un round -> nome del vincitore, "both" o "draw"."""
+        if outcome == cards.PLAYER1:
+            return self.player1.name
+        if outcome == cards.PLAYER2:
+            return self.player2.name
+        return "both" if outcome == cards.DOUBLE_WIN else "draw"
+
+    @property
+    def turns(self) -> List[Dict]:
+        """Log dei turni in formato esteso (stato della partita, eventi, Game History)."""
+        return self._expand_turns(0)
+
+    def turns_since(self, version: int) -> List[Dict]:
+        """Turni risolti dopo la versione indicata, in formato esteso."""
+        return self._expand_turns(bisect_right(self.turn_versions, version))
+
+    def _expand_turns(self, start):
+        log = self.turn_log
+        return [{
+            "turn": i // 3 + 1,
+            "cards": {self.player1.uuid: str(_CARDS[log[i]]), self.player2.uuid: str(_CARDS[log[i + 1]])},
+            "winner": self.round_winner(log[i + 2]),
+        } for i in range(3 * start, len(log), 3)]
+
+    def to_dict(self):
+        """Rappresentazione JSON-friendly usata dagli store esterni (es. Redis)."""
+        return {
+            "game_id": self.game_id,
+            "player1": self.player1.to_dict(),
+            "player2": self.player2.to_dict(),
+            "current_round": {uuid: c.to_dict() for uuid, c in self.current_round.items()},
+            "turn_number": self.turn_number,
+            "winner": self.winner,
+            "turn_log": list(self.turn_log),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "ended_at": self.ended_at.isoformat() if self.ended_at else None,
+            "version": self.version,
+            "updated_at": self.updated_at,
+            "turn_deadline": self.turn_deadline,
+            "missed_turns": self.missed_turns,
+            "turn_versions": list(self.turn_versions),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        game = cls(
+            player1=Player.from_dict(data["player1"]),
+            player2=Player.from_dict(data["player2"]),
+            game_id=data["game_id"],
+            current_round={uuid: Card.from_dict(c) for uuid, c in data["current_round"].items()},
+            turn_number=data["turn_number"],
+            winner=data["winner"],
+            turn_log=bytearray(data.get("turn_log", [])),
+            started_at=datetime.fromisoformat(data["started_at"]) if data["started_at"] else None,
+            ended_at=datetime.fromisoformat(data["ended_at"]) if data["ended_at"] else None,
+            version=data.get("version", 0),
+            updated_at=data.get("updated_at", time.time()),
+            turn_deadline=data.get("turn_deadline"),
+            missed_turns=data.get("missed_turns", {}),
+            turn_versions=array("I", data.get("turn_versions", [])),
+        )
+        if "turns" in data:
+            # Partite salvate prima del log compatto
+            game.turn_log = game._encode_turns(data["turns"])
+        if len(game.turn_versions) < len(game.turn_log) // 3:
+            # Partite salvate prima di turn_versions: turni attribuiti alla versione corrente
+            missing = len(game.turn_log) // 3 - len(game.turn_versions)
+            game.turn_versions = array("I", [game.version] * missing) + game.turn_versions
+        return game
+
+    def _encode_turns(self, turns):
+        outcomes = {self.player1.name: cards.PLAYER1, self.player2.name: cards.PLAYER2,
+                    "both": cards.DOUBLE_WIN, "draw": cards.DRAW}
+        log = bytearray()
+        for t in turns:
+            c1 = cards.encode(*t["cards"][self.player1.uuid].split(" of "))
+            c2 = cards.encode(*t["cards"][self.player2.uuid].split(" of "))
+            log += bytes((c1, c2, outcomes[t["winner"]]))
+        return log
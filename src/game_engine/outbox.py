@@ -0,0 +1,105 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Politiche di fsync -> PRAGMA synchronous di SQLite (in modalità WAL)
+#   always: fsync a ogni commit, nessuna perdita anche se cade la macchina
+#   normal: fsync ai checkpoint del WAL, si può perdere l'ultimo commit solo per un crash del sistema operativo
+#   off:    nessun fsync, durabile solo rispetto al crash del processo
+FSYNC_POLICIES = {
+    "always": "FULL",
+    "normal": "NORMAL",
+    "off": "OFF",
+}
+
+
+class OutboxFull(ValueError):
+    """Outbox oltre max_rows: le nuove giocate vengono rifiutate finché il publisher non lo svuota."""
+    pass
+
+
+class Outbox:
+    """
+    Outbox locale append-only (SQLite in modalità WAL) per gli esiti delle partite.
+
+    I payload vengono scritti qui prima di essere inviati a RabbitMQ e
+    rimossi solo dopo il commit della transazione sul broker: se il broker
+    non è raggiungibile o il processo si riavvia, le righe rimaste vengono
+    rispedite (replay). La consegna è quindi at-least-once.
+
+    max_rows non fa mai perdere un esito: append scrive sempre, full()
+    serve a chi genera nuovi esiti per fermarsi prima (vedi
+    MatchPublisher.check_capacity).
+    """
+
+    def __init__(self, path, max_rows=100000, fsync="normal"):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Invalid outbox fsync policy '{fsync}', expected one of {list(FSYNC_POLICIES)}")
+        self.path = path
+        self.max_rows = max_rows
+        self.fsync = fsync
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={FSYNC_POLICIES[fsync]}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " payload TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._count = self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+        if self._count:
+            print(f"Outbox: {self._count} messaggi da rispedire trovati in {path}", flush=True)
+
+    def __len__(self):
+        return self._count
+
+    def full(self):
+        return self._count >= self.max_rows
+
+    def append(self, payload):
+        """Scrive un payload (dict) in modo durabile."""
+        body = json.dumps(payload)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO outbox (payload, created_at) VALUES (?, ?)", (body, time.time())
+            )
+            self._count += 1
+            return cursor.lastrowid
+
+    def peek(self, limit=100):
+        """I messaggi più vecchi non ancora confermati: lista di (id, payload dict)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload FROM outbox ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        return [(row_id, json.loads(body)) for row_id, body in rows]
+
+    def ack(self, ids):
+        """Rimuove i messaggi confermati dal broker (una sola transazione)."""
+        if not ids:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+            self._conn.execute("COMMIT")
+            self._count = self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "pending": self._count,
+            "max_rows": self.max_rows,
+            "fsync": self.fsync,
+        }
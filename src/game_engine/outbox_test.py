@@ -0,0 +1,116 @@
+"""
+Test dell'outbox su disco (outbox.py) e del suo uso nel publisher
+(publisher.MatchPublisher, con un broker finto al posto di RabbitMQ).
+
+Uso:  python -m pytest src/game_engine
+"""
+import time
+
+import pytest
+
+from game_engine.outbox import Outbox, OutboxFull
+from game_engine.publisher import MatchPublisher
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "data" / "outbox.db")
+
+
+def test_append_peek_ack(path):
+    outbox = Outbox(path)
+    ids = [outbox.append({"game_id": str(i)}) for i in range(3)]
+    assert len(outbox) == 3
+    assert outbox.peek(2) == [(ids[0], {"game_id": "0"}), (ids[1], {"game_id": "1"})]
+
+    outbox.ack(ids[:2])
+    assert len(outbox) == 1
+    assert outbox.peek() == [(ids[2], {"game_id": "2"})]
+    outbox.close()
+
+
+@pytest.mark.parametrize("fsync", ["always", "normal", "off"])
+def test_replay_after_reopen(path, fsync):
+    outbox = Outbox(path, fsync=fsync)
+    ids = [outbox.append({"game_id": str(i)}) for i in range(3)]
+    outbox.ack([ids[0]])
+    outbox.close()
+
+    # Riavvio: i messaggi non confermati ricompaiono, nello stesso ordine
+    reopened = Outbox(path, fsync=fsync)
+    assert len(reopened) == 2
+    assert [payload["game_id"] for _, payload in reopened.peek()] == ["1", "2"]
+    assert reopened.append({"game_id": "3"}) > ids[-1]
+    reopened.close()
+
+
+def test_full_never_drops_appends(path):
+    outbox = Outbox(path, max_rows=2)
+    outbox.append({"game_id": "0"})
+    assert not outbox.full()
+    outbox.append({"game_id": "1"})
+    assert outbox.full()
+
+    # Un esito già deciso si scrive comunque, full() ferma solo i nuovi
+    outbox.append({"game_id": "2"})
+    assert len(outbox) == 3
+    outbox.ack([row_id for row_id, _ in outbox.peek(2)])
+    assert not outbox.full()
+    outbox.close()
+
+
+def test_invalid_fsync_policy(path):
+    with pytest.raises(ValueError):
+        Outbox(path, fsync="sometimes")
+
+
+def make_publisher(path, sent, fail=False, max_rows=100):
+    publisher = MatchPublisher(outbox_path=path, max_rows=max_rows, retry_seconds=0.01)
+
+    def send_batch(batch):
+        if fail:
+            raise ConnectionError("broker down")
+        sent.extend(payload["game_id"] for _, payload in batch)
+
+    publisher._send_batch = send_batch
+    return publisher
+
+
+def test_publisher_replays_outbox_after_restart(path):
+    down = make_publisher(path, [], fail=True)
+    for i in range(3):
+        down.publish({"game_id": str(i)})
+    assert wait_until(lambda: down.failures > 0)
+    down.stop()
+    down.outbox.close()
+
+    sent = []
+    up = make_publisher(path, sent)
+    up.start()
+    assert wait_until(lambda: len(up.outbox) == 0)
+    assert sent == ["0", "1", "2"]
+    assert up.published == 3
+    up.stop()
+    up.outbox.close()
+
+
+def test_publisher_check_capacity(path):
+    publisher = make_publisher(path, [], fail=True, max_rows=2)
+    publisher.check_capacity()
+    publisher.publish({"game_id": "0"})
+    publisher.publish({"game_id": "1"})
+    with pytest.raises(OutboxFull):
+        publisher.check_capacity()
+    assert publisher.rejected == 1
+    assert len(publisher.outbox) == 2
+    publisher.stop()
+    publisher.outbox.close()
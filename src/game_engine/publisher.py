@@ -0,0 +1,174 @@
+import json
+import ssl
+import threading
+import time
+import pika
+from .outbox import Outbox, OutboxFull
+from .config import RABBITMQ_HOST, RABBITMQ_PORT, RABBITMQ_USER, RABBITMQ_PASSWORD, RABBITMQ_CERT_PATH
+from .config import PUBLISHER_RETRY_SECONDS, PUBLISHER_BATCH_SIZE, OUTBOX_PATH, OUTBOX_MAX_ROWS, OUTBOX_FSYNC
+
+HISTORY_QUEUE = 'game_history_queue'
+
+
+class MatchPublisher:
+    """
+    Publisher RabbitMQ in background per gli esiti delle partite.
+
+    publish() scrive il payload nell'outbox su disco (vedi outbox.py) e
+    sveglia il thread, senza aspettare il broker. Un solo thread possiede
+    una connessione TLS e un canale transazionale aperti per tutta la vita
+    del processo, e svuota l'outbox a blocchi: ogni blocco è pubblicato in
+    una transazione AMQP (un solo round trip per il commit, non un ack per
+    messaggio) e rimosso dall'outbox solo dopo il commit. Se il broker non
+    è raggiungibile i messaggi restano nell'outbox e vengono rispediti alla
+    riconnessione o al riavvio del servizio.
+
+    Con l'outbox pieno (broker irraggiungibile a lungo) check_capacity
+    solleva OutboxFull: le giocate vengono rifiutate prima di modificare la
+    partita, così nessun esito già deciso va perso.
+    """
+
+    def __init__(self, outbox_path=OUTBOX_PATH, max_rows=OUTBOX_MAX_ROWS, fsync=OUTBOX_FSYNC,
+                 batch_size=PUBLISHER_BATCH_SIZE, retry_seconds=PUBLISHER_RETRY_SECONDS):
+        self._outbox_args = (outbox_path, max_rows, fsync)
+        self._batch_size = batch_size
+        self._retry_seconds = retry_seconds
+        self.outbox = None
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._connection = None
+        self._channel = None
+        self.published = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def start(self):
+        """Apre l'outbox (replay dei messaggi rimasti) e avvia il thread."""
+        with self._start_lock:
+            if self.outbox is None:
+                self.outbox = Outbox(*self._outbox_args)
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="match-publisher", daemon=True)
+                self._thread.start()
+
+    def check_capacity(self):
+        """Solleva OutboxFull se l'outbox è pieno (da chiamare prima di generare un nuovo esito)."""
+        self.start()
+        if self.outbox.full():
+            self.rejected += 1
+            raise OutboxFull("Match history temporarily unavailable, please retry later")
+
+    def publish(self, payload):
+        """Scrive un payload (dict) nell'outbox, anche oltre max_rows: un esito deciso non si scarta."""
+        self.start()
+        self.outbox.append(payload)
+        self._wakeup.set()
+
+    def stop(self, timeout=5):
+        """Ferma il thread; i messaggi non ancora confermati restano nell'outbox."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._stopping = True
+        self._wakeup.set()
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "published": self.published,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "connected": self._channel is not None and self._channel.is_open,
+            "outbox": self.outbox.stats() if self.outbox is not None else None,
+        }
+
+    # --- Thread ---
+
+    def _connect(self):
+        print(f"Publisher: connessione a RabbitMQ {RABBITMQ_HOST}:{RABBITMQ_PORT} via SSL...", flush=True)
+        ssl_context = ssl.create_default_context(cafile=RABBITMQ_CERT_PATH)
+        ssl_context.check_hostname = True
+        ssl_options = pika.SSLOptions(ssl_context, RABBITMQ_HOST)
+        credentials = pika.PlainCredentials(RABBITMQ_USER, RABBITMQ_PASSWORD)
+        connection_params = pika.ConnectionParameters(
+            host=RABBITMQ_HOST,
+            port=RABBITMQ_PORT,
+            ssl_options=ssl_options,
+            credentials=credentials
+        )
+        self._connection = pika.BlockingConnection(connection_params)
+        self._channel = self._connection.channel()
+        self._channel.queue_declare(queue=HISTORY_QUEUE, durable=True)
+        self._channel.add_on_return_callback(self._on_return)
+        # Un blocco = una transazione: tx_commit ritorna quando il broker ha accettato tutto il blocco
+        self._channel.tx_select()
+
+    def _disconnect(self):
+        try:
+            if self._connection is not None and self._connection.is_open:
+                self._connection.close()
+        except Exception:
+            pass
+        self._connection = None
+        self._channel = None
+
+    def _send_batch(self, batch):
+        if self._channel is None or not self._channel.is_open:
+            self._connect()
+        for _, payload in batch:
+            self._channel.basic_publish(
+                exchange='',
+                routing_key=HISTORY_QUEUE,
+                body=json.dumps(payload),
+                properties=pika.BasicProperties(
+                    delivery_mode=2,  # make message persistent
+                ),
+                mandatory=True)
+        self._channel.tx_commit()
+
+    def _on_return(self, channel, method, properties, body):
+        # Il broker ha rifiutato il messaggio (non instradabile): ritentare non serve
+        self.failures += 1
+        self.published -= 1
+        game_id = json.loads(body).get('game_id')
+        print(f"ERRORE CRITICO: partita {game_id} rifiutata da RabbitMQ: {method.reply_text}", flush=True)
+
+    def _heartbeat(self):
+        # Mantiene vivi gli heartbeat della connessione inattiva
+        try:
+            if self._connection is not None and self._connection.is_open:
+                self._connection.process_data_events(time_limit=0)
+        except Exception as e:
+            print(f"Publisher: connessione persa ({e})", flush=True)
+            self._disconnect()
+
+    def _run(self):
+        print("Starting RabbitMQ publisher thread...", flush=True)
+        while not self._stopping:
+            batch = self.outbox.peek(self._batch_size)
+            if not batch:
+                self._wakeup.wait(timeout=1)
+                self._wakeup.clear()
+                self._heartbeat()
+                continue
+
+            try:
+                self._send_batch(batch)
+            except Exception as e:
+                # Connessione/canale caduti prima del commit: tutto il blocco resta nell'outbox
+                # (rispedire messaggi già arrivati è innocuo, game_history è idempotente su game_id)
+                self.failures += 1
+                print(f"Publisher: invio fallito ({e}). Nuovo tentativo tra {self._retry_seconds}s...", flush=True)
+                self._disconnect()
+                time.sleep(self._retry_seconds)
+                continue
+            self.outbox.ack([row_id for row_id, _ in batch])
+            self.published += len(batch)
+            print(f"{len(batch)} match inviati a RabbitMQ via SSL.", flush=True)
+
+        self._disconnect()
+
+
+match_publisher = MatchPublisher()
@@ -0,0 +1,15 @@
+from .ttl_cache import TTLCache
+
+
+class RatingCache(TTLCache):
+    """
+    Cache LRU con TTL dei rating dei giocatori (punti della classifica di
+    game_history), chiave user_uuid (vedi TTLCache).
+
+    Il rating serve solo a scegliere l'avversario, quindi un valore vecchio
+    di qualche minuto va bene: game_history viene interrogato al più una
+    volta per TTL per giocatore.
+    """
+
+    def __init__(self, maxsize=10000, ttl=600):
+        super().__init__(maxsize, ttl)
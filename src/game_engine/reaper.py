@@ -0,0 +1,105 @@
+import time
+from .events import event_bus, GAME_EXPIRED
+
+
+class GameReaper:
+    """
+    Rimuove dallo store partite finite, partite abbandonate, entry di coda
+    e partite pendenti mai ritirate, usando le scadenze dello scheduler.
+
+    Ogni oggetto ha una sola scadenza nell'heap. Le giocate non la
+    spostano: quando scade, il reaper ricontrolla l'ultimo aggiornamento
+    (updated_at / last_seen) e, se l'oggetto è ancora attivo, la
+    riprogramma per il tempo mancante.
+    """
+
+    def __init__(self, store, scheduler, finished_ttl, idle_ttl, queue_ttl, pending_ttl):
+        self.store = store
+        self.scheduler = scheduler
+        self.finished_ttl = finished_ttl
+        self.idle_ttl = idle_ttl
+        self.queue_ttl = queue_ttl
+        self.pending_ttl = pending_ttl
+        self.evicted_finished = 0
+        self.evicted_idle = 0
+        self.evicted_queue_entries = 0
+        self.evicted_pending_matches = 0
+
+    # --- Registrazione delle scadenze ---
+
+    def track_game(self, game_id, delay=None):
+        self.scheduler.schedule(("game", game_id), self.idle_ttl if delay is None else delay,
+                                lambda: self._check_game(game_id))
+
+    def game_finished(self, game_id):
+        self.track_game(game_id, self.finished_ttl)
+
+    def track_queue_entry(self, user_uuid, delay=None):
+        self.scheduler.schedule(("queue", user_uuid), self.queue_ttl if delay is None else delay,
+                                lambda: self._check_queue_entry(user_uuid))
+
+    def forget_queue_entry(self, user_uuid):
+        self.scheduler.cancel(("queue", user_uuid))
+
+    def track_pending(self, user_uuid, game_id):
+        self.scheduler.schedule(("pending", user_uuid), self.pending_ttl,
+                                lambda: self._check_pending(user_uuid, game_id))
+
+    def forget_pending(self, user_uuid):
+        self.scheduler.cancel(("pending", user_uuid))
+
+    # --- Callback (thread dello scheduler) ---
+
+    def _check_game(self, game_id):
+        with self.store.game_lock(game_id):
+            game = self.store.get(game_id)
+            if game is None:
+                return
+            ttl = self.finished_ttl if game.winner else self.idle_ttl
+            remaining = game.updated_at + ttl - time.time()
+            if remaining > 0:
+                self.track_game(game_id, remaining)
+                return
+            self.store.delete(game_id)
+
+        if game.winner:
+            self.evicted_finished += 1
+        else:
+            self.evicted_idle += 1
+            print(f"Reaper: partita {game_id} abbandonata (nessuna giocata da {self.idle_ttl:.0f}s), rimossa", flush=True)
+            event_bus.publish(game_id, GAME_EXPIRED, {"message": "Game expired due to inactivity"})
+
+    def _check_queue_entry(self, user_uuid):
+        with self.store.matchmaking_lock():
+            last_seen = self.store.queue_last_seen(user_uuid)
+            if last_seen is None:
+                return
+            remaining = last_seen + self.queue_ttl - time.time()
+            if remaining > 0:
+                self.track_queue_entry(user_uuid, remaining)
+                return
+            self.store.queue_cancel(user_uuid)
+
+        self.evicted_queue_entries += 1
+        self.store.notify_match(user_uuid)
+        self.store.discard_match_signal(user_uuid)
+
+    def _check_pending(self, user_uuid, game_id):
+        if self.store.get_pending(user_uuid) != game_id:
+            return
+        self.store.pop_pending(user_uuid)
+        self.store.discard_match_signal(user_uuid)
+        self.evicted_pending_matches += 1
+
+    def stats(self):
+        return {
+            "scheduled": len(self.scheduler),
+            "finished_ttl_seconds": self.finished_ttl,
+            "idle_ttl_seconds": self.idle_ttl,
+            "queue_ttl_seconds": self.queue_ttl,
+            "pending_ttl_seconds": self.pending_ttl,
+            "evicted_finished": self.evicted_finished,
+            "evicted_idle": self.evicted_idle,
+            "evicted_queue_entries": self.evicted_queue_entries,
+            "evicted_pending_matches": self.evicted_pending_matches,
+        }
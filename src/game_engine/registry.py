@@ -0,0 +1,89 @@
+import threading
+
+
+class _Shard:
+    __slots__ = ("lock", "games", "versions", "game_locks")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.games = {}
+        self.versions = {}
+        self.game_locks = {}
+
+
+class ShardedGameRegistry:
+    """
+    Registro thread-safe delle partite in memoria.
+
+    Le partite sono divise in N shard, ognuno protetto dal proprio lock
+    (tenuto solo per le operazioni sul dizionario), così richieste su
+    partite diverse non si contendono un lock globale. Ogni partita ha
+    inoltre il suo lock, da tenere per tutta la durata di una
+    lettura-modifica-salvataggio (vedi game_lock).
+    """
+
+    def __init__(self, shards=16):
+        self._shards = [_Shard() for _ in range(shards)]
+
+    def _shard(self, game_id):
+        return self._shards[hash(game_id) % len(self._shards)]
+
+    def get(self, game_id):
+        shard = self._shard(game_id)
+        with shard.lock:
+            return shard.games.get(game_id)
+
+    def add(self, game):
+        shard = self._shard(game.game_id)
+        with shard.lock:
+            shard.games[game.game_id] = game
+            shard.versions[game.game_id] = game.version
+            shard.game_locks.setdefault(game.game_id, threading.RLock())
+
+    def compare_and_set(self, game, expected_version):
+        """Salva se la versione registrata è quella attesa. Ritorna False in caso di conflitto."""
+        shard = self._shard(game.game_id)
+        with shard.lock:
+            if shard.versions.get(game.game_id) != expected_version:
+                return False
+            game.version = expected_version + 1
+            shard.versions[game.game_id] = game.version
+            shard.games[game.game_id] = game
+            return True
+
+    def version(self, game_id):
+        shard = self._shard(game_id)
+        with shard.lock:
+            return shard.versions.get(game_id)
+
+    def delete(self, game_id):
+        shard = self._shard(game_id)
+        with shard.lock:
+            shard.versions.pop(game_id, None)
+            shard.game_locks.pop(game_id, None)
+            return shard.games.pop(game_id, None)
+
+    def game_ids(self):
+        """Id di tutte le partite (copia: lo shard resta bloccato solo per la copia)."""
+        ids = []
+        for shard in self._shards:
+            with shard.lock:
+                ids.extend(shard.games)
+        return ids
+
+    def game_lock(self, game_id):
+        """Lock (rientrante) della singola partita."""
+        shard = self._shard(game_id)
+        with shard.lock:
+            lock = shard.game_locks.get(game_id)
+        # Partita inesistente: lock usa e getta, così id inventati non
+        # lasciano lock nel registro (il chiamante riceverà "Invalid game ID")
+        return lock if lock is not None else threading.RLock()
+
+    def __contains__(self, game_id):
+        shard = self._shard(game_id)
+        with shard.lock:
+            return game_id in shard.games
+
+    def __len__(self):
+        return sum(len(shard.games) for shard in self._shards)
@@ -0,0 +1,65 @@
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Risposte di lettura già codificate in JSON (bytes), per partita e per
+    versione: stato pubblico, mano e vista di ogni giocatore.
+
+    Ogni modifica della partita (submit_card, select_deck, pescate,
+    timeout) passa da un save che incrementa la versione, quindi una entry
+    vale finché la versione è la stessa: alla prima scrittura con una
+    versione nuova le risposte della versione precedente vengono scartate.
+    Le partite meno usate di recente escono oltre maxsize (es. partite
+    rimosse dal reaper o gestite da un altro worker).
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._games = OrderedDict()  # game_id -> (version, {chiave: bytes})
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, game_id, version, key):
+        with self._lock:
+            entry = self._games.get(game_id)
+            data = entry[1].get(key) if entry is not None and entry[0] == version else None
+            if data is None:
+                self.misses += 1
+                return None
+            self._games.move_to_end(game_id)
+            self.hits += 1
+            return data
+
+    def put(self, game_id, version, key, data):
+        with self._lock:
+            entry = self._games.get(game_id)
+            if entry is None or entry[0] != version:
+                if entry is not None and entry[0] > version:
+                    return  # risposta costruita su una versione già superata
+                entry = self._games[game_id] = (version, {})
+            entry[1][key] = data
+            self._games.move_to_end(game_id)
+            while len(self._games) > self.maxsize:
+                self._games.popitem(last=False)
+
+    def invalidate(self, game_id):
+        with self._lock:
+            self._games.pop(game_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._games.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "games": len(self._games),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
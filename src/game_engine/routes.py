@@ -1,21 +1,36 @@
-from flask import Blueprint, jsonify, request
+import json
+import queue
+import threading
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed
+from . import handlers
 from .logic import (
     submit_card,
-    get_game_state,
+    get_game_state_json,
     select_deck,
     start_new_game,
-    get_player_hand,
+    get_player_hand_json,
+    get_player_view_json,
     validate_user_token,
     process_matchmaking_request,
     check_matchmaking_status,
+    leave_matchmaking,
+    get_deck_rating,
+    get_metrics,
 )
+from .events import event_bus, format_sse, GAME_FINISHED, GAME_EXPIRED
+from .store import game_store
+from .config import SSE_HEARTBEAT_SECONDS, WS_AUTH_TIMEOUT
 
 game_blueprint = Blueprint("game_engine", __name__)
+sock = Sock()
 
 
 class GameController:
     def __init__(self):
-        self.games = {}
+        # Partite condivise tra i worker se GAME_STORE_BACKEND=redis (vedi store.py)
+        self.games = game_store
 
     def start_game(self):
         """ Avvio manuale (per testing?) """
@@ -32,73 +47,209 @@ class GameController:
         return jsonify({"game_id": game_id, "status": "started"}), 201
 
     def choose_deck(self, game_id):
-        try:
-            user_uuid, _ = validate_user_token(request.headers.get("Authorization"))
-            # Nota: select_deck deve esistere in logic.py
-            deck_slot = request.get_json().get("deck_slot")
-            return jsonify(select_deck(game_id, user_uuid, deck_slot, self.games)), 200
-        except ValueError as e: return jsonify({"error": str(e)}), 401
-        except Exception as e: return jsonify({"error": str(e)}), 400
+        def call(user_uuid, _):
+            deck_slot = handlers.json_field(request.get_json(silent=True), "deck_slot")
+            return select_deck(game_id, user_uuid, deck_slot, self.games)
+        return self._handle("choose_deck", call)
+
+    def deck_rating(self):
+        return self._handle("deck_rating", lambda user_uuid, _: get_deck_rating(
+            user_uuid, handlers.query_number(request.args, "slot", int)))
 
     def play_turn(self, game_id):
-        try:
-            user_uuid, _ = validate_user_token(request.headers.get("Authorization"))
-            card = request.get_json().get("card")
-            return jsonify(submit_card(game_id, user_uuid, card, self.games)), 200
-        except ValueError as e: return jsonify({"error": str(e)}), 400
-        
+        def call(user_uuid, _):
+            card = handlers.json_field(request.get_json(silent=True), "card")
+            return submit_card(game_id, user_uuid, card, self.games)
+        return self._handle("play_turn", call)
+
     def get_hand(self, game_id):
-        try:
-            user_uuid, _ = validate_user_token(request.headers.get("Authorization"))
-            return jsonify(get_player_hand(game_id, user_uuid, self.games)), 200
-        except ValueError as e: return jsonify({"error": str(e)}), 400
-    
+        compact = handlers.is_compact(request.args)
+        return self._handle("get_hand", lambda user_uuid, _: self._versioned_json(
+            game_id, user_uuid, get_player_hand_json, game_id, user_uuid, self.games, compact))
+
     def get_state(self, game_id):
         # State potrebbe essere pubblico o protetto, qui lo proteggiamo per sicurezza
-        try:
-            user_uuid, _ = validate_user_token(request.headers.get("Authorization"))
-            return jsonify(get_game_state(game_id, self.games)), 200
-        except ValueError as e: return jsonify({"error": str(e)}), 400
+        # ?since=<versione>: solo i turni risolti dopo quella versione
+        since = handlers.query_number(request.args, "since", int)
+        return self._handle("get_state", lambda user_uuid, _: self._versioned_json(
+            game_id, user_uuid, get_game_state_json, game_id, self.games, since))
+
+    def get_view(self, game_id):
+        """Mano del giocatore + stato della partita in una sola richiesta (un solo controllo del token)."""
+        compact = handlers.is_compact(request.args)
+        return self._handle("get_view", lambda user_uuid, _: self._versioned_json(
+            game_id, user_uuid, get_player_view_json, game_id, user_uuid, self.games, compact))
 
     def join_matchmaking(self):
+        def call(user_uuid, username):
+            deck_slot = handlers.required_deck_slot(request.get_json(silent=True))
+            return process_matchmaking_request(user_uuid, username, deck_slot, self.games)
+        return self._handle("join_matchmaking", call)
+
+    def status_matchmaking(self):
+        wait = handlers.wait_seconds(request.args)
+        return self._handle("status_matchmaking", lambda user_uuid, _: check_matchmaking_status(user_uuid, wait))
+
+    def leave_matchmaking(self):
+        return self._handle("leave_matchmaking", lambda user_uuid, _: leave_matchmaking(user_uuid))
+
+    def _handle(self, endpoint, call):
+        """
+        Validazione del token, chiamata e risposte di errore (handlers.ERRORS)
+        per gli endpoint JSON: call(user_uuid, username) ritorna il corpo
+        della risposta 200 oppure una Response già pronta.
+        """
         try:
             user_uuid, username = validate_user_token(request.headers.get("Authorization"))
-        except ValueError as e:
-            # Authentication error (invalid/missing token)
-            return jsonify({"error": str(e)}), 401
         except Exception as e:
-            return jsonify({"error": str(e)}), 500
-        
+            return self._error(endpoint, "auth", e)
         try:
-            data = request.get_json() or {}
-            deck_slot = data.get("deck_slot")
-            
-            if not deck_slot:
-                return jsonify({"error": "deck_slot is required (1-5)"}), 400
-            
-            result = process_matchmaking_request(user_uuid, username, deck_slot, self.games)
-            return jsonify(result), 200
-        except ValueError as e:
-            # Validation error (invalid deck, etc.)
-            return jsonify({"error": str(e)}), 400
+            result = call(user_uuid, username)
         except Exception as e:
-            return jsonify({"error": str(e)}), 500
+            return self._error(endpoint, "call", e)
+        return result if isinstance(result, Response) else (jsonify(result), 200)
 
-    def status_matchmaking(self):
+    def _error(self, endpoint, stage, exc):
+        error = handlers.error_response(endpoint, stage, exc)
+        if error is None:
+            raise exc
+        body, status, headers = error
+        return jsonify(body), status, headers
+
+    def _versioned_json(self, game_id, user_uuid, read, *args):
+        """Risposta di lettura con ETag = versione della partita: 304 o JSON dalla cache (vedi handlers.versioned_read)."""
+        tags = handlers.if_none_match(request.headers.get("If-None-Match"))
+        data, version = handlers.versioned_read(self.games, tags, game_id, user_uuid, read, *args)
+        headers = {"ETag": handlers.etag(version)}
+        if data is None:
+            return Response(status=304, headers=headers)
+        return Response(data, status=200, mimetype="application/json", headers=headers)
+
+    def stream_events(self, game_id):
+        """
+        Stream Server-Sent Events della partita: il token viene validato una
+        sola volta, poi il client riceve gli eventi generati da submit_card.
+        """
         try:
-            user_uuid, username = validate_user_token(request.headers.get("Authorization"))
-            result = check_matchmaking_status(user_uuid)
-            return jsonify(result), 200
-        except ValueError as e:
-            return jsonify({"error": str(e)}), 401
+            user_uuid, _ = validate_user_token(request.headers.get("Authorization"))
+        except Exception as e:
+            return self._error("stream_events", "auth", e)
+
+        # Iscrizione prima dello snapshot, così nessun evento va perso
+        subscription = event_bus.subscribe(game_id, user_uuid)
+        try:
+            snapshot = handlers.event_snapshot(game_id, user_uuid, self.games)
         except Exception as e:
-            return jsonify({"error": str(e)}), 500
+            event_bus.unsubscribe(subscription)
+            return self._error("stream_events", "call", e)
+
+        def generate():
+            try:
+                yield format_sse("snapshot", snapshot)
+                if snapshot["winner"]:
+                    return
+                while True:
+                    try:
+                        event, data, event_id = subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+                    except queue.Empty:
+                        yield ": keep-alive\n\n"
+                        continue
+                    yield format_sse(event, data, event_id)
+                    if event in (GAME_FINISHED, GAME_EXPIRED):
+                        return
+            finally:
+                event_bus.unsubscribe(subscription)
+
+        return Response(stream_with_context(generate()), mimetype="text/event-stream", headers=handlers.STREAM_HEADERS)
+
+    def play_socket(self, ws, game_id):
+        """
+        Canale WebSocket bidirezionale per una partita.
+        Il token viene validato una sola volta (header Authorization oppure
+        primo messaggio {"type": "auth", "token": "..."}); poi il client invia
+        {"type": "play", "card": {...}} e riceve in tempo reale gli eventi
+        della partita come {"type": "event", "event": ..., "data": ...}.
+        I messaggi sono quelli di handlers.socket_reply.
+        """
+        send_lock = threading.Lock()
+
+        def send(payload):
+            # ws.send viene chiamato sia da questo thread che dal thread degli eventi
+            with send_lock:
+                ws.send(json.dumps(payload))
+
+        # 1. Autenticazione (una volta per connessione)
+        token_header = request.headers.get("Authorization")
+        if not token_header:
+            token_header = handlers.socket_token_header(ws.receive(timeout=WS_AUTH_TIMEOUT))
+
+        try:
+            user_uuid, _ = validate_user_token(token_header)
+        except ValueError as e:
+            send({"type": "error", "error": str(e)})
+            return
+
+        # 2. Iscrizione agli eventi e stato iniziale
+        subscription = event_bus.subscribe(game_id, user_uuid)
+        try:
+            snapshot = handlers.socket_snapshot(game_id, user_uuid, self.games)
+        except ValueError as e:
+            event_bus.unsubscribe(subscription)
+            send({"type": "error", "error": str(e)})
+            return
+
+        send(snapshot)
+
+        # 3. Thread che inoltra gli eventi della partita al client
+        stop = threading.Event()
+
+        def pump_events():
+            while not stop.is_set():
+                try:
+                    event, data, event_id = subscription.get(timeout=1)
+                except queue.Empty:
+                    continue
+                try:
+                    send(handlers.socket_event(event, data, event_id))
+                except ConnectionClosed:
+                    break
+
+        threading.Thread(target=pump_events, daemon=True).start()
+
+        # 4. Messaggi del client
+        try:
+            while True:
+                send(handlers.socket_reply(ws.receive(), game_id, user_uuid, self.games))
+        finally:
+            stop.set()
+            event_bus.unsubscribe(subscription)
+
+    # --- Endpoint INTERNI (non esposti dal gateway) ---
+
+    def invalidate_deck(self):
+        """Usato dal servizio collection quando un deck viene sostituito o cancellato."""
+        body, status = handlers.invalidate_deck(request.get_json(silent=True))
+        return jsonify(body), status
+
+    def metrics(self):
+        return jsonify(get_metrics()), 200
 
 controller = GameController()
 
 game_blueprint.add_url_rule("/match/join", view_func=controller.join_matchmaking, methods=["POST"])
 game_blueprint.add_url_rule("/match/status", view_func=controller.status_matchmaking, methods=["GET"])
+game_blueprint.add_url_rule("/match/leave", view_func=controller.leave_matchmaking, methods=["POST"])
+game_blueprint.add_url_rule("/deck/rating", view_func=controller.deck_rating, methods=["GET"])
 game_blueprint.add_url_rule("/deck/<game_id>", view_func=controller.choose_deck, methods=["POST"])
 game_blueprint.add_url_rule("/play/<game_id>", view_func=controller.play_turn, methods=["POST"])
 game_blueprint.add_url_rule("/hand/<game_id>", view_func=controller.get_hand, methods=["GET"])
-game_blueprint.add_url_rule("/state/<game_id>", view_func=controller.get_state, methods=["GET"])
\ No newline at end of file
+game_blueprint.add_url_rule("/state/<game_id>", view_func=controller.get_state, methods=["GET"])
+game_blueprint.add_url_rule("/view/<game_id>", view_func=controller.get_view, methods=["GET"])
+game_blueprint.add_url_rule("/events/<game_id>", view_func=controller.stream_events, methods=["GET"])
+sock.route("/ws/<game_id>", bp=game_blueprint)(controller.play_socket)
+
+# Endpoint interni: chiamati solo dagli altri servizi sulla rete docker, senza
+# autenticazione del chiamante. Non vanno mai inoltrati dal gateway
+# (api_gateway/game_engine.py ha solo route esplicite) né pubblicati su una porta dell'host
+game_blueprint.add_url_rule("/internal/decks/invalidate", view_func=controller.invalidate_deck, methods=["POST"])
+game_blueprint.add_url_rule("/internal/metrics", view_func=controller.metrics, methods=["GET"])
\ No newline at end of file
@@ -0,0 +1,98 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class DeadlineScheduler:
+    """
+    Scadenze ordinate in un heap (min-heap su time.monotonic) servite da un
+    solo thread: schedule/cancel costano O(log n), nessuna scansione completa.
+
+    Ogni scadenza ha una chiave: riprogrammare la stessa chiave sostituisce
+    la scadenza precedente, che resta nell'heap ma viene ignorata quando
+    esce (cancellazione "lazy", come MatchmakingQueue). I callback vengono
+    eseguiti nel thread dello scheduler, fuori dal lock.
+    """
+
+    def __init__(self):
+        self._heap = []  # [deadline, seq, key, callback]
+        self._current = {}  # key -> entry valida
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self.fired = 0
+
+    def schedule(self, key, delay, callback):
+        """Esegue callback() tra delay secondi (sostituisce la scadenza precedente di key)."""
+        entry = [time.monotonic() + delay, next(self._seq), key, callback]
+        with self._cond:
+            self._current[key] = entry
+            heapq.heappush(self._heap, entry)
+            self._compact()
+            # Sveglia il thread solo se la nuova scadenza è la prima
+            if self._heap[0] is entry:
+                self._cond.notify()
+        self._ensure_started()
+
+    def cancel(self, key):
+        with self._cond:
+            return self._current.pop(key, None) is not None
+
+    def __contains__(self, key):
+        with self._cond:
+            return key in self._current
+
+    def __len__(self):
+        with self._cond:
+            return len(self._current)
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._cond:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stopping = False
+                    self._thread = threading.Thread(target=self._run, name="deadline-scheduler", daemon=True)
+                    self._thread.start()
+
+    def _compact(self):
+        # Le scadenze sostituite o cancellate non devono far crescere l'heap senza limite
+        if len(self._heap) > 2 * len(self._current) + 64:
+            self._heap = [e for e in self._heap if self._current.get(e[2]) is e]
+            heapq.heapify(self._heap)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        return
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    entry = self._heap[0]
+                    if self._current.get(entry[2]) is not entry:
+                        heapq.heappop(self._heap)  # scadenza sostituita o cancellata
+                        continue
+                    delay = entry[0] - time.monotonic()
+                    if delay > 0:
+                        self._cond.wait(delay)
+                        continue
+                    heapq.heappop(self._heap)
+                    del self._current[entry[2]]
+                    break
+
+            try:
+                entry[3]()
+                self.fired += 1
+            except Exception as e:
+                print(f"Scheduler: errore nel callback {entry[2]}: {e}", flush=True)
+
+
+scheduler = DeadlineScheduler()
@@ -0,0 +1,125 @@
+"""
+Test dello scheduler delle scadenze (scheduler.py) e del reaper che lo usa
+per ripulire lo store (reaper.py).
+
+Uso:  python -m pytest src/game_engine
+"""
+import threading
+import time
+
+import pytest
+
+from game_engine.models import Game, Player
+from game_engine.reaper import GameReaper
+from game_engine.scheduler import DeadlineScheduler
+from game_engine.store import InMemoryGameStore
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = DeadlineScheduler()
+    yield scheduler
+    scheduler.stop()
+
+
+def test_fires_in_deadline_order(scheduler):
+    fired = []
+    for key, delay in (("c", 0.15), ("a", 0.05), ("b", 0.1)):
+        scheduler.schedule(key, delay, lambda key=key: fired.append(key))
+    assert len(scheduler) == 3
+    assert wait_until(lambda: len(fired) == 3)
+    assert fired == ["a", "b", "c"]
+    assert scheduler.fired == 3 and len(scheduler) == 0
+
+
+def test_reschedule_replaces_previous_deadline(scheduler):
+    fired = []
+    scheduler.schedule("key", 0.05, lambda: fired.append("old"))
+    scheduler.schedule("key", 0.1, lambda: fired.append("new"))
+    assert len(scheduler) == 1
+    assert wait_until(lambda: fired)
+    time.sleep(0.1)
+    assert fired == ["new"]
+
+
+def test_cancel(scheduler):
+    fired = threading.Event()
+    scheduler.schedule("key", 0.05, fired.set)
+    assert "key" in scheduler
+    assert scheduler.cancel("key")
+    assert not scheduler.cancel("key")
+    assert not fired.wait(0.15)
+
+
+def test_failing_callback_does_not_stop_the_thread(scheduler):
+    fired = threading.Event()
+    scheduler.schedule("boom", 0, lambda: 1 / 0)
+    scheduler.schedule("ok", 0.05, fired.set)
+    assert fired.wait(5)
+
+
+def test_compaction_bounds_the_heap(scheduler):
+    for i in range(1000):
+        scheduler.schedule("key", 60 + i, lambda: None)
+    assert len(scheduler) == 1
+    assert len(scheduler._heap) <= 2 * len(scheduler) + 64
+
+
+def new_game():
+    return Game(Player(uuid="a", name="A"), Player(uuid="b", name="B"))
+
+
+@pytest.fixture
+def store():
+    return InMemoryGameStore()
+
+
+@pytest.fixture
+def reaper(store, scheduler):
+    return GameReaper(store, scheduler, finished_ttl=0.05, idle_ttl=0.3, queue_ttl=0.1, pending_ttl=0.1)
+
+
+def test_reaper_evicts_idle_and_finished_games(store, reaper):
+    idle, finished = new_game(), new_game()
+    finished.winner = "A"
+    for game in (idle, finished):
+        store.add(game)
+    reaper.track_game(idle.game_id)
+    reaper.game_finished(finished.game_id)
+
+    assert wait_until(lambda: finished.game_id not in store)
+    assert idle.game_id in store
+    assert wait_until(lambda: idle.game_id not in store)
+    assert (reaper.evicted_finished, reaper.evicted_idle) == (1, 1)
+
+
+def test_reaper_keeps_active_games(store, reaper):
+    game = new_game()
+    store.add(game)
+    reaper.track_game(game.game_id)
+
+    # Ogni giocata aggiorna updated_at: la scadenza viene riprogrammata
+    for _ in range(4):
+        time.sleep(0.1)
+        store.save(store.get(game.game_id), store.get_version(game.game_id))
+    assert game.game_id in store
+    assert wait_until(lambda: game.game_id not in store)
+
+
+def test_reaper_evicts_stale_queue_entries_and_pending_matches(store, reaper):
+    store.queue_join({'uuid': 'e', 'name': 'E', 'deck_slot': 1, 'rating': None, 'joined_at': time.time()})
+    reaper.track_queue_entry("e")
+    store.set_pending("p", "game-1")
+    reaper.track_pending("p", "game-1")
+
+    assert wait_until(lambda: not store.queue_contains("e") and store.get_pending("p") is None)
+    assert (reaper.evicted_queue_entries, reaper.evicted_pending_matches) == (1, 1)
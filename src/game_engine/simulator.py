@@ -0,0 +1,178 @@
+"""
+Simulatore Monte-Carlo vettoriale (NumPy) di partite complete tra due deck.
+
+Riproduce le regole di submit_card: mazzi mescolati, 3 carte in mano
+all'inizio, una carta pescata da ciascuno dopo ogni round, esiti dalla
+tabella cards.OUTCOME (Joker, Asso, priorità dei semi), fine partita a 5
+punti o a carte esaurite (vince chi ha più punti).
+
+Le partite sono giocate a blocchi: ogni blocco è un insieme di array
+(partite x carte) e ogni round è un'unica operazione sull'intero blocco.
+
+Una policy sceglie la carta da giocare per tutte le partite del blocco:
+
+    policy(hand, in_hand, rng) -> indici (una posizione per partita)
+
+dove hand è l'array (partite x carte) dei codici carta del mazzo di quel
+giocatore, in ordine di pesca, e in_hand la maschera booleana delle carte
+attualmente in mano. L'indice restituito deve puntare a una carta in mano.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from .cards import OUTCOME, NUM_CARDS, DRAW, PLAYER1, PLAYER2, DOUBLE_WIN, parse_card
+
+OPENING_HAND = 3
+WINNING_SCORE = 5
+
+# OUTCOME come matrice 53x53 di uint8
+OUTCOME_TABLE = np.frombuffer(b"".join(OUTCOME), dtype=np.uint8).reshape(NUM_CARDS, NUM_CARDS)
+# Forza di una carta: quante delle 53 carte batte
+CARD_STRENGTH = (OUTCOME_TABLE == PLAYER1).sum(axis=1)
+
+
+# ------------------------------------------------------------
+# Policy di gioco
+# ------------------------------------------------------------
+def random_policy(hand, in_hand, rng):
+    """Carta a caso tra quelle in mano (come la giocata automatica del timeout)."""
+    keys = rng.random(in_hand.shape)
+    keys[~in_hand] = -1.0
+    return keys.argmax(axis=1)
+
+
+def first_card_policy(hand, in_hand, rng):
+    """Prima carta della mano (la più vecchia)."""
+    return in_hand.argmax(axis=1)
+
+
+def strongest_card_policy(hand, in_hand, rng):
+    """Carta più forte in mano secondo CARD_STRENGTH."""
+    return np.where(in_hand, CARD_STRENGTH[hand], -1).argmax(axis=1)
+
+
+POLICIES = {
+    "random": random_policy,
+    "first": first_card_policy,
+    "strongest": strongest_card_policy,
+}
+
+
+# ------------------------------------------------------------
+# Simulazione
+# ------------------------------------------------------------
+@dataclass
+class SimulationResult:
+    matches: int = 0
+    player1_wins: int = 0
+    player2_wins: int = 0
+    draws: int = 0
+    rounds: int = 0  # round giocati in totale
+
+    def add(self, other):
+        self.matches += other.matches
+        self.player1_wins += other.player1_wins
+        self.player2_wins += other.player2_wins
+        self.draws += other.draws
+        self.rounds += other.rounds
+
+    def to_dict(self):
+        n = self.matches or 1
+        return {
+            "matches": self.matches,
+            "player1_wins": self.player1_wins,
+            "player2_wins": self.player2_wins,
+            "draws": self.draws,
+            "player1_win_rate": self.player1_wins / n,
+            "player2_win_rate": self.player2_wins / n,
+            "draw_rate": self.draws / n,
+            "mean_rounds": self.rounds / n,
+        }
+
+
+def encode_deck(deck):
+    """Deck come lista di carte ({"value", "suit"} o codici) -> array di codici."""
+    return np.array([parse_card(c) for c in deck], dtype=np.uint8)
+
+
+def simulate(deck1, deck2, matches, policy1=random_policy, policy2=random_policy,
+             batch_size=100_000, seed=None):
+    """
+    Gioca `matches` partite complete deck1 (player1) contro deck2 (player2).
+    I deck devono avere lo stesso numero di carte (in partita ognuno gioca
+    una carta per round finché entrambi le esauriscono).
+    """
+    codes1, codes2 = encode_deck(deck1), encode_deck(deck2)
+    if len(codes1) != len(codes2) or len(codes1) == 0:
+        raise ValueError("Both decks must contain the same, non-zero number of cards")
+
+    rng = np.random.default_rng(seed)
+    result = SimulationResult()
+    remaining = matches
+    while remaining > 0:
+        n = min(batch_size, remaining)
+        result.add(_simulate_batch(codes1, codes2, n, policy1, policy2, rng))
+        remaining -= n
+    return result
+
+
+def _simulate_batch(codes1, codes2, n, policy1, policy2, rng):
+    size = len(codes1)
+    rows = np.arange(n)
+
+    # Mazzi mescolati indipendentemente per ogni partita, in ordine di pesca
+    hand1 = codes1[np.argsort(rng.random((n, size)), axis=1)]
+    hand2 = codes2[np.argsort(rng.random((n, size)), axis=1)]
+
+    drawn = min(OPENING_HAND, size)
+    in_hand1 = np.zeros((n, size), dtype=bool)
+    in_hand1[:, :drawn] = True
+    in_hand2 = in_hand1.copy()
+
+    score1 = np.zeros(n, dtype=np.int16)
+    score2 = np.zeros(n, dtype=np.int16)
+    rounds = np.zeros(n, dtype=np.int16)
+    winner = np.full(n, DRAW, dtype=np.uint8)
+    active = np.ones(n, dtype=bool)
+
+    for _ in range(size):
+        i1 = policy1(hand1, in_hand1, rng)
+        i2 = policy2(hand2, in_hand2, rng)
+        if not (in_hand1[rows, i1] | ~active).all() or not (in_hand2[rows, i2] | ~active).all():
+            raise ValueError("Policy played a card not in hand")
+        in_hand1[rows, i1] = False
+        in_hand2[rows, i2] = False
+
+        outcome = OUTCOME_TABLE[hand1[rows, i1], hand2[rows, i2]]
+        score1 += active & ((outcome == PLAYER1) | (outcome == DOUBLE_WIN))
+        score2 += active & ((outcome == PLAYER2) | (outcome == DOUBLE_WIN))
+        rounds += active
+
+        # Regola dei 5 punti (entrambi nello stesso round -> pareggio)
+        reached1 = score1 >= WINNING_SCORE
+        reached2 = score2 >= WINNING_SCORE
+        done = active & (reached1 | reached2)
+        winner[done & reached1 & ~reached2] = PLAYER1
+        winner[done & reached2 & ~reached1] = PLAYER2
+        active &= ~done
+        if not active.any():
+            break
+
+        # Una carta pescata a testa, finché ci sono carte nel mazzo
+        if drawn < size:
+            in_hand1[:, drawn] = True
+            in_hand2[:, drawn] = True
+            drawn += 1
+
+    # Carte esaurite: vince chi ha più punti
+    winner[active & (score1 > score2)] = PLAYER1
+    winner[active & (score2 > score1)] = PLAYER2
+
+    return SimulationResult(
+        matches=n,
+        player1_wins=int((winner == PLAYER1).sum()),
+        player2_wins=int((winner == PLAYER2).sum()),
+        draws=int((winner == DRAW).sum()),
+        rounds=int(rounds.sum()),
+    )
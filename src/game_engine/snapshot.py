@@ -0,0 +1,368 @@
+import math
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from datetime import datetime
+
+from .models import Game, Player, Deck, Hand, Card
+
+# Formato binario dello snapshot (little-endian):
+#
+#   header:  magic "GESN", versione del formato, istante dello snapshot,
+#            numero di partite / entry di coda / partite pendenti, CRC32 del corpo
+#   corpo:   partite, poi entry di coda, poi partite pendenti
+#
+# Stringhe: lunghezza u16 + UTF-8 (0xFFFF = None). Mazzi, mani e log dei turni
+# sono già bytearray di codici carta (vedi models.py) e vengono copiati così
+# come sono; i float assenti (None) sono NaN.
+MAGIC = b"GESN"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sHdIIII")
+_STR = struct.Struct("<H")
+_NONE_STR = 0xFFFF
+_NO_CARD = 0xFF  # carta del round non ancora giocata / contatore assente
+# round p1/p2, turn_number, started_at, ended_at, version, updated_at, turn_deadline,
+# missed_turns p1/p2, score p1/p2, lunghezze di mazzo/mano p1/p2, turn_log, turn_versions
+_GAME = struct.Struct("<BBHddIddBBiiBBBBHH")
+# deck_slot, carte del deck (0xFF = nessun deck), rating presente, rating, joined_at
+_ENTRY = struct.Struct("<BBBdd")
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _pack_str(parts, value):
+    if value is None:
+        parts.append(_STR.pack(_NONE_STR))
+        return
+    data = value.encode()
+    parts.append(_STR.pack(len(data)))
+    parts.append(data)
+
+
+def _unpack_str(buf, offset):
+    (length,) = _STR.unpack_from(buf, offset)
+    offset += _STR.size
+    if length == _NONE_STR:
+        return None, offset
+    return str(buf[offset:offset + length], "utf-8"), offset + length
+
+
+def _float(value):
+    return math.nan if value is None else value
+
+
+def _optional(value):
+    return None if math.isnan(value) else value
+
+
+def _timestamp(value):
+    return value.timestamp() if value else math.nan
+
+
+def _datetime(value):
+    return None if math.isnan(value) else datetime.fromtimestamp(value)
+
+
+def encode_game(game, parts):
+    """Aggiunge a parts il record binario della partita (da chiamare con il lock della partita)."""
+    p1, p2 = game.player1, game.player2
+    round1 = game.current_round.get(p1.uuid)
+    round2 = game.current_round.get(p2.uuid)
+    missed1 = game.missed_turns.get(p1.uuid)
+    missed2 = game.missed_turns.get(p2.uuid)
+    parts.append(_GAME.pack(
+        _NO_CARD if round1 is None else round1.code,
+        _NO_CARD if round2 is None else round2.code,
+        game.turn_number,
+        _timestamp(game.started_at), _timestamp(game.ended_at),
+        game.version, game.updated_at, _float(game.turn_deadline),
+        _NO_CARD if missed1 is None else missed1,
+        _NO_CARD if missed2 is None else missed2,
+        p1.score, p2.score,
+        len(p1.deck.codes), len(p1.hand.codes), len(p2.deck.codes), len(p2.hand.codes),
+        len(game.turn_log), len(game.turn_versions),
+    ))
+    for value in (game.game_id, p1.uuid, p1.name, p2.uuid, p2.name, game.winner):
+        _pack_str(parts, value)
+    parts += (p1.deck.codes, p1.hand.codes, p2.deck.codes, p2.hand.codes, game.turn_log)
+    parts.append(struct.pack(f"<{len(game.turn_versions)}I", *game.turn_versions))
+
+
+def decode_game(buf, offset):
+    """Record binario -> (Game, offset del record successivo)."""
+    (round1, round2, turn_number, started_at, ended_at, version, updated_at, turn_deadline,
+     missed1, missed2, score1, score2, deck1, hand1, deck2, hand2, log_len, versions_len) = _GAME.unpack_from(buf, offset)
+    offset += _GAME.size
+    game_id, offset = _unpack_str(buf, offset)
+    uuid1, offset = _unpack_str(buf, offset)
+    name1, offset = _unpack_str(buf, offset)
+    uuid2, offset = _unpack_str(buf, offset)
+    name2, offset = _unpack_str(buf, offset)
+    winner, offset = _unpack_str(buf, offset)
+
+    # Mazzi, mani e log dei turni sono contigui: una sola copia, poi divisa
+    end = offset + deck1 + hand1 + deck2 + hand2 + log_len
+    codes = bytes(buf[offset:end])
+    turn_versions = array("I", struct.unpack_from(f"<{versions_len}I", buf, end))
+    offset = end + 4 * versions_len
+
+    i = deck1 + hand1
+    j = i + deck2 + hand2
+    player1 = Player(uuid1, name1, Deck.from_codes(bytearray(codes[:deck1])),
+                     Hand.from_codes(bytearray(codes[deck1:i])), score1)
+    player2 = Player(uuid2, name2, Deck.from_codes(bytearray(codes[i:i + deck2])),
+                     Hand.from_codes(bytearray(codes[i + deck2:j])), score2)
+    current_round = {}
+    if round1 != _NO_CARD:
+        current_round[uuid1] = Card.from_code(round1)
+    if round2 != _NO_CARD:
+        current_round[uuid2] = Card.from_code(round2)
+    missed_turns = {}
+    if missed1 != _NO_CARD:
+        missed_turns[uuid1] = missed1
+    if missed2 != _NO_CARD:
+        missed_turns[uuid2] = missed2
+
+    game = Game(
+        player1=player1,
+        player2=player2,
+        game_id=game_id,
+        current_round=current_round,
+        turn_number=turn_number,
+        winner=winner,
+        turn_log=bytearray(codes[j:]),
+        started_at=_datetime(started_at),
+        ended_at=_datetime(ended_at),
+        version=version,
+        updated_at=updated_at,
+        turn_deadline=_optional(turn_deadline),
+        missed_turns=missed_turns,
+        turn_versions=turn_versions,
+    )
+    return game, offset
+
+
+def encode_entry(entry, parts):
+    """Entry della coda di matchmaking (il deck validato è salvato come codici carta)."""
+    deck = entry.get('deck')
+    rating = entry.get('rating')
+    parts.append(_ENTRY.pack(
+        entry['deck_slot'],
+        _NO_CARD if deck is None else len(deck),
+        rating is not None, 0.0 if rating is None else rating,
+        entry['joined_at'],
+    ))
+    _pack_str(parts, entry['uuid'])
+    _pack_str(parts, entry['name'])
+    _pack_str(parts, entry.get('deck_etag'))
+    if deck is not None:
+        parts.append(bytes(Card.from_dict(card).code for card in deck))
+
+
+def decode_entry(buf, offset):
+    """Record binario -> (entry, offset del record successivo)."""
+    deck_slot, deck_len, has_rating, rating, joined_at = _ENTRY.unpack_from(buf, offset)
+    offset += _ENTRY.size
+    user_uuid, offset = _unpack_str(buf, offset)
+    name, offset = _unpack_str(buf, offset)
+    deck_etag, offset = _unpack_str(buf, offset)
+    deck = None
+    if deck_len != _NO_CARD:
+        deck = [Card.from_code(code).to_dict() for code in buf[offset:offset + deck_len]]
+        offset += deck_len
+    if has_rating and rating.is_integer():
+        rating = int(rating)  # i punti della classifica sono interi
+    entry = {
+        'uuid': user_uuid,
+        'name': name,
+        'deck_slot': deck_slot,
+        'deck': deck,
+        'deck_etag': deck_etag,
+        'rating': rating if has_rating else None,
+        'joined_at': joined_at,
+    }
+    return entry, offset
+
+
+class Snapshot:
+    """Contenuto di uno snapshot letto da disco."""
+
+    def __init__(self, created_at, games, queue, pending):
+        self.created_at = created_at
+        self.games = games  # lista di Game
+        self.queue = queue  # entry di coda, in ordine di arrivo
+        self.pending = pending  # lista di (uuid, game_id)
+
+
+def encode_snapshot(store, created_at=None):
+    """
+    Snapshot binario di partite, coda e partite pendenti di un InMemoryGameStore.
+
+    Ogni partita è codificata tenendo il suo lock (record coerente anche
+    se nel frattempo si gioca), coda e pendenti con il lock del
+    matchmaking: non serve fermare il server.
+    """
+    created_at = time.time() if created_at is None else created_at
+    parts = []
+    games = 0
+    for game_id in store.game_ids():
+        with store.game_lock(game_id):
+            game = store.get(game_id)
+            if game is None:
+                continue  # rimossa nel frattempo dal reaper
+            encode_game(game, parts)
+        games += 1
+
+    with store.matchmaking_lock():
+        entries = store.queue_entries()
+        for entry in entries:
+            encode_entry(entry, parts)
+        pending = store.pending_items()
+    for user_uuid, game_id in pending:
+        _pack_str(parts, user_uuid)
+        _pack_str(parts, game_id)
+
+    body = b"".join(parts)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, created_at, games, len(entries), len(pending), zlib.crc32(body))
+    return header + body
+
+
+def decode_snapshot(data):
+    """bytes -> Snapshot. Solleva SnapshotError se il file non è uno snapshot valido."""
+    if len(data) < _HEADER.size:
+        raise SnapshotError("Snapshot troncato")
+    magic, version, created_at, games, entries, pending, crc = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise SnapshotError(f"Formato dello snapshot non supportato ({magic!r}, versione {version})")
+    buf = memoryview(data)[_HEADER.size:]
+    if zlib.crc32(buf) != crc:
+        raise SnapshotError("CRC dello snapshot non valido")
+
+    offset = 0
+    snapshot = Snapshot(created_at, [], [], [])
+    try:
+        for _ in range(games):
+            game, offset = decode_game(buf, offset)
+            snapshot.games.append(game)
+        for _ in range(entries):
+            entry, offset = decode_entry(buf, offset)
+            snapshot.queue.append(entry)
+        for _ in range(pending):
+            user_uuid, offset = _unpack_str(buf, offset)
+            game_id, offset = _unpack_str(buf, offset)
+            snapshot.pending.append((user_uuid, game_id))
+    except (struct.error, ValueError, UnicodeDecodeError) as e:
+        raise SnapshotError(f"Snapshot corrotto: {e}")
+    return snapshot
+
+
+class GameSnapshotter:
+    """
+    Snapshot periodici dello store in memoria su disco locale.
+
+    Ogni `interval` secondi un thread scrive lo snapshot in un file
+    temporaneo nella stessa cartella, fa fsync e lo sostituisce al
+    precedente con os.replace (atomico): su disco c'è sempre uno snapshot
+    completo, al massimo vecchio di un intervallo. load() lo rilegge
+    all'avvio (vedi logic.restore_snapshot).
+    """
+
+    def __init__(self, path, store, interval):
+        self.path = path
+        self.store = store
+        self.interval = interval
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # un solo salvataggio alla volta (thread e shutdown)
+        self.saves = 0
+        self.failures = 0
+        self.last_save_ms = 0.0
+        self.last_size = 0
+        self.last_games = 0
+        self.last_saved_at = None
+        self.restored_games = 0
+        self.last_restore_ms = 0.0
+
+    def save(self):
+        """Scrive uno snapshot completo. Ritorna la dimensione in byte."""
+        with self._save_lock:
+            start = time.perf_counter()
+            data = encode_snapshot(self.store)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            # fsync della cartella: anche la rinomina sopravvive a un crash della macchina
+            dir_fd = os.open(directory or ".", os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+            self.saves += 1
+            self.last_save_ms = (time.perf_counter() - start) * 1000
+            self.last_size = len(data)
+            self.last_games = _HEADER.unpack_from(data)[3]
+            self.last_saved_at = time.time()
+            return len(data)
+
+    def load(self):
+        """Ultimo snapshot su disco (Snapshot), None se non esiste o non è leggibile."""
+        if not os.path.exists(self.path):
+            return None
+        start = time.perf_counter()
+        try:
+            with open(self.path, "rb") as f:
+                snapshot = decode_snapshot(f.read())
+        except (OSError, SnapshotError) as e:
+            print(f"Snapshot: impossibile leggere {self.path}, si riparte senza partite: {e}", flush=True)
+            return None
+        self.last_restore_ms = (time.perf_counter() - start) * 1000
+        self.restored_games = len(snapshot.games)
+        return snapshot
+
+    def start(self):
+        if self.interval <= 0:
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="game-snapshotter", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.save()
+            except Exception as e:
+                self.failures += 1
+                print(f"Snapshot: errore nel salvataggio su {self.path}: {e}", flush=True)
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "interval_seconds": self.interval,
+            "saves": self.saves,
+            "failures": self.failures,
+            "last_save_ms": round(self.last_save_ms, 3),
+            "last_size_bytes": self.last_size,
+            "last_games": self.last_games,
+            "last_saved_at": self.last_saved_at,
+            "restored_games": self.restored_games,
+            "last_restore_ms": round(self.last_restore_ms, 3),
+        }
@@ -0,0 +1,107 @@
+"""
+Test del formato binario degli snapshot (snapshot.py): codifica e
+decodifica di partite, coda e partite pendenti di un InMemoryGameStore.
+
+Uso:  python -m pytest src/game_engine
+"""
+import time
+from datetime import datetime
+
+import pytest
+
+from game_engine import cards
+from game_engine.models import Card, Deck, Game, Player
+from game_engine.snapshot import GameSnapshotter, SnapshotError, decode_snapshot, encode_snapshot
+from game_engine.store import InMemoryGameStore
+
+DECK = [
+    {"value": "2", "suit": "hearts"}, {"value": "K", "suit": "hearts"},
+    {"value": "3", "suit": "diamonds"}, {"value": "Q", "suit": "diamonds"},
+    {"value": "4", "suit": "clubs"}, {"value": "J", "suit": "clubs"},
+    {"value": "5", "suit": "spades"}, {"value": "10", "suit": "spades"},
+    {"value": "JOKER", "suit": "none"},
+]
+
+
+def new_game(p1_uuid, p2_uuid, p2_name="Bob"):
+    game = Game(Player(uuid=p1_uuid, name=p1_uuid.upper()), Player(uuid=p2_uuid, name=p2_name))
+    for player in (game.player1, game.player2):
+        player.deck = Deck.from_dict(DECK)
+        player.deck.shuffle()
+        for _ in range(3):
+            player.draw_card()
+    return game
+
+
+def play(game, player, code):
+    player.hand.codes.remove(code)
+    game.current_round[player.uuid] = Card.from_code(code)
+
+
+@pytest.fixture
+def store():
+    store = InMemoryGameStore()
+
+    # Partita a metà round, con un round già risolto
+    game = new_game("a", "b", "Bòb ✓")
+    play(game, game.player1, game.player1.hand.codes[0])
+    play(game, game.player2, game.player2.hand.codes[0])
+    game.resolve_round(cards.PLAYER1)
+    game.player1.score = 1
+    play(game, game.player1, game.player1.hand.codes[0])
+    game.missed_turns = {"b": 1}
+    game.turn_deadline = time.time() + 60
+    game.version = 3
+    store.add(game)
+
+    # Partita finita
+    finished = new_game("c", "d")
+    finished.winner = "Draw"
+    finished.ended_at = datetime.now()
+    store.add(finished)
+
+    store.queue_join({'uuid': 'e', 'name': 'E', 'deck_slot': 2, 'deck': DECK, 'deck_etag': '"v1"',
+                      'rating': 1500, 'joined_at': time.time()})
+    store.queue_join({'uuid': 'f', 'name': 'F', 'deck_slot': 1, 'deck': None, 'deck_etag': None,
+                      'rating': None, 'joined_at': time.time()})
+    store.set_pending("c", finished.game_id)
+    return store
+
+
+def test_round_trip(store):
+    snapshot = decode_snapshot(encode_snapshot(store, created_at=123.5))
+    assert snapshot.created_at == 123.5
+    assert {g.game_id: g.to_dict() for g in snapshot.games} == \
+        {game_id: store.get(game_id).to_dict() for game_id in store.game_ids()}
+    assert snapshot.queue == store.queue_entries()
+    assert snapshot.pending == store.pending_items()
+
+
+def test_round_trip_empty_store():
+    snapshot = decode_snapshot(encode_snapshot(InMemoryGameStore()))
+    assert (snapshot.games, snapshot.queue, snapshot.pending) == ([], [], [])
+
+
+def test_corrupted_snapshots_are_rejected(store):
+    data = encode_snapshot(store)
+    for corrupted in (data[:10], b"XXXX" + data[4:], data[:-3] + b"xyz"):
+        with pytest.raises(SnapshotError):
+            decode_snapshot(corrupted)
+
+
+def test_snapshotter_save_and_load(store, tmp_path):
+    path = str(tmp_path / "data" / "snapshot.bin")
+    snapshotter = GameSnapshotter(path, store, 0)
+    assert snapshotter.load() is None
+
+    size = snapshotter.save()
+    assert size > 0 and snapshotter.last_games == 2
+
+    snapshot = GameSnapshotter(path, InMemoryGameStore(), 0).load()
+    assert sorted(g.game_id for g in snapshot.games) == sorted(store.game_ids())
+
+
+def test_snapshotter_ignores_unreadable_file(tmp_path):
+    path = tmp_path / "snapshot.bin"
+    path.write_bytes(b"not a snapshot")
+    assert GameSnapshotter(str(path), InMemoryGameStore(), 0).load() is None
@@ -0,0 +1,520 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import nullcontext
+from .models import Game
+from .matchmaking import MatchmakingQueue, RatingWindow
+from .registry import ShardedGameRegistry
+from .config import GAME_STORE_BACKEND, REDIS_URL, MATCHMAKING_LOCK_TIMEOUT, GAME_REGISTRY_SHARDS
+from .config import GAME_FINISHED_TTL, GAME_IDLE_TTL
+from .config import MATCHMAKING_RATING_WINDOW, MATCHMAKING_WINDOW_GROWTH, MATCHMAKING_MAX_WINDOW
+from .config import MATCHMAKING_RATING_BUCKET
+
+# Client Redis alternativo per i test (es. fakeredis), come mock_db_conn negli altri servizi
+mock_redis_client = None
+# Client redis.asyncio alternativo per i test (es. fakeredis.FakeAsyncRedis), vedi wait_for_match_async
+mock_async_redis_client = None
+
+
+class VersionConflict(Exception):
+    """La partita è stata modificata da un'altra richiesta/worker dopo la lettura."""
+    pass
+
+
+# Candidati letti per ogni richiesta al sorted set in RedisGameStore._pop_nearest
+NEAREST_PAGE = 32
+
+# Differenza di rating accettata nel matchmaking (cresce con l'attesa in coda)
+RATING_WINDOW = RatingWindow(MATCHMAKING_RATING_WINDOW, MATCHMAKING_WINDOW_GROWTH, MATCHMAKING_MAX_WINDOW)
+
+
+class InMemoryGameStore:
+    """
+    Stato di partite e matchmaking nella memoria del processo (un solo worker).
+
+    Le partite sono conservate come oggetti Game "vivi" in un registro a
+    shard (vedi registry.py): get restituisce sempre lo stesso oggetto,
+    quindi ogni lettura-modifica-salvataggio va fatta tenendo game_lock.
+    La versione viene comunque controllata e incrementata a ogni save.
+    """
+
+    def __init__(self, shards=GAME_REGISTRY_SHARDS):
+        self._games = ShardedGameRegistry(shards)
+        self._queue = MatchmakingQueue(RATING_WINDOW, MATCHMAKING_RATING_BUCKET)
+        self._pending = {}
+        self._last_seen = {}  # uuid -> ultimo join/status del giocatore in coda
+        self._match_events = {}  # uuid -> threading.Event, svegliato quando il giocatore viene abbinato
+        self._match_waiters = {}  # uuid -> callback dei long-poll asincroni (vedi async_logic)
+        self._match_waiters_lock = threading.Lock()
+        self._matchmaking_lock = threading.RLock()
+
+    # --- Partite ---
+
+    def get(self, game_id):
+        return self._games.get(game_id)
+
+    def get_version(self, game_id):
+        """Versione corrente della partita (None se non esiste), senza leggerla."""
+        return self._games.version(game_id)
+
+    def get_players(self, game_id):
+        """UUID dei due giocatori (None se la partita non esiste), senza copiare la partita."""
+        game = self._games.get(game_id)
+        return (game.player1.uuid, game.player2.uuid) if game else None
+
+    def add(self, game):
+        self._games.add(game)
+
+    def save(self, game, expected_version):
+        """Salva la partita se nessun altro l'ha modificata dalla versione letta."""
+        game.updated_at = time.time()
+        if not self._games.compare_and_set(game, expected_version):
+            raise VersionConflict(f"Game {game.game_id} was modified concurrently")
+
+    def delete(self, game_id):
+        return self._games.delete(game_id)
+
+    def game_lock(self, game_id):
+        """Lock della partita: serializza le richieste sulla stessa partita."""
+        return self._games.game_lock(game_id)
+
+    def game_ids(self):
+        """Id di tutte le partite (usato dagli snapshot, vedi snapshot.py)."""
+        return self._games.game_ids()
+
+    def __contains__(self, game_id):
+        return game_id in self._games
+
+    def __len__(self):
+        return len(self._games)
+
+    # --- Matchmaking ---
+
+    def matchmaking_lock(self):
+        """Sezione critica del matchmaking (join/cancel/pop)."""
+        return self._matchmaking_lock
+
+    def queue_join(self, entry):
+        self._queue.join(entry)
+        self._last_seen[entry['uuid']] = time.time()
+        self._match_events.setdefault(entry['uuid'], threading.Event())
+
+    def queue_cancel(self, user_uuid):
+        self._last_seen.pop(user_uuid, None)
+        return self._queue.cancel(user_uuid)
+
+    def queue_pop(self, rating=None):
+        """
+        Giocatore più vecchio in coda (FIFO) oppure, se viene passato il rating
+        di chi cerca, l'avversario più vicino per rating (vedi RatingWindow).
+        """
+        entry = self._queue.pop() if rating is None else self._queue.pop_nearest(rating)
+        if entry:
+            self._last_seen.pop(entry['uuid'], None)
+        return entry
+
+    def queue_entries(self):
+        """Tutte le entry in coda, in ordine di arrivo."""
+        return self._queue.entries()
+
+    def queue_touch(self, user_uuid):
+        """Il giocatore in coda è ancora attivo (es. long-poll di /match/status)."""
+        if user_uuid in self._queue:
+            self._last_seen[user_uuid] = time.time()
+
+    def queue_last_seen(self, user_uuid):
+        if user_uuid not in self._queue:
+            return None
+        return self._last_seen.get(user_uuid)
+
+    def queue_contains(self, user_uuid):
+        return user_uuid in self._queue
+
+    def queue_len(self):
+        return len(self._queue)
+
+    def set_pending(self, user_uuid, game_id):
+        self._pending[user_uuid] = game_id
+
+    def get_pending(self, user_uuid):
+        return self._pending.get(user_uuid)
+
+    def pop_pending(self, user_uuid):
+        return self._pending.pop(user_uuid, None)
+
+    def pending_items(self):
+        """Coppie (uuid, game_id) delle partite trovate e non ancora ritirate."""
+        return list(self._pending.items())
+
+    def notify_match(self, user_uuid):
+        """Sveglia le richieste di long-poll in attesa per questo giocatore."""
+        event = self._match_events.get(user_uuid)
+        if event:
+            event.set()
+        with self._match_waiters_lock:
+            waiters = list(self._match_waiters.get(user_uuid, ()))
+        for wake in waiters:
+            wake()
+
+    def add_match_waiter(self, user_uuid, wake):
+        """wake() verrà chiamata (da un thread qualsiasi) al prossimo notify_match del giocatore."""
+        with self._match_waiters_lock:
+            self._match_waiters.setdefault(user_uuid, set()).add(wake)
+
+    def remove_match_waiter(self, user_uuid, wake):
+        with self._match_waiters_lock:
+            waiters = self._match_waiters.get(user_uuid)
+            if waiters:
+                waiters.discard(wake)
+                if not waiters:
+                    del self._match_waiters[user_uuid]
+
+    def wait_for_match(self, user_uuid, timeout):
+        event = self._match_events.setdefault(user_uuid, threading.Event())
+        event.wait(timeout)
+
+    def discard_match_signal(self, user_uuid):
+        self._match_events.pop(user_uuid, None)
+
+
+class RedisGameStore:
+    """
+    Stato di partite e matchmaking su Redis, condiviso da più worker/repliche.
+
+    - partita: hash {version, data} con data = Game.to_dict() in JSON;
+      save usa WATCH/MULTI e fallisce con VersionConflict se la versione
+      su Redis non è quella letta
+    - coda: lista FIFO "uuid|token" + hash uuid -> entry (cancellazione lazy,
+      come MatchmakingQueue), protette da un lock Redis; con il matchmaking
+      per rating anche un sorted set "uuid|token" -> rating
+    - long-poll: BLPOP su una lista di notifica per giocatore (nel server
+      ASGI con redis.asyncio, vedi wait_for_match_async)
+
+    Le chiavi delle partite hanno anche una scadenza Redis (key_ttl) come
+    rete di sicurezza se la replica che le ha create sparisce prima che il
+    suo reaper le rimuova.
+    """
+
+    def __init__(self, client=None, prefix="game_engine:", key_ttl=None):
+        self._client = client
+        self._async_client = None
+        self._async_loop = None
+        self._key_ttl = key_ttl
+        self._prefix = prefix
+        self._games_key = prefix + "games"
+        self._queue_key = prefix + "mm:queue"
+        self._entries_key = prefix + "mm:entries"
+        self._pending_key = prefix + "mm:pending"
+        self._seen_key = prefix + "mm:seen"
+        self._rated_key = prefix + "mm:rated"
+
+    @property
+    def _redis(self):
+        # Connessione creata al primo uso (così i test possono impostare mock_redis_client)
+        if self._client is None:
+            self._client = _redis_client()
+        return self._client
+
+    def _game_key(self, game_id):
+        return f"{self._prefix}game:{game_id}"
+
+    def _signal_key(self, user_uuid):
+        return f"{self._prefix}mm:signal:{user_uuid}"
+
+    # --- Partite ---
+
+    def get(self, game_id):
+        data, version = self._redis.hmget(self._game_key(game_id), "data", "version")
+        if data is None:
+            return None
+        game = Game.from_dict(json.loads(data))
+        game.version = int(version)
+        return game
+
+    def get_version(self, game_id):
+        version = self._redis.hget(self._game_key(game_id), "version")
+        return int(version) if version is not None else None
+
+    def get_players(self, game_id):
+        # Campo "players" scritto da add (i giocatori non cambiano): non serve leggere "data"
+        players = self._redis.hget(self._game_key(game_id), "players")
+        if players is not None:
+            return tuple(json.loads(players))
+        game = self.get(game_id)  # partite salvate prima del campo "players"
+        return (game.player1.uuid, game.player2.uuid) if game else None
+
+    def add(self, game):
+        key = self._game_key(game.game_id)
+        pipe = self._redis.pipeline()
+        pipe.hset(key, mapping={"data": json.dumps(game.to_dict()), "version": game.version,
+                                "players": json.dumps([game.player1.uuid, game.player2.uuid])})
+        if self._key_ttl:
+            pipe.expire(key, int(self._key_ttl))
+        pipe.sadd(self._games_key, game.game_id)
+        pipe.execute()
+
+    def save(self, game, expected_version):
+        """Compare-and-set sulla versione: solleva VersionConflict se un altro worker ha salvato prima."""
+        import redis
+        key = self._game_key(game.game_id)
+        with self._redis.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                current = pipe.hget(key, "version")
+                if current is None or int(current) != expected_version:
+                    raise VersionConflict(f"Game {game.game_id} was modified concurrently")
+                game.version = expected_version + 1
+                game.updated_at = time.time()
+                pipe.multi()
+                pipe.hset(key, mapping={"data": json.dumps(game.to_dict()), "version": game.version})
+                if self._key_ttl:
+                    pipe.expire(key, int(self._key_ttl))
+                pipe.execute()
+            except redis.WatchError:
+                game.version = expected_version
+                raise VersionConflict(f"Game {game.game_id} was modified concurrently")
+
+    def delete(self, game_id):
+        pipe = self._redis.pipeline()
+        pipe.delete(self._game_key(game_id))
+        pipe.srem(self._games_key, game_id)
+        pipe.execute()
+
+    def __contains__(self, game_id):
+        return bool(self._redis.exists(self._game_key(game_id)))
+
+    def __len__(self):
+        return self._redis.scard(self._games_key)
+
+    def game_lock(self, game_id):
+        # Ogni get restituisce una copia: la concorrenza (anche tra worker)
+        # è gestita dal controllo di versione in save
+        return nullcontext()
+
+    # --- Matchmaking ---
+
+    def matchmaking_lock(self):
+        return self._redis.lock(self._prefix + "mm:lock", timeout=MATCHMAKING_LOCK_TIMEOUT)
+
+    def queue_join(self, entry):
+        entry = dict(entry, token=uuid.uuid4().hex)
+        pipe = self._redis.pipeline()
+        pipe.hset(self._entries_key, entry['uuid'], json.dumps(entry))
+        pipe.hset(self._seen_key, entry['uuid'], time.time())
+        pipe.rpush(self._queue_key, f"{entry['uuid']}|{entry['token']}")
+        if entry.get('rating') is not None:
+            pipe.zadd(self._rated_key, {f"{entry['uuid']}|{entry['token']}": entry['rating']})
+        pipe.delete(self._signal_key(entry['uuid']))
+        pipe.execute()
+        self._compact()
+
+    def queue_cancel(self, user_uuid):
+        pipe = self._redis.pipeline()
+        pipe.hget(self._entries_key, user_uuid)
+        pipe.hdel(self._entries_key, user_uuid)
+        pipe.hdel(self._seen_key, user_uuid)
+        raw, _, _ = pipe.execute()
+        return json.loads(raw) if raw else None
+
+    def queue_pop(self, rating=None):
+        if rating is not None:
+            return self._pop_nearest(rating)
+        while True:
+            item = self._redis.lpop(self._queue_key)
+            if item is None:
+                return None
+            entry = self._valid_entry(item)
+            if entry is None:
+                continue
+            self._remove_entry(entry)
+            return entry
+
+    def _valid_entry(self, item):
+        user_uuid, token = item.decode().split("|", 1)
+        raw = self._redis.hget(self._entries_key, user_uuid)
+        if raw is None:
+            return None  # entry cancellata
+        entry = json.loads(raw)
+        if entry.get('token') != token:
+            return None  # entry sostituita da un join successivo
+        return entry
+
+    def _remove_entry(self, entry):
+        pipe = self._redis.pipeline()
+        pipe.hdel(self._entries_key, entry['uuid'])
+        pipe.hdel(self._seen_key, entry['uuid'])
+        pipe.zrem(self._rated_key, f"{entry['uuid']}|{entry['token']}")
+        pipe.execute()
+
+    def _pop_nearest(self, rating):
+        """
+        Avversario più vicino per rating dal sorted set mm:rated. I candidati
+        sopra e sotto il rating (entro la finestra massima) vengono letti a
+        pagine di NEAREST_PAGE, con le entry in un solo HMGET per pagina, e
+        visitati tutti in ordine di distanza: uno fuori finestra (es. appena
+        entrato) non nasconde quelli successivi. Gli elementi non più validi
+        vengono rimossi dal sorted set.
+        """
+        now = time.time()
+        limit = RATING_WINDOW(float("inf"))
+        pages = {
+            "up": lambda start: self._redis.zrangebyscore(
+                self._rated_key, rating, rating + limit, start=start, num=NEAREST_PAGE, withscores=True),
+            "down": lambda start: self._redis.zrevrangebyscore(
+                self._rated_key, f"({rating}", rating - limit, start=start, num=NEAREST_PAGE, withscores=True),
+        }
+        buffers = {side: deque() for side in pages}
+        offsets = {side: 0 for side in pages}
+        exhausted = set()
+        stale = []
+        found = None
+        while found is None:
+            for side in pages:
+                if not buffers[side] and side not in exhausted:
+                    page = pages[side](offsets[side])
+                    offsets[side] += len(page)
+                    if len(page) < NEAREST_PAGE:
+                        exhausted.add(side)
+                    buffers[side].extend(self._page_entries(page))
+            heads = [(abs(buffers[side][0][1] - rating), side) for side in pages if buffers[side]]
+            if not heads:
+                break
+            item, score, entry = buffers[min(heads)[1]].popleft()
+            if entry is None:
+                stale.append(item)
+            elif RATING_WINDOW.accepts(rating, 0, score, now - entry.get('joined_at', now)):
+                found = entry
+
+        if stale:
+            self._redis.zrem(self._rated_key, *stale)
+        if found:
+            self._remove_entry(found)
+        return found
+
+    def _page_entries(self, page):
+        """(item, score, entry) per una pagina del sorted set; entry None se cancellata o sostituita."""
+        if not page:
+            return []
+        items = [(item, score, *item.decode().split("|", 1)) for item, score in page]
+        raws = self._redis.hmget(self._entries_key, [user_uuid for _, _, user_uuid, _ in items])
+        result = []
+        for (item, score, _, token), raw in zip(items, raws):
+            entry = json.loads(raw) if raw else None
+            result.append((item, score, entry if entry and entry.get('token') == token else None))
+        return result
+
+    def queue_entries(self):
+        entries = [json.loads(raw) for raw in self._redis.hvals(self._entries_key)]
+        return sorted(entries, key=lambda e: e.get('joined_at', 0))
+
+    def queue_contains(self, user_uuid):
+        return bool(self._redis.hexists(self._entries_key, user_uuid))
+
+    def queue_len(self):
+        return self._redis.hlen(self._entries_key)
+
+    def queue_touch(self, user_uuid):
+        if self.queue_contains(user_uuid):
+            self._redis.hset(self._seen_key, user_uuid, time.time())
+
+    def queue_last_seen(self, user_uuid):
+        if not self.queue_contains(user_uuid):
+            return None
+        last_seen = self._redis.hget(self._seen_key, user_uuid)
+        return float(last_seen) if last_seen else None
+
+    def _compact(self):
+        # Evita che gli elementi cancellati facciano crescere la lista senza limite
+        if self._redis.llen(self._queue_key) <= 2 * self.queue_len() + 32:
+            return
+        entries = {k.decode(): json.loads(v) for k, v in self._redis.hgetall(self._entries_key).items()}
+        valid = []
+        for item in self._redis.lrange(self._queue_key, 0, -1):
+            user_uuid, token = item.decode().split("|", 1)
+            if entries.get(user_uuid, {}).get('token') == token:
+                valid.append(item)
+        rated = {f"{e['uuid']}|{e['token']}": e['rating'] for e in entries.values() if e.get('rating') is not None}
+        pipe = self._redis.pipeline()
+        pipe.delete(self._queue_key)
+        pipe.delete(self._rated_key)
+        if valid:
+            pipe.rpush(self._queue_key, *valid)
+        if rated:
+            pipe.zadd(self._rated_key, rated)
+        pipe.execute()
+
+    def set_pending(self, user_uuid, game_id):
+        self._redis.hset(self._pending_key, user_uuid, game_id)
+
+    def get_pending(self, user_uuid):
+        game_id = self._redis.hget(self._pending_key, user_uuid)
+        return game_id.decode() if game_id else None
+
+    def pop_pending(self, user_uuid):
+        pipe = self._redis.pipeline()
+        pipe.hget(self._pending_key, user_uuid)
+        pipe.hdel(self._pending_key, user_uuid)
+        game_id, _ = pipe.execute()
+        return game_id.decode() if game_id else None
+
+    def notify_match(self, user_uuid):
+        key = self._signal_key(user_uuid)
+        pipe = self._redis.pipeline()
+        pipe.rpush(key, 1)
+        pipe.expire(key, 60)
+        pipe.execute()
+
+    def wait_for_match(self, user_uuid, timeout):
+        if timeout <= 0:
+            return  # per BLPOP timeout 0 significa "attendi per sempre"
+        self._redis.blpop([self._signal_key(user_uuid)], timeout=timeout)
+
+    async def wait_for_match_async(self, user_uuid, timeout):
+        """
+        Come wait_for_match per il server ASGI: BLPOP su una connessione
+        redis.asyncio, così un long-poll non tiene fermo un thread del pool
+        (né una connessione del client sincrono usato per le partite).
+        """
+        if timeout <= 0:
+            return
+        await self._async_redis().blpop([self._signal_key(user_uuid)], timeout=timeout)
+
+    def _async_redis(self):
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            # Un client per event loop (es. riavvio del server nei test)
+            self._async_client = _async_redis_client()
+            self._async_loop = loop
+        return self._async_client
+
+    def discard_match_signal(self, user_uuid):
+        self._redis.delete(self._signal_key(user_uuid))
+
+
+def _redis_client():
+    if mock_redis_client:
+        return mock_redis_client
+    import redis
+    return redis.Redis.from_url(REDIS_URL)
+
+
+def _async_redis_client():
+    if mock_async_redis_client:
+        return mock_async_redis_client
+    import redis.asyncio
+    return redis.asyncio.Redis.from_url(REDIS_URL)
+
+
+def create_game_store(backend=GAME_STORE_BACKEND):
+    if backend == "memory":
+        return InMemoryGameStore()
+    if backend == "redis":
+        print(f"Game store: Redis ({REDIS_URL})", flush=True)
+        return RedisGameStore(key_ttl=2 * max(GAME_FINISHED_TTL, GAME_IDLE_TTL))
+    raise ValueError(f"Unknown GAME_STORE_BACKEND '{backend}', expected 'memory' or 'redis'")
+
+
+game_store = create_game_store()
@@ -0,0 +1,88 @@
+"""
+Test del salvataggio con controllo di versione degli store delle partite
+(store.py): RedisGameStore con fakeredis al posto del server e, per
+confronto, InMemoryGameStore.
+
+Uso:  python -m pytest src/game_engine
+"""
+import fakeredis
+import pytest
+
+from game_engine.models import Game, Player
+from game_engine.store import InMemoryGameStore, RedisGameStore, VersionConflict
+
+
+def new_game():
+    return Game(Player(uuid="a", name="A"), Player(uuid="b", name="B"))
+
+
+@pytest.fixture
+def redis_store():
+    return RedisGameStore(client=fakeredis.FakeRedis())
+
+
+@pytest.fixture(params=["memory", "redis"])
+def any_store(request):
+    if request.param == "memory":
+        return InMemoryGameStore()
+    return RedisGameStore(client=fakeredis.FakeRedis())
+
+
+def test_save_increments_version(any_store):
+    game = new_game()
+    any_store.add(game)
+    game = any_store.get(game.game_id)
+    game.turn_number = 1
+    any_store.save(game, 0)
+
+    saved = any_store.get(game.game_id)
+    assert (saved.version, saved.turn_number) == (1, 1)
+    assert any_store.get_version(game.game_id) == 1
+    assert any_store.get_players(game.game_id) == ("a", "b")
+
+
+def test_save_with_stale_version_conflicts(redis_store):
+    game = new_game()
+    redis_store.add(game)
+
+    # Due worker leggono la stessa versione: vince il primo salvataggio
+    first, second = redis_store.get(game.game_id), redis_store.get(game.game_id)
+    first.turn_number = 1
+    redis_store.save(first, 0)
+    second.turn_number = 7
+    with pytest.raises(VersionConflict):
+        redis_store.save(second, 0)
+
+    saved = redis_store.get(game.game_id)
+    assert (saved.version, saved.turn_number) == (1, 1)
+    assert second.version == 0
+
+
+def test_save_conflicts_when_modified_during_transaction(redis_store, monkeypatch):
+    game = new_game()
+    redis_store.add(game)
+    other = RedisGameStore(client=redis_store._redis)
+    game = redis_store.get(game.game_id)
+    to_dict = Game.to_dict
+    interleaved = []
+
+    def to_dict_with_concurrent_save(self):
+        # Un altro worker salva tra WATCH ed EXEC: la transazione non va applicata
+        if not interleaved:
+            interleaved.append(True)
+            winner = other.get(game.game_id)
+            winner.turn_number = 5
+            other.save(winner, 0)
+        return to_dict(self)
+
+    monkeypatch.setattr(Game, "to_dict", to_dict_with_concurrent_save)
+    with pytest.raises(VersionConflict):
+        redis_store.save(game, 0)
+    assert game.version == 0
+    saved = redis_store.get(game.game_id)
+    assert (saved.version, saved.turn_number) == (1, 5)
+
+
+def test_save_missing_game_conflicts(any_store):
+    with pytest.raises(VersionConflict):
+        any_store.save(new_game(), 0)
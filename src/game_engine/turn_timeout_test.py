@@ -0,0 +1,133 @@
+"""
+Test del timeout di turno e della sconfitta a tavolino (logic.py), con uno
+store in memoria nuovo per ogni test e un publisher finto al posto
+dell'outbox.
+
+Uso:  python -m pytest src/game_engine
+"""
+import time
+
+import pytest
+
+from game_engine import logic
+from game_engine.outbox import OutboxFull
+from game_engine.store import InMemoryGameStore
+
+DECK = [
+    {"value": "2", "suit": "hearts"}, {"value": "K", "suit": "hearts"},
+    {"value": "3", "suit": "diamonds"}, {"value": "Q", "suit": "diamonds"},
+    {"value": "4", "suit": "clubs"}, {"value": "J", "suit": "clubs"},
+    {"value": "5", "suit": "spades"}, {"value": "10", "suit": "spades"},
+    {"value": "JOKER", "suit": "none"},
+]
+
+
+class FakePublisher:
+    def __init__(self):
+        self.published = []
+        self.full = False
+
+    def check_capacity(self):
+        if self.full:
+            raise OutboxFull("Match history temporarily unavailable, please retry later")
+
+    def publish(self, payload):
+        self.published.append(payload)
+
+
+@pytest.fixture
+def publisher(monkeypatch):
+    publisher = FakePublisher()
+    monkeypatch.setattr(logic, "match_publisher", publisher)
+    return publisher
+
+
+@pytest.fixture
+def store(monkeypatch, publisher):
+    store = InMemoryGameStore()
+    monkeypatch.setattr(logic, "game_store", store)
+    monkeypatch.setattr(logic, "TURN_TIMEOUT_SECONDS", 60)
+    monkeypatch.setattr(logic, "MAX_MISSED_TURNS", 2)
+    return store
+
+
+@pytest.fixture
+def game(store):
+    game_id = logic._create_match({'uuid': 'a', 'name': 'Anna'}, DECK, 'b', 'Bob', DECK, store)['game_id']
+    yield store.get(game_id)
+    logic.scheduler.cancel(("turn", game_id))
+    logic.scheduler.cancel(("game", game_id))
+
+
+def expire_turn(game):
+    game.turn_deadline = time.time() - 1
+
+
+def play_first_card(game, player_uuid, store):
+    return logic.submit_card(game.game_id, player_uuid, logic.get_player_hand(game.game_id, player_uuid, store)[0], store)
+
+
+def test_new_round_starts_the_turn_clock(game):
+    assert game.turn_deadline > time.time()
+    assert ("turn", game.game_id) in logic.scheduler
+
+
+def test_timeout_before_deadline_changes_nothing(game):
+    version = game.version
+    logic._on_turn_timeout(game.game_id)
+    assert (game.version, game.turn_number, game.current_round) == (version, 0, {})
+
+
+def test_timeout_plays_for_absent_player(game, store):
+    play_first_card(game, "b", store)
+    expire_turn(game)
+    logic._on_turn_timeout(game.game_id)
+
+    assert game.turn_number == 1
+    assert game.missed_turns == {"a": 1, "b": 0}
+    assert len(game.player1.hand) == 3  # carta giocata in automatico, poi pescata
+    assert game.turn_deadline > time.time()
+
+
+def test_playing_again_resets_missed_turns(game, store):
+    play_first_card(game, "b", store)
+    expire_turn(game)
+    logic._on_turn_timeout(game.game_id)
+
+    play_first_card(game, "a", store)
+    assert game.missed_turns["a"] == 0
+
+
+def test_second_missed_turn_forfeits(game, store, publisher):
+    for _ in range(2):
+        play_first_card(game, "b", store)
+        expire_turn(game)
+        logic._on_turn_timeout(game.game_id)
+
+    assert game.winner == "Bob"
+    assert game.turn_number == 1  # il secondo round non viene giocato
+    assert game.turn_deadline is None
+    assert [(p["game_id"], p["winner"]) for p in publisher.published] == [(game.game_id, "2")]
+
+
+def test_both_absent_is_a_draw(game):
+    for _ in range(2):
+        expire_turn(game)
+        logic._on_turn_timeout(game.game_id)
+    assert game.winner == "Draw"
+
+
+def test_outbox_full_rejects_plays_and_postpones_timeouts(game, store, publisher, monkeypatch):
+    publisher.full = True
+    hand = logic.get_player_hand(game.game_id, "b", store)
+    with pytest.raises(OutboxFull):
+        logic.submit_card(game.game_id, "b", hand[0], store)
+    assert logic.get_player_hand(game.game_id, "b", store) == hand
+
+    # Nessuna giocata automatica: la scadenza viene riprogrammata
+    rescheduled = []
+    monkeypatch.setattr(logic, "_schedule_deadline", lambda key, delay, func, *args: rescheduled.append(key))
+    expire_turn(game)
+    logic._on_turn_timeout(game.game_id)
+    assert (game.turn_number, game.current_round, game.missed_turns) == (0, {}, {})
+    assert rescheduled == [("turn", game.game_id)]
@@ -3,6 +3,7 @@ import json
 import time
 import threading
 import ssl
+from pymongo.errors import ConnectionFailure
 from config import RABBITMQ_HOST, RABBITMQ_PORT, RABBITMQ_CERT_PATH, RABBITMQ_USER, RABBITMQ_PASSWORD
 from logic import process_match_data
 
@@ -40,7 +41,15 @@ def consume_game_history():
                         # Log error but ack to avoid infinite loop if data is bad
                         print("Failed to process match data, acking anyway to clear queue", flush=True)
                         ch.basic_ack(delivery_tag=method.delivery_tag)
+                except ConnectionFailure as e:
+                    # MongoDB unreachable (includes AutoReconnect and ServerSelectionTimeoutError):
+                    # the message is redelivered and processing resumes where it stopped
+                    # (see process_match_data)
+                    print(f"Database unavailable: {e}. Requeueing...", flush=True)
+                    time.sleep(1)
+                    ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
                 except Exception as e:
+                    # Any other error would fail again on every redelivery and block the queue
                     print(f"Error processing message: {e}", flush=True)
                     ch.basic_ack(delivery_tag=method.delivery_tag)
 
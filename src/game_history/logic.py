@@ -1,31 +1,50 @@
 import uuid
+from pymongo.errors import DuplicateKeyError
 from database import get_matches_collection, get_leaderboard_collection
 from config import PAGE_SIZE
 
+# Number of recent match ids kept on each leaderboard entry: a redelivered
+# match already counted for that player is recognised and skipped
+APPLIED_MATCHES_KEPT = 100
+
+
 # Helper for atomic leaderboard updates
-def update_leaderboard_stats(player_uuid, points, is_win, is_loss, is_draw):
+def update_leaderboard_stats(player_uuid, points, is_win, is_loss, is_draw, match_id):
     """
     Atomically updates a single player's stats in the leaderboard collection.
+
+    Idempotent per match: the update only applies if match_id is not among
+    the entry's applied_matches, and pushes it there in the same operation.
     """
+    query = {'_id': player_uuid, 'applied_matches': {'$ne': match_id}}
+    update = {
+        '$inc': {
+            'points': points,
+            'wins': 1 if is_win else 0,
+            'losses': 1 if is_loss else 0,
+            'draws': 1 if is_draw else 0
+        },
+        '$push': {'applied_matches': {'$each': [match_id], '$slice': -APPLIED_MATCHES_KEPT}}
+    }
+    # upsert=True creates the document if it doesn't exist, default numbers are 0
+    leaderboard_collection = get_leaderboard_collection()
     try:
-        query = {'_id': player_uuid}
-        update = {
-            '$inc': {
-                'points': points,
-                'wins': 1 if is_win else 0,
-                'losses': 1 if is_loss else 0,
-                'draws': 1 if is_draw else 0
-            }
-        }
-        # upsert=True creates the document if it doesn't exist, default numbers are 0
-        leaderboard_collection = get_leaderboard_collection()
         leaderboard_collection.update_one(query, update, upsert=True)
-    except Exception as e:
-        print(f"Error: Failed to update leaderboard for {player_uuid}. {e}", flush=True)
+    except DuplicateKeyError:
+        # The entry exists and already contains match_id: the upsert tried to create a second one
+        print(f"Match {match_id} already counted for {player_uuid}, skipping.", flush=True)
 
 
 def process_match_data(data):
-    if not data or 'player1' not in data or 'player2' not in data or 'winner' not in data:
+    """
+    Stores a finished match and updates the leaderboard.
+
+    Returns False for invalid data (the message is dropped). Database
+    errors are raised: the consumer requeues the message on connection
+    errors, and a redelivered match is recognised by game_id so only the
+    missing leaderboard updates are applied.
+    """
+    if not isinstance(data, dict) or 'player1' not in data or 'player2' not in data or 'winner' not in data:
         print("Error: Missing required match data", flush=True)
         return False
 
@@ -34,7 +53,20 @@ def process_match_data(data):
         print("Error: Invalid data types in match data", flush=True)
         return False
 
-    match_id = str(uuid.uuid4())
+    # game_id (when present) makes processing idempotent: the game engine
+    # outbox may deliver the same match again after a restart or reconnect
+    match_id = data.get('game_id') or str(uuid.uuid4())
+    if not isinstance(match_id, str):
+        print("Error: Invalid data types in match data", flush=True)
+        return False
+
+    # Points go into $inc: anything but an integer would fail on every redelivery
+    for key in ('points1', 'points2'):
+        points = data.get(key, 0)
+        if not isinstance(points, int) or isinstance(points, bool):
+            print(f"Error: Invalid {key} in match data", flush=True)
+            return False
+
     match = {
         '_id': match_id,
         'player1': data['player1'],
@@ -44,40 +76,54 @@ def process_match_data(data):
         'points1': data.get('points1', 0),
         'points2': data.get('points2', 0),
         'started_at': data.get('started_at', 0),
-        'ended_at': data.get('ended_at', 0)
+        'ended_at': data.get('ended_at', 0),
+        'bot': data.get('bot') is True,  # game against the game engine's bot (player2)
+        # Bot games are kept in the match history but are unranked
+        'leaderboard_applied': data.get('bot') is True
     }
-    
+
+    # --- 1. Insert the new match ---
+    matches_collection = get_matches_collection()
     try:
-        # --- 1. Insert the new match ---
-        matches_collection = get_matches_collection()
         matches_collection.insert_one(match)
+    except DuplicateKeyError:
+        stored = matches_collection.find_one({'_id': match_id}, {'leaderboard_applied': 1})
+        # Matches stored before leaderboard_applied existed were fully processed
+        if stored is None or stored.get('leaderboard_applied', True):
+            print(f"Match {match_id} already processed, skipping.", flush=True)
+            return True
+        # A previous delivery stopped before the leaderboard update: finish it
+        print(f"Match {match_id} already stored, completing leaderboard update.", flush=True)
 
-        # --- 2. Atomically update leaderboard ---
-        winner = match['winner']
-        
-        # Update Player 1
-        update_leaderboard_stats(
-            player_uuid=match['player1'],
-            points=match['points1'],
-            is_win=(winner == '1'),
-            is_loss=(winner == '2'),
-            is_draw=(winner == 'draw')
-        )
-        
-        # Update Player 2
-        update_leaderboard_stats(
-            player_uuid=match['player2'],
-            points=match['points2'],
-            is_win=(winner == '2'),
-            is_loss=(winner == '1'),
-            is_draw=(winner == 'draw')
-        )
-        print(f"Match {match_id} processed successfully.", flush=True)
+    if match['bot']:
+        print(f"Match {match_id} (bot game) processed successfully.", flush=True)
         return True
-    
-    except Exception as e:
-        print(f"Error processing match: {e}", flush=True)
-        return False
+
+    # --- 2. Atomically update leaderboard (once per player and match) ---
+    winner = match['winner']
+
+    # Update Player 1
+    update_leaderboard_stats(
+        player_uuid=match['player1'],
+        points=match['points1'],
+        is_win=(winner == '1'),
+        is_loss=(winner == '2'),
+        is_draw=(winner == 'draw'),
+        match_id=match_id
+    )
+
+    # Update Player 2
+    update_leaderboard_stats(
+        player_uuid=match['player2'],
+        points=match['points2'],
+        is_win=(winner == '2'),
+        is_loss=(winner == '1'),
+        is_draw=(winner == 'draw'),
+        match_id=match_id
+    )
+    matches_collection.update_one({'_id': match_id}, {'$set': {'leaderboard_applied': True}})
+    print(f"Match {match_id} processed successfully.", flush=True)
+    return True
 
 
 def get_matches(player_uuid, page):
@@ -90,7 +136,10 @@ def get_matches(player_uuid, page):
         
         # 3. Pagination
         { '$skip': page * PAGE_SIZE },
-        { '$limit': PAGE_SIZE }
+        { '$limit': PAGE_SIZE },
+
+        # 4. Internal processing state
+        { '$project': { 'leaderboard_applied': 0 } }
     ]
     matches_collection = get_matches_collection()
     cursor = matches_collection.aggregate(pipeline)
@@ -104,8 +153,21 @@ def get_leaderboard(page):
         
         # 2. Pagination
         { '$skip': page * PAGE_SIZE },
-        { '$limit': PAGE_SIZE }
+        { '$limit': PAGE_SIZE },
+
+        # 3. Idempotency bookkeeping (see update_leaderboard_stats)
+        { '$project': { 'applied_matches': 0 } }
     ]
     leaderboard_collection = get_leaderboard_collection()
     cursor = leaderboard_collection.aggregate(pipeline)
     return list(cursor)
+
+
+def get_ratings(player_uuids):
+    """Leaderboard points of the given players (0 for players without matches)."""
+    leaderboard_collection = get_leaderboard_collection()
+    cursor = leaderboard_collection.find({'_id': {'$in': list(player_uuids)}}, {'points': 1})
+    ratings = {player_uuid: 0 for player_uuid in player_uuids}
+    for doc in cursor:
+        ratings[doc['_id']] = doc.get('points', 0)
+    return ratings
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-from logic import get_matches, get_leaderboard
+from logic import get_matches, get_leaderboard, get_ratings
 from utils import validate_user_token, associate_usernames_to_ids
 from config import PAGE_SIZE
 
@@ -27,7 +27,8 @@ def list_matches():
         all_ids = set()
         for m in matches:
             if m.get('player1'): all_ids.add(m.get('player1'))
-            if m.get('player2'): all_ids.add(m.get('player2'))
+            # The bot (player2 of bot games) is not a registered user
+            if m.get('player2') and not m.get('bot'): all_ids.add(m.get('player2'))
         id_to_username = associate_usernames_to_ids(all_ids)
         
         for m in matches:
@@ -75,3 +76,18 @@ def leaderboard():
     except Exception as e:
         print(f"Error in leaderboard: {e}", flush=True)
         return jsonify({'error': 'Failed to retrieve leaderboard'}), 500
+
+# Leaderboard points of some players, used by game_engine for matchmaking
+# (GET /internal/ratings?id=<uuid>&id=<uuid>, not exposed by the gateway)
+@history_blueprint.route('/internal/ratings', methods=['GET'])
+def ratings():
+    player_uuids = request.args.getlist('id')
+    if not player_uuids:
+        return jsonify({'error': 'At least one id is required'}), 400
+    if len(player_uuids) > 100:
+        return jsonify({'error': 'Too many ids'}), 400
+    try:
+        return jsonify({'ratings': get_ratings(player_uuids)})
+    except Exception as e:
+        print(f"Error in ratings: {e}", flush=True)
+        return jsonify({'error': 'Failed to retrieve ratings'}), 500